@@ -0,0 +1,84 @@
+"""
+Compare the vectorized batch analysis with the per-day scalar
+NutritionAnalyzer on synthetic meals, and check that both agree.
+
+    python benchmarks/analysis_benchmark.py --users 10000 --days 30 --meals-per-day 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.food_recognition import NutritionAnalyzer
+from models.nutrition_analysis import iter_results
+
+
+def synthetic_meals(users: int, days: int, meals_per_day: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    n = users * days * meals_per_day
+    dates = np.datetime64('2024-01-01') + np.arange(days)
+    return {
+        'user_id': np.repeat(np.arange(users), days * meals_per_day),
+        'meal_date': np.tile(np.repeat(dates, meals_per_day), users),
+        'calories': rng.gamma(4.0, 130.0, n).round(1),
+        'protein': rng.gamma(3.0, 6.0, n).round(1),
+        'carbs': rng.gamma(3.0, 20.0, n).round(1),
+        'fat': rng.gamma(2.0, 9.0, n).round(1),
+    }
+
+
+def run_scalar(analyzer: NutritionAnalyzer, columns: dict) -> dict:
+    groups = {}
+    for i in range(len(columns['user_id'])):
+        key = (int(columns['user_id'][i]), str(columns['meal_date'][i]))
+        groups.setdefault(key, []).append({
+            'calories': float(columns['calories'][i]),
+            'protein': float(columns['protein'][i]),
+            'carbs': float(columns['carbs'][i]),
+            'fat': float(columns['fat'][i]),
+        })
+    return {key: analyzer.analyze_daily_nutrition(meals) for key, meals in groups.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--meals-per-day', type=int, default=4)
+    parser.add_argument('--skip-scalar', action='store_true', help='Only time the vectorized path')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    analyzer = NutritionAnalyzer()
+    columns = synthetic_meals(args.users, args.days, args.meals_per_day)
+    report = {'meals': len(columns['user_id'])}
+
+    started = time.perf_counter()
+    result = analyzer.analyze_batch(columns)
+    report['vectorized_s'] = time.perf_counter() - started
+    report['user_days'] = len(result['user_id'])
+
+    if not args.skip_scalar:
+        started = time.perf_counter()
+        expected = run_scalar(analyzer, columns)
+        report['scalar_s'] = time.perf_counter() - started
+        report['speedup'] = report['scalar_s'] / report['vectorized_s']
+        report['mismatches'] = sum(
+            1 for day in iter_results(result, analyzer.rules)
+            if any(day[k] != v for k, v in expected[(day['user_id'], day['meal_date'])].items())
+        )
+
+    for key, value in report.items():
+        print(f"{key:<16}{value:>14.4f}" if isinstance(value, float) else f"{key:<16}{value:>14}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
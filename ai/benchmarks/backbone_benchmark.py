@@ -0,0 +1,92 @@
+"""
+Compare FoodRecognitionModel backbones: parameters, multiply-adds per
+image, Keras latency per batch size and, with --data, validation accuracy
+after training each backbone for the same number of epochs on the same
+photos (laid out as <data>/<class name>/*.jpg, see models/training.py).
+
+    python benchmarks/backbone_benchmark.py --architectures cnn mobilenet --sizes 224 160 \
+        --batch-sizes 1 8 32 --data data/photos --epochs 5 --output backbones.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.architectures import ARCHITECTURES, count_flops
+from models.food_recognition import FoodRecognitionModel
+
+
+def latency(model: FoodRecognitionModel, batch_size: int, repeats: int) -> dict:
+    batch = np.random.default_rng(0).random((batch_size,) + model.preprocessor.image_shape, dtype=np.float32)
+    model.runtime.predict(batch)  # warm-up
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model.runtime.predict(batch)
+        samples.append(time.perf_counter() - started)
+    samples = np.array(samples) * 1000
+    return {
+        'batch_size': batch_size,
+        'p50_ms_per_batch': float(np.percentile(samples, 50)),
+        'p95_ms_per_batch': float(np.percentile(samples, 95)),
+        'ms_per_image': float(np.percentile(samples, 50)) / batch_size,
+    }
+
+
+def benchmark(architecture: str, size: int, args, cache_dir: str) -> dict:
+    model = FoodRecognitionModel(backend='keras', lazy=True, architecture=architecture, input_size=size)
+    model.ensure_loaded()
+    report = {
+        'architecture': architecture,
+        'input_size': size,
+        'params': int(model.model.count_params()),
+        'mflops': count_flops(model.model) / 1e6,
+        'latency': [latency(model, batch_size, args.repeats) for batch_size in args.batch_sizes],
+    }
+    if args.data:
+        training = model.train(args.data, epochs=args.epochs, batch_size=args.train_batch_size,
+                               cache_dir=cache_dir, seed=0)
+        last = training['epochs'][-1] if training['epochs'] else {}
+        report['val_accuracy'] = last.get('val_accuracy')
+        report['train_images_per_s'] = training['images_per_s']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--architectures', nargs='+', default=sorted(ARCHITECTURES), choices=sorted(ARCHITECTURES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[224, 160])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--data', help='Photo directory to train and validate on')
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--train-batch-size', type=int, default=32)
+    parser.add_argument('--cache-dir', help='Shard cache (default: a temporary directory)')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = args.cache_dir or tmp
+        reports = [benchmark(architecture, size, args, cache_dir)
+                   for size in args.sizes for architecture in args.architectures]
+
+    print(f"{'backbone':<18}{'params':>10}{'MFLOPs':>9}" +
+          ''.join(f"{f'ms@{b}':>10}" for b in args.batch_sizes) + f"{'val acc':>9}")
+    for r in reports:
+        accuracy = f"{r['val_accuracy']:.3f}" if r.get('val_accuracy') is not None else '-'
+        print(f"{r['architecture'] + '@' + str(r['input_size']):<18}{r['params']:>10,}{r['mflops']:>9.0f}" +
+              ''.join(f"{entry['p50_ms_per_batch']:>10.2f}" for entry in r['latency']) + f"{accuracy:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
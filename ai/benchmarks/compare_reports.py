@@ -0,0 +1,86 @@
+"""
+Compare two benchmark reports (load_benchmark.py / micro_benchmark.py
+--output) result by result and flag regressions: a latency percentile
+that grew, or a throughput that fell, by more than --threshold percent.
+Exits with status 1 when anything regressed, so it can gate CI.
+
+    python benchmarks/compare_reports.py baseline.json candidate.json --threshold 10
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+# (field, True if higher is better)
+METRICS = (('p50_ms', False), ('p95_ms', False), ('p99_ms', False), ('throughput_per_s', True))
+
+
+def load_report(path: str) -> Dict:
+    with open(path) as f:
+        report = json.load(f)
+    if 'results' not in report:
+        raise ValueError(f"{path} is not a benchmark report")
+    return report
+
+
+def compare(baseline: Dict, candidate: Dict, threshold: float, fields: List[str]) -> List[Dict]:
+    base_results = {r['name']: r for r in baseline['results']}
+    rows = []
+    for result in candidate['results']:
+        base = base_results.get(result['name'])
+        if base is None:
+            continue
+        for field, higher_is_better in METRICS:
+            if field not in fields or not base.get(field):
+                continue
+            change = (result[field] - base[field]) / base[field] * 100
+            regressed = change < -threshold if higher_is_better else change > threshold
+            improved = change > threshold if higher_is_better else change < -threshold
+            rows.append({
+                'name': result['name'],
+                'metric': field,
+                'baseline': base[field],
+                'candidate': result[field],
+                'change_pct': change,
+                'status': 'regressed' if regressed else 'improved' if improved else 'same',
+            })
+        if result.get('errors', 0) > base.get('errors', 0):
+            rows.append({'name': result['name'], 'metric': 'errors', 'baseline': base.get('errors', 0),
+                         'candidate': result['errors'], 'change_pct': 0.0, 'status': 'regressed'})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Allowed change in percent')
+    parser.add_argument('--metrics', nargs='+', default=[field for field, _ in METRICS],
+                        choices=[field for field, _ in METRICS])
+    parser.add_argument('--output', help='Write the comparison as JSON to this file')
+    args = parser.parse_args()
+
+    baseline, candidate = load_report(args.baseline), load_report(args.candidate)
+    for report in (baseline, candidate):
+        meta = report.get('meta', {})
+        print(f"{meta.get('kind', '?'):<6}{meta.get('commit', '?'):<12}{meta.get('created_at', '')}")
+    for field in ('platform', 'cpu_count', 'settings'):
+        if baseline.get('meta', {}).get(field) != candidate.get('meta', {}).get(field):
+            print(f"warning: reports differ in {field}; numbers may not be comparable")
+
+    rows = compare(baseline, candidate, args.threshold, args.metrics)
+    print(f"{'benchmark':<44}{'metric':<18}{'baseline':>12}{'candidate':>12}{'change':>9}  status")
+    for row in rows:
+        print(f"{row['name']:<44}{row['metric']:<18}{row['baseline']:>12.2f}{row['candidate']:>12.2f}"
+              f"{row['change_pct']:>8.1f}%  {row['status']}")
+
+    regressions = [row for row in rows if row['status'] == 'regressed']
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:g}%")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'threshold_pct': args.threshold, 'rows': rows}, f, indent=2)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
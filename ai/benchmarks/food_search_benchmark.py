@@ -0,0 +1,102 @@
+"""
+Build time, reload time and query latency of the food name search index
+on synthetic Vietnamese dish names, with accent-free and misspelled queries.
+
+    python benchmarks/food_search_benchmark.py --sizes 1000 10000 100000 --queries 1000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.food_search import FoodSearchIndex, fold
+
+WORDS = ['phở', 'bún', 'bánh', 'cơm', 'canh', 'chả', 'gỏi', 'xôi', 'mì', 'hủ tiếu', 'bò', 'gà', 'heo', 'tôm',
+         'cá', 'mực', 'cua', 'đậu', 'trứng', 'chiên', 'nướng', 'xào', 'kho', 'hấp', 'luộc', 'chua', 'cay',
+         'huế', 'sài gòn', 'hà nội', 'thịt', 'sườn', 'nấm', 'rau', 'bí', 'dừa', 'sen', 'khoai', 'tàu hũ', 'ốc']
+
+
+def synthetic_names(n: int, rng) -> list:
+    names = []
+    for i in range(n):
+        words = rng.choice(WORDS, rng.integers(2, 5), replace=False)
+        names.append(f"{' '.join(words)} {i}")
+    return names
+
+
+def misspell(text: str, rng) -> str:
+    if len(text) < 4:
+        return text
+    i = int(rng.integers(1, len(text) - 1))
+    return text[:i] + text[i + 1:]
+
+
+def percentiles(samples):
+    samples = np.array(samples) * 1000
+    return {'p50_ms': float(np.percentile(samples, 50)), 'p95_ms': float(np.percentile(samples, 95)),
+            'p99_ms': float(np.percentile(samples, 99))}
+
+
+def benchmark(n: int, queries: int) -> dict:
+    rng = np.random.default_rng(0)
+    names = synthetic_names(n, rng)
+    started = time.perf_counter()
+    index = FoodSearchIndex.build(enumerate(names), dict(enumerate(names)))
+    build_s = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'food_search.snap')
+        index.save(path)
+        size = os.path.getsize(path)
+        started = time.perf_counter()
+        FoodSearchIndex.load(path)
+        load_s = time.perf_counter() - started
+
+    targets = rng.integers(0, n, queries)
+    scenarios = {
+        'accented': [names[i].rsplit(' ', 1)[0] for i in targets],
+        'folded': [fold(names[i].rsplit(' ', 1)[0]) for i in targets],
+        'misspelled': [misspell(fold(names[i].rsplit(' ', 1)[0]), rng) for i in targets],
+    }
+    report = {'names': n, 'build_s': build_s, 'load_s': load_s, 'index_bytes': size}
+    for name, texts in scenarios.items():
+        samples, found = [], 0
+        for text in texts:
+            started = time.perf_counter()
+            matches = index.search(text, k=5)
+            samples.append(time.perf_counter() - started)
+            found += bool(matches)
+        report[name] = percentiles(samples)
+        report[name]['found'] = found / len(texts)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    reports = [benchmark(n, args.queries) for n in args.sizes]
+    for report in reports:
+        print(f"names={report['names']}  (build {report['build_s']:.2f}s, load {report['load_s']:.3f}s, "
+              f"{report['index_bytes'] / 1e6:.1f} MB)")
+        for key, value in report.items():
+            if isinstance(value, dict):
+                print(f"  {key:<12} p50 {value['p50_ms']:7.3f} ms   p95 {value['p95_ms']:7.3f} ms   "
+                      f"p99 {value['p99_ms']:7.3f} ms   found {value['found']:.0%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Load-test the AI endpoints in-process: the FastAPI app runs on this
+process's event loop behind an httpx ASGI client, so results measure the
+service (routing, validation, handlers, worker pool, model) without
+network or server overhead. Each endpoint is driven by a closed loop of
+`concurrency` clients for each level in --concurrency.
+
+Inputs are seeded and every upload is a distinct synthetic JPEG, so runs
+are repeatable and uploads miss the prediction cache (use --image-pool N
+to cycle N images and measure cache hits instead).
+
+    python benchmarks/load_benchmark.py --concurrency 1 4 16 --requests 200 --output load.json
+    python benchmarks/compare_reports.py baseline.json load.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.workloads import (
+    print_results, report_meta, summarize, synthetic_jpeg, synthetic_meals, typed_description
+)
+
+ENDPOINTS = ('recognize-food', 'upload-food-image', 'analyze-nutrition', 'recommendations')
+
+# Environment of the app under test, fixed so runs are comparable
+APP_ENVIRONMENT = {
+    'INFERENCE_WARMUP': '1',
+    'PREDICTION_CACHE_PHASH_DISTANCE': '0',
+    'PROFILER_ENABLED': '0',
+}
+
+
+def recognize_requests(app_main, count: int, rng: np.random.Generator, args) -> List[Dict]:
+    # Names the search index knows, typed the way users type them
+    _, index = app_main.food_search.current()
+    names = sorted(set(index.display_names))
+    return [
+        {'method': 'POST', 'url': '/recognize-food',
+         'json': {'description': typed_description(names[int(rng.integers(len(names)))], rng)}}
+        for _ in range(count)
+    ]
+
+
+def upload_requests(app_main, count: int, rng: np.random.Generator, args) -> List[Dict]:
+    width, height = (int(v) for v in args.image_size.split('x'))
+    distinct = min(count, args.image_pool) if args.image_pool else count
+    seeds = rng.integers(0, 2 ** 31, distinct)
+    images = [synthetic_jpeg(width, height, int(seed)) for seed in seeds]
+    return [
+        {'method': 'POST', 'url': '/upload-food-image',
+         'files': {'file': (f"meal_{i}.jpg", images[i % distinct], 'image/jpeg')}}
+        for i in range(count)
+    ]
+
+
+def analysis_requests(app_main, count: int, rng: np.random.Generator, args) -> List[Dict]:
+    return [
+        {'method': 'POST', 'url': '/analyze-nutrition',
+         'json': {'user_id': int(rng.integers(1, 10000)), 'date': '2024-01-01',
+                  'meals': synthetic_meals(rng, args.meals_per_day)}}
+        for _ in range(count)
+    ]
+
+
+def recommendation_requests(app_main, count: int, rng: np.random.Generator, args) -> List[Dict]:
+    from services.recommendations import ACTIVITY_LEVELS, GOALS
+
+    requests = []
+    for _ in range(count):
+        payload = {
+            'user_id': int(rng.integers(1, 10000)),
+            'current_goals': GOALS[int(rng.integers(len(GOALS)))],
+            'activity_level': ACTIVITY_LEVELS[int(rng.integers(len(ACTIVITY_LEVELS)))],
+        }
+        # Half ask for rankings against a remaining budget, which skips the cache
+        if rng.random() < 0.5:
+            payload['remaining'] = {'calories': float(rng.uniform(200, 1200)), 'protein': float(rng.uniform(5, 60))}
+            payload['meals_left'] = int(rng.integers(1, 4))
+        requests.append({'method': 'POST', 'url': '/recommendations', 'json': payload})
+    return requests
+
+
+WORKLOADS: Dict[str, Callable] = {
+    'recognize-food': recognize_requests,
+    'upload-food-image': upload_requests,
+    'analyze-nutrition': analysis_requests,
+    'recommendations': recommendation_requests,
+}
+
+
+async def run_level(client, requests: List[Dict], concurrency: int) -> Dict:
+    """
+    Send all requests from `concurrency` closed-loop clients
+    """
+    latencies = []
+    statuses: Counter = Counter()
+    pending = iter(requests)
+
+    async def client_loop():
+        for request in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+    wall = time.perf_counter() - started
+    errors = sum(count for status, count in statuses.items() if status != 200)
+    return {**summarize(latencies, wall, errors), 'statuses': {str(k): v for k, v in statuses.items()}}
+
+
+async def wait_ready(client, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if (await client.get('/ready')).status_code == 200:
+            return
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"Service not ready after {timeout}s")
+
+
+async def run(args) -> List[Dict]:
+    import httpx
+    import main as app_main
+
+    # One log line per request would dominate the output
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    results = []
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.app.router.lifespan_context(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark', timeout=args.timeout) as client:
+            await wait_ready(client, args.timeout)
+            for endpoint in args.endpoints:
+                for level, concurrency in enumerate(args.concurrency):
+                    # Fresh inputs per level so one level's uploads are not cached for the next
+                    rng = np.random.default_rng([args.seed, ENDPOINTS.index(endpoint), level])
+                    requests = WORKLOADS[endpoint](app_main, args.warmup + args.requests, rng, args)
+                    await run_level(client, requests[:args.warmup], concurrency)
+                    result = await run_level(client, requests[args.warmup:], concurrency)
+                    results.append({'name': f"load/{endpoint}/c{concurrency}", 'endpoint': endpoint,
+                                    'concurrency': concurrency, **result})
+                    print(f"{results[-1]['name']}: p50 {result['p50_ms']:.2f} ms, "
+                          f"{result['throughput_per_s']:.1f}/s, {result['errors']} errors", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint and level')
+    parser.add_argument('--warmup', type=int, default=10, help='Untimed requests before each level')
+    parser.add_argument('--image-size', default='640x480', help='Upload JPEG size, WIDTHxHEIGHT')
+    parser.add_argument('--image-pool', type=int, default=0, help='Cycle this many distinct images (0: all distinct)')
+    parser.add_argument('--meals-per-day', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Configure the app before main.py reads its environment
+        os.environ.update(APP_ENVIRONMENT)
+        os.environ['DAILY_TOTALS_DB'] = os.path.join(tmp, 'daily_totals.db')
+        os.environ['UPLOAD_DIR'] = os.path.join(tmp, 'uploads')
+        os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        results = asyncio.run(run(args))
+
+    print_results(results)
+    settings = {key: value for key, value in vars(args).items() if key != 'output'}
+    settings['environment'] = {key: os.environ.get(key) for key in sorted(os.environ)
+                               if key.startswith(('INFERENCE_', 'FOOD_MODEL_', 'PREDICTION_CACHE_'))}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': report_meta('load', settings), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
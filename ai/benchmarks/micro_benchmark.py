@@ -0,0 +1,88 @@
+"""
+Micro-benchmark the hot functions behind the endpoints, outside the web
+stack: FoodRecognitionModel.preprocess_image, predict (decode + forward
+pass + top-k) and predict_batch, and NutritionAnalyzer.analyze_daily_nutrition
+and analyze_batch. Inputs are seeded, so reports of two commits can be
+compared with compare_reports.py.
+
+    python benchmarks/micro_benchmark.py --iterations 200 --output micro.json
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.workloads import print_results, report_meta, synthetic_jpeg, synthetic_meals, time_calls
+from models.food_recognition import FoodRecognitionModel, NutritionAnalyzer
+
+
+def model_benchmarks(args, rng: np.random.Generator) -> list:
+    model = FoodRecognitionModel(os.getenv("FOOD_MODEL_PATH"), args.backend or os.getenv("FOOD_MODEL_BACKEND"))
+    model.warm_up(max(args.batch_sizes))
+    results = []
+
+    for size in args.image_sizes:
+        width, height = (int(v) for v in size.split('x'))
+        images = [synthetic_jpeg(width, height, int(seed)) for seed in rng.integers(0, 2 ** 31, 8)]
+        sources = itertools.cycle(images)
+        results.append({'name': f"micro/preprocess_image/{size}",
+                        **time_calls(lambda: model.preprocess_image(next(sources)), args.iterations)})
+        results.append({'name': f"micro/predict/{size}",
+                        **time_calls(lambda: model.predict(next(sources)), args.iterations)})
+
+    for batch_size in args.batch_sizes:
+        batch = rng.random((batch_size,) + model.preprocessor.image_shape, dtype=np.float32)
+        result = time_calls(lambda: model.predict_batch(batch), max(10, args.iterations // batch_size))
+        # Throughput in images rather than calls
+        result['throughput_per_s'] *= batch_size
+        results.append({'name': f"micro/predict_batch/b{batch_size}", 'batch_size': batch_size, **result})
+    return results
+
+
+def analysis_benchmarks(args, rng: np.random.Generator) -> list:
+    from benchmarks.analysis_benchmark import synthetic_meals as synthetic_meal_columns
+
+    analyzer = NutritionAnalyzer()
+    days = itertools.cycle([synthetic_meals(rng, args.meals_per_day) for _ in range(64)])
+    results = [{'name': f"micro/analyze_daily_nutrition/m{args.meals_per_day}",
+                **time_calls(lambda: analyzer.analyze_daily_nutrition(next(days)), args.iterations * 10)}]
+
+    columns = synthetic_meal_columns(args.batch_users, 30, args.meals_per_day, seed=args.seed)
+    result = time_calls(lambda: analyzer.analyze_batch(columns), max(5, args.iterations // 20), warmup=1)
+    # Throughput in meals analyzed
+    result['throughput_per_s'] *= len(columns['user_id'])
+    results.append({'name': f"micro/analyze_batch/u{args.batch_users}x30d", **result})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--image-sizes', nargs='+', default=['640x480', '4000x3000'], help='WIDTHxHEIGHT JPEGs')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 16])
+    parser.add_argument('--meals-per-day', type=int, default=4)
+    parser.add_argument('--batch-users', type=int, default=1000)
+    parser.add_argument('--backend', help='Model runtime (default: FOOD_MODEL_BACKEND or auto)')
+    parser.add_argument('--skip-model', action='store_true', help='Only run the analysis benchmarks')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    # Separate streams keep each group's inputs the same when the other is skipped
+    results = [] if args.skip_model else model_benchmarks(args, np.random.default_rng([args.seed, 0]))
+    results.extend(analysis_benchmarks(args, np.random.default_rng([args.seed, 1])))
+
+    print_results(results)
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key != 'output'}
+        with open(args.output, 'w') as f:
+            json.dump({'meta': report_meta('micro', settings), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
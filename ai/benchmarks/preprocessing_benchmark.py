@@ -0,0 +1,140 @@
+"""
+Benchmark image preprocessing: legacy temp-file + float64 path vs the
+pooled float32 ImagePreprocessor with JPEG draft decoding.
+
+Each mode runs in its own subprocess so peak RSS is measured in isolation.
+
+    python benchmarks/preprocessing_benchmark.py --images 200 --size 4000x3000
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.preprocessing import ImagePreprocessor
+
+
+def _synthetic_jpeg(width: int, height: int, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    # Smooth gradients plus noise compress like a real photo, unlike pure noise
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def _legacy_preprocess(content: bytes) -> np.ndarray:
+    # Mirrors the original FoodRecognitionModel.preprocess_image behaviour
+    with tempfile.NamedTemporaryFile(suffix='.jpg') as tmp:
+        tmp.write(content)
+        tmp.flush()
+        image = Image.open(tmp.name)
+        image = image.convert('RGB')
+        image = image.resize((224, 224))
+        image_array = np.array(image) / 255.0
+        return np.expand_dims(image_array, axis=0)
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM is reset on exec, unlike ru_maxrss which keeps the forking
+    # parent's peak; both are reported in kilobytes on Linux
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_mode(mode: str, images: int, image_dir: str, batch_size: int) -> dict:
+    payloads = []
+    for name in sorted(os.listdir(image_dir)):
+        with open(os.path.join(image_dir, name), 'rb') as f:
+            payloads.append(f.read())
+    baseline_rss = _peak_rss_mb()
+    latencies = []
+
+    if mode == 'legacy':
+        for i in range(images):
+            started = time.perf_counter()
+            _legacy_preprocess(payloads[i % len(payloads)])
+            latencies.append(time.perf_counter() - started)
+    else:
+        preprocessor = ImagePreprocessor(max_batch_size=batch_size)
+        for start in range(0, images, batch_size):
+            chunk = [payloads[i % len(payloads)] for i in range(start, min(start + batch_size, images))]
+            started = time.perf_counter()
+            with preprocessor.preprocess_batch(chunk) as batch:
+                assert batch.images.dtype == np.float32
+            latencies.extend([(time.perf_counter() - started) / len(chunk)] * len(chunk))
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'mode': mode,
+        'images': images,
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=100)
+    parser.add_argument('--size', default='4000x3000', help='Source JPEG size, WIDTHxHEIGHT')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--mode', choices=['legacy', 'pipeline'], help='Run a single mode in-process')
+    parser.add_argument('--image-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.images, args.image_dir, args.batch_size)))
+        return
+
+    # Generate source photos once, outside the measured processes
+    width, height = (int(v) for v in args.size.split('x'))
+    results = []
+    with tempfile.TemporaryDirectory() as image_dir:
+        for seed in range(min(args.images, 8)):
+            with open(os.path.join(image_dir, f"{seed:02d}.jpg"), 'wb') as f:
+                f.write(_synthetic_jpeg(width, height, seed))
+
+        for mode in ('legacy', 'pipeline'):
+            completed = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, '--images', str(args.images),
+                 '--image-dir', image_dir, '--batch-size', str(args.batch_size)],
+                check=True, capture_output=True, text=True
+            )
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(f"Source images: {args.size} JPEG")
+    print(f"{'mode':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'base MB':>10}{'peak MB':>10}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['baseline_rss_mb']:>10.1f}{r['peak_rss_mb']:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Latency of the food ranking engine on synthetic catalogs, with and
+without category/tag prefilters, checked against a full sort.
+
+    python benchmarks/ranking_benchmark.py --sizes 10000 100000 --queries 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.nutrition_store import NutritionStore
+from models.ranking import FoodRanker, daily_targets, fit_weights, FIT_SCALES, GOAL_PREFERENCES
+
+CATEGORIES = ['grains', 'noodles', 'bread', 'rice_dish', 'appetizer', 'pancake', 'fish', 'meat', 'soup', 'dessert']
+TAGS = ['vegetarian', 'vegan', 'spicy', 'gluten_free', 'pork', 'beef', 'seafood', 'street_food', 'breakfast', 'soup']
+GOALS = ['lose_weight', 'gain_weight', 'maintain_weight']
+ACTIVITY = ['sedentary', 'lightly_active', 'moderately_active', 'very_active', 'extremely_active']
+
+
+def synthetic_store(n: int, seed: int = 0) -> NutritionStore:
+    rng = np.random.default_rng(seed)
+    calories = rng.gamma(4.0, 50.0, n)
+    protein, carbs, fat = rng.gamma(2.0, 5.0, n), rng.gamma(3.0, 8.0, n), rng.gamma(2.0, 4.0, n)
+    fiber, sugar, sodium = rng.gamma(1.5, 1.5, n), rng.gamma(1.5, 3.0, n), rng.gamma(2.0, 150.0, n)
+    serving = rng.choice([50.0, 100.0, 150.0, 250.0, 400.0], n)
+    categories = rng.integers(0, len(CATEGORIES), n)
+    tag_mask = rng.random((n, len(TAGS))) < 0.2
+    rows = [{
+        'id': i + 1, 'name': f"food {i}", 'name_vietnamese': f"món {i}", 'category': CATEGORIES[categories[i]],
+        'calories': calories[i], 'protein': protein[i], 'carbs': carbs[i], 'fat': fat[i], 'fiber': fiber[i],
+        'sugar': sugar[i], 'sodium': sodium[i], 'serving_size': serving[i],
+        'tags': [TAGS[j] for j in np.flatnonzero(tag_mask[i])],
+    } for i in range(n)]
+    return NutritionStore.from_rows(rows, class_names=[])
+
+
+def percentiles(samples):
+    samples = np.array(samples) * 1000
+    return {'p50_ms': float(np.percentile(samples, 50)), 'p95_ms': float(np.percentile(samples, 95)),
+            'max_ms': float(samples.max())}
+
+
+def check_against_sort(ranker: FoodRanker, rng, checks: int = 20) -> int:
+    """
+    Compare argpartition top-k with a full argsort over exact float64 scores
+    """
+    mismatches = 0
+    features = ranker.ranker.features.astype(np.float64)
+    for _ in range(checks):
+        goal, activity = rng.choice(GOALS), rng.choice(ACTIVITY)
+        targets = {k: v / 3 for k, v in daily_targets(goal, activity).items()}
+        weights, _ = fit_weights(ranker.ranker, targets, FIT_SCALES, GOAL_PREFERENCES[goal])
+        indices, _ = ranker.ranker.top_k(weights, 10)
+        expected = np.argsort(-(features @ weights), kind='stable')[:10]
+        mismatches += len(set(indices.tolist()) ^ set(expected.tolist())) > 0
+    return mismatches
+
+
+def benchmark(n: int, queries: int, k: int) -> dict:
+    started = time.perf_counter()
+    store = synthetic_store(n)
+    build_store_s = time.perf_counter() - started
+    started = time.perf_counter()
+    ranker = FoodRanker(store)
+    build_ranker_s = time.perf_counter() - started
+
+    rng = np.random.default_rng(1)
+    scenarios = {
+        'no_filter': {},
+        'one_category': {'categories': ['noodles']},
+        'required_tag': {'require_tags': ['vegetarian']},
+        'category_tag_exclude': {'categories': ['noodles', 'soup'], 'require_tags': ['spicy'], 'exclude_tags': ['pork']},
+    }
+    report = {'items': n, 'build_store_s': build_store_s, 'build_ranker_s': build_ranker_s}
+    for name, filters in scenarios.items():
+        samples = []
+        for _ in range(queries):
+            goal, activity = rng.choice(GOALS), rng.choice(ACTIVITY)
+            targets = {key: value / 3 for key, value in daily_targets(goal, activity).items()}
+            started = time.perf_counter()
+            ranker.rank(targets, goal, k, **filters)
+            samples.append(time.perf_counter() - started)
+        report[name] = percentiles(samples)
+
+    weights = np.stack([
+        fit_weights(ranker.ranker, {key: value / 3 for key, value in daily_targets(g, a).items()},
+                    FIT_SCALES, GOAL_PREFERENCES[g])[0]
+        for g in GOALS for a in ACTIVITY
+    ])
+    ranker.ranker.top_k_batch(weights, k)  # warm-up
+    started = time.perf_counter()
+    ranker.ranker.top_k_batch(weights, k)
+    report['batch_15_queries_ms'] = (time.perf_counter() - started) * 1000
+    report['topk_mismatches_vs_sort'] = check_against_sort(ranker, rng)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    reports = [benchmark(n, args.queries, args.k) for n in args.sizes]
+    for report in reports:
+        print(f"items={report['items']}  (store {report['build_store_s']:.2f}s, ranker {report['build_ranker_s']:.3f}s)")
+        for key, value in report.items():
+            if isinstance(value, dict):
+                print(f"  {key:<24} p50 {value['p50_ms']:7.3f} ms   p95 {value['p95_ms']:7.3f} ms")
+        print(f"  {'batch of 15 queries':<24} {report['batch_15_queries_ms']:7.3f} ms")
+        print(f"  {'mismatches vs full sort':<24} {report['topk_mismatches_vs_sort']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Accuracy-vs-latency report for FoodRecognitionModel runtime backends.
+
+Exports the given Keras model to every TFLite/ONNX variant, then runs the
+same evaluation images through each backend and reports top-1 accuracy
+(when the eval directory is laid out as <eval-dir>/<class name>/*.jpg),
+agreement with the Keras reference, per-batch latency and file size.
+
+    python benchmarks/runtime_report.py --model food_model.keras \
+        --eval-dir data/val --calibration-dir data/calibration --output runtime_report.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.food_recognition import FoodRecognitionModel
+from models.model_export import export_onnx, export_tflite, iter_image_files, load_calibration_images
+
+VARIANTS = [
+    ('keras', 'none'),
+    ('tflite', 'none'),
+    ('tflite', 'float16'),
+    ('tflite', 'int8'),
+    ('onnx', 'none'),
+    ('onnx', 'int8'),
+]
+
+
+def load_eval_set(eval_dir: str, model: FoodRecognitionModel, limit: int):
+    """
+    Preprocess eval images; labels come from class-named subdirectories
+    """
+    images, labels = [], []
+    for path in iter_image_files(eval_dir):
+        class_name = os.path.basename(os.path.dirname(path))
+        labels.append(model.class_names.index(class_name) if class_name in model.class_names else -1)
+        images.append(model.preprocess_image(path)[0])
+        if len(images) >= limit:
+            break
+    return np.stack(images), np.array(labels)
+
+
+def measure(model: FoodRecognitionModel, images: np.ndarray, batch_size: int, repeats: int):
+    predictions = []
+    for start in range(0, len(images), batch_size):
+        predictions.append(model.runtime.predict(images[start:start + batch_size]))
+    probabilities = np.concatenate(predictions)
+
+    batch = images[:batch_size]
+    model.runtime.predict(batch)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        model.runtime.predict(batch)
+    latency_ms = (time.perf_counter() - started) / repeats * 1000
+    return probabilities, latency_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Keras model (a freshly built model if omitted)')
+    parser.add_argument('--eval-dir', required=True)
+    parser.add_argument('--calibration-dir', help='Defaults to --eval-dir')
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    reference = FoodRecognitionModel(args.model, backend='keras')
+    images, labels = load_eval_set(args.eval_dir, reference, args.limit)
+    calibration_images = load_calibration_images(args.calibration_dir or args.eval_dir)
+    labelled = labels >= 0
+
+    results = []
+    reference_classes = None
+    with tempfile.TemporaryDirectory() as export_dir:
+        for backend, quantization in VARIANTS:
+            if backend == 'keras':
+                model, size_bytes = reference, reference.model.count_params() * 4
+            else:
+                path = os.path.join(export_dir, f"model_{quantization}.{backend}")
+                try:
+                    export = export_tflite if backend == 'tflite' else export_onnx
+                    export(reference.model, path, quantization, calibration_images)
+                except ImportError as e:
+                    print(f"Skipping {backend}/{quantization}: {e}")
+                    continue
+                model, size_bytes = FoodRecognitionModel(path, backend=backend), os.path.getsize(path)
+
+            probabilities, latency_ms = measure(model, images, args.batch_size, args.repeats)
+            classes = probabilities.argmax(axis=1)
+            if reference_classes is None:
+                reference_classes = classes
+            results.append({
+                'backend': backend,
+                'quantization': quantization,
+                'size_mb': size_bytes / 1e6,
+                'batch_size': args.batch_size,
+                'latency_ms_per_batch': latency_ms,
+                'latency_ms_per_image': latency_ms / min(args.batch_size, len(images)),
+                'top1_accuracy': float((classes[labelled] == labels[labelled]).mean()) if labelled.any() else None,
+                'agreement_with_keras': float((classes == reference_classes).mean()),
+            })
+
+    print(f"{'variant':<16}{'size MB':>9}{'ms/batch':>10}{'ms/img':>9}{'top-1':>8}{'agree':>8}")
+    for r in results:
+        accuracy = f"{r['top1_accuracy']:.3f}" if r['top1_accuracy'] is not None else '-'
+        print(f"{r['backend'] + '/' + r['quantization']:<16}{r['size_mb']:>9.1f}{r['latency_ms_per_batch']:>10.2f}"
+              f"{r['latency_ms_per_image']:>9.2f}{accuracy:>8}{r['agreement_with_keras']:>8.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
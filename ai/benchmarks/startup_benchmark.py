@@ -0,0 +1,82 @@
+"""
+Measure cold-start cost of the AI service: module import time, model
+construction and first-prediction latency, each in a fresh interpreter.
+
+    python benchmarks/startup_benchmark.py --runs 3 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+AI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def measure_once() -> dict:
+    sys.path.insert(0, AI_DIR)
+    timings = {}
+
+    started = time.perf_counter()
+    import main  # noqa: F401
+    timings['import_main_s'] = time.perf_counter() - started
+    # Importing the app must not pull TensorFlow in; the workers load it
+    timings['tensorflow_imported_by_main'] = 'tensorflow' in sys.modules
+
+    started = time.perf_counter()
+    from models.food_recognition import FoodRecognitionModel
+    model = FoodRecognitionModel(os.getenv("FOOD_MODEL_PATH"), os.getenv("FOOD_MODEL_BACKEND"), lazy=True)
+    timings['construct_lazy_s'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    model.ensure_loaded()
+    timings['load_model_s'] = time.perf_counter() - started
+
+    import numpy as np
+    image = np.zeros((1,) + model.preprocessor.image_shape, dtype=np.float32)
+    started = time.perf_counter()
+    model.predict_batch(image)
+    timings['first_prediction_s'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    model.predict_batch(image)
+    timings['second_prediction_s'] = time.perf_counter() - started
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once()))
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, __file__, '--child'], check=True, capture_output=True, text=True, cwd=AI_DIR
+        )
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result['process_total_s'] = time.perf_counter() - started
+        runs.append(result)
+
+    keys = [k for k in runs[0] if isinstance(runs[0][k], float)]
+    summary = {k: min(run[k] for run in runs) for k in keys}
+    for key in keys:
+        print(f"{key:<24}{summary[key] * 1000:>10.1f} ms")
+    print(f"{'tensorflow_imported_by_main':<24} {runs[0]['tensorflow_imported_by_main']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'runs': runs, 'best': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
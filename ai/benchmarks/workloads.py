@@ -0,0 +1,130 @@
+"""
+Shared pieces of the load and micro-benchmarks: seeded synthetic inputs,
+latency summaries and the report format that compare_reports.py reads.
+
+A report is {"meta": {...}, "results": [{"name": ..., "p50_ms": ...,
+"p95_ms": ..., "p99_ms": ..., "throughput_per_s": ..., ...}]}; results
+are matched between reports by name.
+"""
+import io
+import os
+import platform
+import subprocess
+import sys
+import time
+import unicodedata
+from typing import Dict, List, Sequence
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+REPORT_VERSION = 1
+
+
+def synthetic_jpeg(width: int, height: int, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    # Smooth gradients plus noise compress like a real photo, unlike pure noise
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    tint = rng.uniform(0.5, 1.0, 3).astype(np.float32)
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1) * tint
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def synthetic_meals(rng: np.random.Generator, count: int) -> List[Dict[str, float]]:
+    """
+    One day's meal log in the shape /analyze-nutrition accepts
+    """
+    return [
+        {
+            'calories': round(float(rng.gamma(4.0, 130.0)), 1),
+            'protein': round(float(rng.gamma(3.0, 6.0)), 1),
+            'carbs': round(float(rng.gamma(3.0, 20.0)), 1),
+            'fat': round(float(rng.gamma(2.0, 9.0)), 1),
+        }
+        for _ in range(count)
+    ]
+
+
+def typed_description(name: str, rng: np.random.Generator) -> str:
+    """
+    A food name as users type it: often without accents, sometimes with
+    a dropped letter
+    """
+    if rng.random() < 0.6:
+        name = ''.join(c for c in unicodedata.normalize('NFD', name) if not unicodedata.combining(c))
+        name = name.replace('đ', 'd').replace('Đ', 'D')
+    if len(name) > 4 and rng.random() < 0.3:
+        drop = int(rng.integers(1, len(name) - 1))
+        name = name[:drop] + name[drop + 1:]
+    return name.lower()
+
+
+def summarize(latencies_s: Sequence[float], wall_s: float, errors: int = 0) -> Dict:
+    """
+    p50/p95/p99/mean/max latency in ms and completed calls per second
+    """
+    samples = np.asarray(latencies_s, dtype=np.float64) * 1000 if len(latencies_s) else np.zeros(1)
+    return {
+        'count': len(latencies_s),
+        'errors': errors,
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'mean_ms': float(samples.mean()),
+        'max_ms': float(samples.max()),
+        'throughput_per_s': (len(latencies_s) - errors) / wall_s if wall_s > 0 else 0.0,
+    }
+
+
+def time_calls(function, iterations: int, warmup: int = 3) -> Dict:
+    """
+    Call `function()` warmup + iterations times and summarize the timed ones
+    """
+    for _ in range(warmup):
+        function()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def _git_commit() -> str:
+    try:
+        completed = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                   capture_output=True, text=True, timeout=5)
+        return completed.stdout.strip() or 'unknown'
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+
+def report_meta(kind: str, settings: Dict) -> Dict:
+    """
+    What a result depends on besides the code: commit, interpreter,
+    machine and the benchmark's own settings
+    """
+    return {
+        'report_version': REPORT_VERSION,
+        'kind': kind,
+        'commit': _git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': settings,
+    }
+
+
+def print_results(results: List[Dict]):
+    print(f"{'benchmark':<44}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>10}{'errors':>8}")
+    for r in results:
+        print(f"{r['name']:<44}{r['count']:>6}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['throughput_per_s']:>10.1f}{r['errors']:>8}")
@@ -1,15 +1,44 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
+import requests
 import numpy as np
-import pandas as pd
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import logging
 from datetime import datetime
 import os
+import asyncio
+from functools import partial
 from dotenv import load_dotenv
 
+from models.food_recognition import FoodRecognitionModel, NutritionAnalyzer, refresh_nutrition
+from models.food_search import FoodSearch
+from models.inference_engine import BatchInferenceEngine
+from models.instrumentation import add_stage_observer, stage
+from models.nutrition_analysis import NUTRIENT_COLUMNS, iter_results
+from models.ranking import daily_targets
+from services.worker_pool import InferencePool, PoolSaturatedError
+from services.prediction_cache import PredictionCache, perceptual_hash
+from services.daily_totals import DailyTotalsStore, normalize_date
+from services.database import (
+    Database, DatabaseBusyError, create_sqlite_schema, fetch_active_goals, fetch_meals, mysql_connector
+)
+from services.recommendations import (
+    ACTIVITY_LEVELS, GOALS, RecommendationCache, RecommendationEngine, recommendation_key
+)
+from services.uploads import (
+    RequestSizeLimitMiddleware, StoredUpload, UploadTooLargeError,
+    content_hash, fetch_image, iter_upload_file, stream_upload
+)
+from services.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, ServiceMetrics,
+    cache_collector, engine_collector, job_collector, pool_collector
+)
+from services.profiler import SamplingProfiler
+from services.jobs import JobQueue, JobStore, PermanentJobError
+
 # Load environment variables
 load_dotenv()
 
@@ -32,6 +61,224 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", "16"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))
+# Comma-separated hosts image_url may point to; any public host when unset
+IMAGE_FETCH_ALLOWED_HOSTS = {host.strip().lower() for host in os.getenv("IMAGE_FETCH_ALLOWED_HOSTS", "").split(",")
+                             if host.strip()}
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+MAX_ANALYSIS_MEALS = int(os.getenv("MAX_ANALYSIS_MEALS", "1000000"))
+
+# Reject oversized uploads from Content-Length before the body is parsed
+MULTIPART_OVERHEAD = 64 * 1024
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/upload-food-image": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+        "/upload-food-image/stream": MAX_UPLOAD_BYTES,
+        "/recognize-food/batch": (MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD) * MAX_BATCH_IMAGES,
+        "/jobs/upload-food-image": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+    }
+)
+
+# Worker pool for blocking model work; each worker owns a FoodRecognitionModel
+inference_pool = InferencePool(
+    partial(
+        FoodRecognitionModel, os.getenv("FOOD_MODEL_PATH"), os.getenv("FOOD_MODEL_BACKEND"),
+        nutrition_snapshot=os.getenv("NUTRITION_SNAPSHOT"),
+        architecture=os.getenv("FOOD_MODEL_ARCHITECTURE"),
+        input_size=int(os.getenv("FOOD_MODEL_INPUT_SIZE", "0")) or None
+    ),
+    mode=os.getenv("INFERENCE_POOL_MODE", "thread"),
+    workers=int(os.getenv("INFERENCE_WORKERS", "0")) or None,
+    max_pending=int(os.getenv("INFERENCE_MAX_PENDING", "64"))
+)
+
+# Micro-batching inference engine dispatching batches to the pool
+inference_engine = BatchInferenceEngine(
+    runner=partial(inference_pool.submit, "predict_images"),
+    max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16")),
+    max_wait_ms=float(os.getenv("INFERENCE_MAX_WAIT_MS", "5")),
+    max_queue_size=int(os.getenv("INFERENCE_MAX_QUEUE", "256")),
+    # One batch in flight per pool worker
+    max_concurrent_batches=int(os.getenv("INFERENCE_MAX_CONCURRENT_BATCHES", "0")) or inference_pool.workers
+)
+
+# Content-addressed cache of predictions for repeated uploads
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "1024")),
+    max_bytes=int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL", "3600")),
+    max_distance=int(os.getenv("PREDICTION_CACHE_PHASH_DISTANCE", "0"))
+)
+
+nutrition_analyzer = NutritionAnalyzer()
+
+# Foods catalog for search, recommendations and cached predictions; the
+# same model path and snapshot as the workers, so it resolves nutrition
+# from the same source (a shared bundle's tables included), never loading
+# the model itself
+nutrition_catalog = FoodRecognitionModel(
+    os.getenv("FOOD_MODEL_PATH"), os.getenv("FOOD_MODEL_BACKEND"), lazy=True,
+    nutrition_snapshot=os.getenv("NUTRITION_SNAPSHOT")
+)
+
+# Fuzzy name search for description-based recognition, rebuilt with the catalog
+food_search = FoodSearch(lambda: nutrition_catalog.nutrition_store, index_path=os.getenv("FOOD_SEARCH_INDEX"))
+
+# Running per-day totals, updated by meal deltas from the backend
+daily_totals = DailyTotalsStore(
+    path=os.getenv("DAILY_TOTALS_DB", "daily_totals.db"),
+    max_entries=int(os.getenv("DAILY_TOTALS_CACHE_SIZE", "100000"))
+)
+
+# Database access: MySQL when DB_HOST is set, else a local SQLite copy of
+# the schema (database/schema_sqlite.sql, created if missing) at
+# DATABASE_SQLITE_PATH (development); disabled without either
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "5"))
+database: Optional[Database] = None
+if os.getenv("DB_HOST"):
+    database = Database(
+        mysql_connector(
+            host=os.getenv("DB_HOST"),
+            port=int(os.getenv("DB_PORT", "3306")),
+            user=os.getenv("DB_USER", "root"),
+            password=os.getenv("DB_PASSWORD", ""),
+            database=os.getenv("DB_NAME", "health_tracker")
+        ),
+        max_size=DB_POOL_SIZE,
+        acquire_timeout=DB_ACQUIRE_TIMEOUT
+    )
+elif os.getenv("DATABASE_SQLITE_PATH"):
+    create_sqlite_schema(os.getenv("DATABASE_SQLITE_PATH"))
+    database = Database.sqlite(os.getenv("DATABASE_SQLITE_PATH"), DB_POOL_SIZE, DB_ACQUIRE_TIMEOUT)
+
+# Background jobs persisted in SQLite (see the /jobs endpoints)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+job_queue = JobQueue(
+    JobStore(os.getenv("JOBS_DB", "jobs.db")),
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+    retry_backoff=float(os.getenv("JOB_RETRY_BACKOFF", "2")),
+    retention_seconds=float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+)
+
+# Prometheus metrics on /metrics: request latency and counts, per-stage
+# timings (upload, cache, decode, inference, framework, ...) and model
+# batch statistics. Outermost middleware, so it also times rejections.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+metrics = ServiceMetrics()
+if METRICS_ENABLED:
+    for collector in (engine_collector(inference_engine), pool_collector(inference_pool),
+                      cache_collector(prediction_cache), job_collector(job_queue)):
+        metrics.registry.add_collector(collector)
+    add_stage_observer(metrics.observe_stage)
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Opt-in sampling profiler behind /debug/profiler (off unless PROFILER_ENABLED=1)
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+profiler = SamplingProfiler(
+    interval_ms=float(os.getenv("PROFILER_INTERVAL_MS", "10")),
+    max_duration_s=float(os.getenv("PROFILER_MAX_DURATION", "300"))
+)
+
+INFERENCE_WARMUP = os.getenv("INFERENCE_WARMUP", "1") == "1"
+background_tasks = set()
+
+@app.on_event("startup")
+async def start_inference_engine():
+    daily_totals.open()
+    if database is not None:
+        await database.open()
+    food_search.current()
+    recommendation_cache.warm(recommendation_key(goal, level) for goal in GOALS for level in ACTIVITY_LEVELS)
+    inference_pool.start()
+    await inference_engine.start()
+    await job_queue.start()
+    
+    # Load models in the background so the server accepts traffic (and
+    # answers /health) immediately; /ready flips once workers are warm
+    if INFERENCE_WARMUP:
+        task = asyncio.create_task(inference_pool.warm_up())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+@app.on_event("shutdown")
+async def stop_inference_engine():
+    await job_queue.stop()
+    await inference_engine.stop()
+    inference_pool.shutdown()
+    daily_totals.close()
+    profiler.stop()
+    if database is not None:
+        await database.close()
+
+async def run_inference(method: str, *args) -> Any:
+    """
+    Run a FoodRecognitionModel method on the worker pool, mapping
+    saturation to 503 so clients back off instead of piling up
+    """
+    try:
+        with stage("worker"):
+            return await inference_pool.submit(method, *args)
+    except PoolSaturatedError:
+        raise HTTPException(status_code=503, detail="Inference service is busy", headers={"Retry-After": "1"})
+
+async def lookup_prediction(digest: str, source) -> Tuple[Optional[int], Optional[tuple]]:
+    """
+    Look up image content in the prediction cache by its hash. `source`
+    (bytes or file path) is only decoded when a perceptual hash is needed.
+    Returns (perceptual hash, cached prediction or None).
+    """
+    phash = None
+    with stage("cache"):
+        cached = prediction_cache.get(digest, record_miss=not prediction_cache.perceptual_enabled)
+        if cached is None and prediction_cache.perceptual_enabled:
+            try:
+                phash = await run_in_threadpool(perceptual_hash, source)
+            except Exception:
+                # Undecodable bytes fail later, in the model's own decoder
+                phash = None
+            cached = prediction_cache.get(digest, phash)
+    return phash, cached
+
+async def predict_image(image, portion_grams: Optional[float] = None):
+    """
+    Predict one image (bytes or file path) through the micro-batching
+    engine; the worker decodes the whole batch into its pooled buffer
+    """
+    try:
+        with stage("engine"):
+            return await inference_engine.predict(image, portion_grams)
+    except (asyncio.QueueFull, PoolSaturatedError):
+        raise HTTPException(status_code=503, detail="Inference service is busy", headers={"Retry-After": "1"})
+
+async def recognize_image(digest: str, source, portion_grams: Optional[float] = None) -> tuple:
+    """
+    Recognize one image (bytes or file path) with content hash `digest`,
+    from the prediction cache or through the batching inference engine
+    """
+    phash, cached = await lookup_prediction(digest, source)
+    if cached is not None:
+        return with_portion(cached, portion_grams)
+    prediction = await predict_image(source, portion_grams)
+    # Cache only predictions at the estimated portion
+    if portion_grams is None:
+        prediction_cache.put(digest, prediction, phash)
+    return prediction
+
+def serving_nutrition(candidates: List[Dict[str, Any]]) -> Tuple[float, Dict[str, float]]:
+    """
+    Calories and other nutrients of the best candidate's portion (the
+    recognized serving or the grams eaten), not per 100 g
+    """
+    nutritional_info = dict(candidates[0]["nutritional_info"])
+    return nutritional_info.pop("calories", 0.0), nutritional_info
+
 # Pydantic models
 class FoodRecognitionRequest(BaseModel):
     image_url: Optional[str] = None
@@ -42,11 +289,39 @@ class FoodRecognitionResponse(BaseModel):
     confidence: float
     estimated_calories: float
     nutritional_info: Dict[str, float]
+    # Top-k alternatives, for image recognition
+    candidates: List[Dict[str, Any]] = []
+
+class BatchRecognitionItem(BaseModel):
+    index: int
+    source: str
+    success: bool
+    food_name: Optional[str] = None
+    confidence: Optional[float] = None
+    estimated_calories: Optional[float] = None
+    nutritional_info: Optional[Dict[str, float]] = None
+    # Top-k classes with nutrition scaled to the portion eaten
+    candidates: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+
+class BatchRecognitionResponse(BaseModel):
+    results: List[BatchRecognitionItem]
+    succeeded: int
+    failed: int
+
+class MealNutrition(BaseModel):
+    calories: float = 0
+    protein: float = 0
+    carbs: float = 0
+    fat: float = 0
 
 class NutritionAnalysisRequest(BaseModel):
     user_id: int
-    meals: List[Dict[str, Any]]
+    # Leave empty to analyze the running totals recorded for this date
+    meals: List[MealNutrition] = []
     date: str
+    # Active user_goals rows (user_id, goal_type, target_value, target_unit)
+    goals: Optional[List[Dict[str, Any]]] = None
 
 class NutritionAnalysisResponse(BaseModel):
     total_calories: float
@@ -56,26 +331,140 @@ class NutritionAnalysisResponse(BaseModel):
     recommendations: List[str]
     health_score: float
 
+class MealTotalsUpdate(BaseModel):
+    user_id: int
+    meal_date: str
+    calories: float = 0
+    protein: float = 0
+    carbs: float = 0
+    fat: float = 0
+
+class DailyTotalsResponse(BaseModel):
+    user_id: int
+    meal_date: str
+    meal_count: int
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+
+class NutritionBatchAnalysisRequest(BaseModel):
+    # Columnar meals: element i of every list describes meal i
+    user_ids: List[int]
+    meal_dates: List[str]
+    calories: List[float]
+    protein: List[float]
+    carbs: List[float]
+    fat: List[float]
+    goals: Optional[List[Dict[str, Any]]] = None
+
+class UserNutritionAnalysisRequest(BaseModel):
+    user_ids: List[int]
+    start_date: str
+    # Defaults to start_date
+    end_date: Optional[str] = None
+
+class NutritionDayAnalysis(BaseModel):
+    user_id: int
+    meal_date: str
+    total_calories: float
+    total_protein: float
+    total_carbs: float
+    total_fat: float
+    health_score: float
+    recommendations: List[str]
+
+class NutritionBatchAnalysisResponse(BaseModel):
+    days: List[NutritionDayAnalysis]
+
 class RecommendationRequest(BaseModel):
     user_id: int
     current_goals: str
     activity_level: str
     dietary_preferences: Optional[List[str]] = None
+    # Rank against what is left of today's budget: given explicitly, or
+    # derived from the recorded daily totals for `date`
+    remaining: Optional[Dict[str, float]] = None
+    date: Optional[str] = None
+    meals_left: Optional[int] = None
 
 class RecommendationResponse(BaseModel):
     meal_suggestions: List[Dict[str, Any]]
     exercise_recommendations: List[Dict[str, Any]]
     health_tips: List[str]
+    # Dietary preferences the catalogs have no tag for; meal_suggestions
+    # is empty when any are present
+    unsupported_preferences: List[str] = []
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
+        "ready": model_ready(),
+        "model_status": inference_pool.status,
         "timestamp": datetime.now().isoformat(),
         "service": "Health Tracker AI Service"
     }
 
+def model_ready() -> bool:
+    # Without warm-up, models load on first use and the pool is ready once started
+    return inference_pool.ready or (not INFERENCE_WARMUP and inference_pool.status == 'started')
+
+# Readiness probe: 503 until the recognition model is loaded and warmed up
+@app.get("/ready")
+async def readiness_check():
+    if not model_ready():
+        raise HTTPException(status_code=503, detail=f"Model {inference_pool.status}")
+    return {"ready": True, "warm_up_seconds": inference_pool.warm_up_seconds}
+
+# Inference engine statistics for tuning batch size and wait time
+@app.get("/inference/stats")
+async def inference_stats():
+    return {
+        "engine": inference_engine.get_stats(),
+        "pool": inference_pool.get_stats(),
+        "cache": prediction_cache.get_stats()
+    }
+
+# Connection pool and per-query timings
+@app.get("/database/stats")
+async def database_stats():
+    if database is None:
+        raise HTTPException(status_code=404, detail="Database is not configured")
+    return database.get_stats()
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics_endpoint():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+def require_profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+
+# Sampling profiler toggle for hot-path analysis
+@app.post("/debug/profiler/start", dependencies=[Depends(require_profiler)])
+async def start_profiler(interval_ms: Optional[float] = None, duration_s: Optional[float] = None):
+    profiler.start(interval_ms, duration_s)
+    return profiler.get_stats()
+
+@app.post("/debug/profiler/stop", dependencies=[Depends(require_profiler)])
+async def stop_profiler():
+    await run_in_threadpool(profiler.stop)
+    return {**profiler.get_stats(), "top": profiler.top_functions()}
+
+@app.get("/debug/profiler", dependencies=[Depends(require_profiler)])
+async def profiler_report(format: str = "top", limit: int = 20):
+    """
+    Samples so far: top functions as JSON, or format=collapsed for flame graphs
+    """
+    if format == "collapsed":
+        return Response(content=profiler.collapsed(), media_type="text/plain")
+    return {**profiler.get_stats(), "top": profiler.top_functions(limit)}
+
 # Food recognition endpoint
 @app.post("/recognize-food", response_model=FoodRecognitionResponse)
 async def recognize_food(request: FoodRecognitionRequest):
@@ -83,41 +472,160 @@ async def recognize_food(request: FoodRecognitionRequest):
     Recognize food from image or description and provide nutritional information
     """
     try:
-        # Placeholder implementation - replace with actual ML model
         if request.image_url:
-            # Image-based food recognition would go here
-            # For now, return mock data
+            try:
+                with stage("upload"):
+                    content = await run_in_threadpool(_fetch_image_bytes, request.image_url)
+            except (requests.RequestException, ValueError, UploadTooLargeError) as e:
+                raise HTTPException(status_code=400, detail=f"Could not fetch image_url: {str(e)}")
+            food_name, confidence, _, candidates = await recognize_image(content_hash(content), content)
+            # Report the dish's serving, like the description path, not per 100 g
+            estimated_calories, nutritional_info = serving_nutrition(candidates)
             return FoodRecognitionResponse(
-                food_name="Cơm trắng",
-                confidence=0.85,
-                estimated_calories=130.0,
-                nutritional_info={
-                    "protein": 2.7,
-                    "carbs": 28.0,
-                    "fat": 0.3,
-                    "fiber": 0.4
-                }
+                food_name=food_name,
+                confidence=confidence,
+                estimated_calories=estimated_calories,
+                nutritional_info=nutritional_info,
+                candidates=candidates
             )
         elif request.description:
-            # Text-based food recognition would go here
+            with stage("search"):
+                matches = food_search.search(request.description, k=1)
+            if not matches:
+                raise HTTPException(status_code=404, detail="No food matches the description")
+            match = matches[0]
+            nutritional_info = match["nutrition"]
             return FoodRecognitionResponse(
-                food_name="Phở bò",
-                confidence=0.92,
-                estimated_calories=350.0,
-                nutritional_info={
-                    "protein": 15.0,
-                    "carbs": 45.0,
-                    "fat": 8.0,
-                    "fiber": 2.0
-                }
+                food_name=match["food_name"],
+                confidence=round(match["score"], 4),
+                estimated_calories=nutritional_info.pop("calories"),
+                nutritional_info=nutritional_info
             )
         else:
             raise HTTPException(status_code=400, detail="Either image_url or description must be provided")
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Food recognition error: {str(e)}")
         raise HTTPException(status_code=500, detail="Food recognition failed")
 
+def _fetch_image_bytes(image_url: str) -> bytes:
+    """
+    Download an image for recognition, capped at MAX_UPLOAD_BYTES like uploads
+    """
+    return fetch_image(image_url, MAX_UPLOAD_BYTES, IMAGE_FETCH_TIMEOUT, IMAGE_FETCH_ALLOWED_HOSTS)
+
+# Batch food recognition endpoint
+@app.post("/recognize-food/batch", response_model=BatchRecognitionResponse)
+async def recognize_food_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    image_urls: Optional[List[str]] = Form(None),
+    portion_grams: Optional[List[float]] = Form(None)
+):
+    """
+    Recognize many food images (uploads and/or URLs) in a single forward pass.
+    A bad image fails only its own item. portion_grams gives the grams eaten
+    per item (files first, then URLs); 0 means estimate from serving size.
+    """
+    files = files or []
+    image_urls = image_urls or []
+    total = len(files) + len(image_urls)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="At least one file or image_url must be provided")
+    if total > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IMAGES} images per batch")
+    if portion_grams is not None and len(portion_grams) != total:
+        raise HTTPException(status_code=400, detail="portion_grams needs one value per image")
+    portions = [grams if grams and grams > 0 else None for grams in (portion_grams or [None] * total)]
+    
+    sources = [file.filename or f"file_{index}" for index, file in enumerate(files)] + list(image_urls)
+    
+    async def read_upload(file: UploadFile) -> Tuple[str, str]:
+        # Streamed to disk in chunks like /upload-food-image; workers decode by path
+        if not file.content_type or not file.content_type.startswith('image/'):
+            raise ValueError("File must be an image")
+        stored = await stream_upload(
+            iter_upload_file(file, UPLOAD_CHUNK_SIZE), UPLOAD_DIR, file.filename, MAX_UPLOAD_BYTES
+        )
+        return stored.digest, stored.path
+    
+    async def fetch_url(image_url: str) -> Tuple[str, bytes]:
+        content = await run_in_threadpool(_fetch_image_bytes, image_url)
+        return content_hash(content), content
+    
+    async def load_item(index: int, load):
+        try:
+            return index, await load, None
+        except Exception as e:
+            logger.error(f"Batch item {index} ({sources[index]}) failed: {str(e)}")
+            return index, None, str(e)
+    
+    try:
+        # Read and download all items concurrently
+        with stage("upload"):
+            loaded = await asyncio.gather(
+                *[load_item(index, read_upload(file)) for index, file in enumerate(files)],
+                *[load_item(len(files) + offset, fetch_url(image_url))
+                  for offset, image_url in enumerate(image_urls)]
+            )
+        
+        errors = {index: error for index, _, error in loaded if error is not None}
+        predictions = {}
+        misses = []
+        for index, item, error in loaded:
+            if error is not None:
+                continue
+            digest, source = item
+            phash, cached = await lookup_prediction(digest, source)
+            if cached is not None:
+                predictions[index] = with_portion(cached, portions[index])
+            else:
+                misses.append((index, source, digest, phash))
+        
+        # Decode cache misses into a pooled batch buffer and run one forward pass
+        if misses:
+            batch_predictions, decode_errors = await run_inference(
+                "predict_images", [m[1] for m in misses], [portions[m[0]] for m in misses]
+            )
+            for i, prediction in batch_predictions.items():
+                index, _, digest, phash = misses[i]
+                predictions[index] = prediction
+                # Cache only predictions at the estimated portion
+                if portions[index] is None:
+                    prediction_cache.put(digest, prediction, phash)
+            errors.update({misses[i][0]: error for i, error in decode_errors.items()})
+        
+        results = []
+        for index in range(total):
+            if index in predictions:
+                food_name, confidence, _, candidates = predictions[index]
+                # Nutrition of the portion eaten (portion_grams) or the estimated serving
+                estimated_calories, nutritional_info = serving_nutrition(candidates)
+                results.append(BatchRecognitionItem(
+                    index=index,
+                    source=sources[index],
+                    success=True,
+                    food_name=food_name,
+                    confidence=confidence,
+                    estimated_calories=estimated_calories,
+                    nutritional_info=nutritional_info,
+                    candidates=candidates
+                ))
+            else:
+                results.append(BatchRecognitionItem(
+                    index=index, source=sources[index], success=False, error=errors.get(index, "Unknown error")
+                ))
+        
+        succeeded = sum(1 for item in results if item.success)
+        return BatchRecognitionResponse(results=results, succeeded=succeeded, failed=total - succeeded)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch food recognition error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Batch food recognition failed")
+
 # Nutrition analysis endpoint
 @app.post("/analyze-nutrition", response_model=NutritionAnalysisResponse)
 async def analyze_nutrition(request: NutritionAnalysisRequest):
@@ -125,47 +633,163 @@ async def analyze_nutrition(request: NutritionAnalysisRequest):
     Analyze daily nutrition intake and provide insights
     """
     try:
-        # Calculate total nutrition from meals
-        total_calories = sum(meal.get('calories', 0) for meal in request.meals)
-        total_protein = sum(meal.get('protein', 0) for meal in request.meals)
-        total_carbs = sum(meal.get('carbs', 0) for meal in request.meals)
-        total_fat = sum(meal.get('fat', 0) for meal in request.meals)
+        # Same compiled rule set as the batch analysis and NutritionAnalyzer
+        if request.meals:
+            meals = [meal.model_dump() for meal in request.meals]
+            with stage("analysis"):
+                analysis = nutrition_analyzer.analyze_daily_nutrition(meals, request.user_id, request.goals)
+        else:
+            try:
+                meal_date = normalize_date(request.date)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+            with stage("daily_totals"):
+                totals = await run_in_threadpool(daily_totals.get, request.user_id, meal_date)
+            with stage("analysis"):
+                analysis = nutrition_analyzer.analyze_totals(totals, request.user_id, request.goals)
+        return NutritionAnalysisResponse(**analysis)
+    
+    except HTTPException:
+        raise
+    except (TypeError, ValueError) as e:
+        # Meals are validated by the request model; this is a malformed goal row
+        raise HTTPException(status_code=400, detail=f"Invalid goals: {str(e)}")
+    except Exception as e:
+        logger.error(f"Nutrition analysis error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Nutrition analysis failed")
+
+@app.post("/analyze-nutrition/batch", response_model=NutritionBatchAnalysisResponse)
+async def analyze_nutrition_batch(request: NutritionBatchAnalysisRequest):
+    """
+    Analyze meals of many users and days in one vectorized pass
+    """
+    try:
+        columns = {"user_id": request.user_ids, "meal_date": request.meal_dates}
+        columns.update({name: getattr(request, name) for name in NUTRIENT_COLUMNS})
+        if len({len(values) for values in columns.values()}) > 1:
+            raise HTTPException(status_code=400, detail="All meal columns must have the same length")
+        if len(request.user_ids) > MAX_ANALYSIS_MEALS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_ANALYSIS_MEALS} meals per request")
         
-        # Generate recommendations based on nutrition analysis
-        recommendations = []
-        health_score = 80.0  # Base score
+        with stage("analysis"):
+            result = await run_in_threadpool(nutrition_analyzer.analyze_batch, columns, goals=request.goals)
+        return NutritionBatchAnalysisResponse(days=list(iter_results(result, nutrition_analyzer.rules)))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch nutrition analysis error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Batch nutrition analysis failed")
+
+@app.post("/analyze-nutrition/users", response_model=NutritionBatchAnalysisResponse)
+async def analyze_nutrition_users(request: UserNutritionAnalysisRequest):
+    """
+    Analyze the logged meals of many users over a date range, loading
+    meals and active goals with one query each
+    """
+    try:
+        if database is None:
+            raise HTTPException(status_code=503, detail="Database is not configured")
+        start_date = normalize_date(request.start_date)
+        end_date = normalize_date(request.end_date or request.start_date)
         
-        if total_calories < 1200:
-            recommendations.append("Bạn cần tăng lượng calo nạp vào. Hãy thêm các bữa ăn nhẹ lành mạnh.")
-            health_score -= 10
-        elif total_calories > 2500:
-            recommendations.append("Lượng calo hơi cao. Hãy cân nhắc giảm khẩu phần ăn.")
-            health_score -= 5
-            
-        if total_protein < 50:
-            recommendations.append("Cần tăng lượng protein. Hãy thêm thịt, cá, đậu vào bữa ăn.")
-            health_score -= 8
-            
-        if total_fat > 80:
-            recommendations.append("Lượng chất béo hơi cao. Hãy chọn thực phẩm ít béo hơn.")
-            health_score -= 5
-            
-        if not recommendations:
-            recommendations.append("Chế độ dinh dưỡng của bạn rất tốt! Hãy duy trì.")
-            health_score += 5
-            
-        return NutritionAnalysisResponse(
-            total_calories=total_calories,
-            total_protein=total_protein,
-            total_carbs=total_carbs,
-            total_fat=total_fat,
-            recommendations=recommendations,
-            health_score=max(0, min(100, health_score))
+        with stage("database"):
+            meals, goals = await asyncio.gather(
+                fetch_meals(database, request.user_ids, start_date, end_date),
+                fetch_active_goals(database, request.user_ids)
+            )
+        if not meals:
+            return NutritionBatchAnalysisResponse(days=[])
+        meals["meal_date"] = [str(value)[:10] for value in meals["meal_date"]]
+        with stage("analysis"):
+            result = await run_in_threadpool(
+                nutrition_analyzer.analyze_batch, meals, goals=goals or None
+            )
+        return NutritionBatchAnalysisResponse(days=list(iter_results(result, nutrition_analyzer.rules)))
+    
+    except HTTPException:
+        raise
+    except DatabaseBusyError:
+        raise HTTPException(status_code=503, detail="Database is busy", headers={"Retry-After": "1"})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+    except Exception as e:
+        logger.error(f"User nutrition analysis error: {str(e)}")
+        raise HTTPException(status_code=500, detail="User nutrition analysis failed")
+
+@app.put("/daily-totals/meals/{meal_id}", response_model=DailyTotalsResponse)
+async def upsert_meal_totals(meal_id: int, meal: MealTotalsUpdate):
+    """
+    Record a logged or edited meal; applies the delta to its day's totals
+    """
+    try:
+        totals = await run_in_threadpool(
+            daily_totals.upsert_meal, meal_id, meal.user_id, meal.meal_date, meal.model_dump()
         )
+        return DailyTotalsResponse(**totals)
     
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid meal_date, expected YYYY-MM-DD")
     except Exception as e:
-        logger.error(f"Nutrition analysis error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Nutrition analysis failed")
+        logger.error(f"Daily totals update error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Daily totals update failed")
+
+@app.delete("/daily-totals/meals/{meal_id}", response_model=DailyTotalsResponse)
+async def delete_meal_totals(meal_id: int):
+    """
+    Remove a deleted meal from its day's totals
+    """
+    try:
+        totals = await run_in_threadpool(daily_totals.delete_meal, meal_id)
+        if totals is None:
+            raise HTTPException(status_code=404, detail="Meal not found")
+        return DailyTotalsResponse(**totals)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Daily totals delete error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Daily totals update failed")
+
+@app.get("/daily-totals/{user_id}/{meal_date}", response_model=DailyTotalsResponse)
+async def get_daily_totals(user_id: int, meal_date: str):
+    """
+    Running nutrition totals for one user and day
+    """
+    try:
+        return DailyTotalsResponse(**await run_in_threadpool(daily_totals.get, user_id, meal_date))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid meal_date, expected YYYY-MM-DD")
+
+# Ranks foods and exercises over nutrition_catalog
+recommendation_engine = RecommendationEngine(
+    lambda: nutrition_catalog.nutrition_store,
+    exercises_path=os.getenv("EXERCISES_DATA_PATH"),
+    food_k=int(os.getenv("RECOMMENDATION_FOODS", "5")),
+    exercise_k=int(os.getenv("RECOMMENDATION_EXERCISES", "3"))
+)
+
+def render_recommendations(key, remaining: Optional[Dict[str, float]] = None,
+                           meals_left: Optional[int] = None) -> bytes:
+    payload = recommendation_engine.recommend(key, remaining, meals_left)
+    return RecommendationResponse(**payload).model_dump_json().encode("utf-8")
+
+def remaining_budget(request: RecommendationRequest) -> Optional[Dict[str, float]]:
+    if request.remaining is not None:
+        return request.remaining
+    if request.date is None:
+        return None
+    consumed = daily_totals.get(request.user_id, request.date)
+    targets = daily_targets(request.current_goals, request.activity_level)
+    return {name: target - consumed[name] for name, target in targets.items()}
+
+# Responses are invalidated when the engine's nutrition store or exercises
+# are reloaded, or when the backend calls /recommendations/invalidate
+recommendation_cache = RecommendationCache(
+    render_recommendations,
+    max_entries=int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024")),
+    sources=recommendation_engine.sources
+)
 
 # Personalized recommendations endpoint
 @app.post("/recommendations", response_model=RecommendationResponse)
@@ -174,81 +798,63 @@ async def get_recommendations(request: RecommendationRequest):
     Generate personalized meal and exercise recommendations
     """
     try:
-        # Generate meal suggestions based on goals and preferences
-        meal_suggestions = []
-        
-        if request.current_goals == "lose_weight":
-            meal_suggestions = [
-                {
-                    "name": "Salad rau củ với ức gà",
-                    "calories": 250,
-                    "description": "Rau xanh tươi với ức gà nướng, ít calo nhưng giàu protein"
-                },
-                {
-                    "name": "Cá hồi nướng với rau luộc",
-                    "calories": 300,
-                    "description": "Cá hồi giàu omega-3 với rau củ luộc"
-                }
-            ]
-        elif request.current_goals == "gain_weight":
-            meal_suggestions = [
-                {
-                    "name": "Cơm gà nướng với rau xào",
-                    "calories": 500,
-                    "description": "Cơm trắng với gà nướng và rau xào dầu"
-                },
-                {
-                    "name": "Bún bò Huế",
-                    "calories": 450,
-                    "description": "Món bún đậm đà với thịt bò và nước dùng ngon"
-                }
-            ]
-        else:  # maintain_weight
-            meal_suggestions = [
-                {
-                    "name": "Cơm tấm sườn nướng",
-                    "calories": 400,
-                    "description": "Cơm tấm truyền thống với sườn nướng"
-                }
-            ]
-        
-        # Generate exercise recommendations
-        exercise_recommendations = [
-            {
-                "name": "Đi bộ nhanh",
-                "duration": "30 phút",
-                "calories_burned": 150,
-                "description": "Hoạt động nhẹ nhàng, phù hợp mọi lứa tuổi"
-            },
-            {
-                "name": "Yoga",
-                "duration": "45 phút",
-                "calories_burned": 120,
-                "description": "Tăng cường sự dẻo dai và giảm stress"
-            }
-        ]
-        
-        # Generate health tips
-        health_tips = [
-            "Uống đủ 2-3 lít nước mỗi ngày",
-            "Ăn 5-6 bữa nhỏ thay vì 3 bữa lớn",
-            "Ngủ đủ 7-8 tiếng mỗi đêm",
-            "Hạn chế thức ăn nhanh và đồ ngọt"
-        ]
-        
-        return RecommendationResponse(
-            meal_suggestions=meal_suggestions,
-            exercise_recommendations=exercise_recommendations,
-            health_tips=health_tips
-        )
+        key = recommendation_key(request.current_goals, request.activity_level, request.dietary_preferences)
+        if request.remaining is None and request.date is None:
+            # Pre-serialized JSON, rendered once per parameter combination
+            with stage("recommend"):
+                body = recommendation_cache.get(key)
+        else:
+            # Budget-specific rankings are cheap but not shareable; skip the cache
+            def render_for_budget() -> bytes:
+                return render_recommendations(key, remaining_budget(request), request.meals_left)
+            with stage("recommend"):
+                body = await run_in_threadpool(render_for_budget)
+        return Response(content=body, media_type="application/json")
     
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
     except Exception as e:
         logger.error(f"Recommendations error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to generate recommendations")
 
+@app.post("/recommendations/invalidate")
+async def invalidate_recommendations():
+    """
+    Drop cached recommendations after foods or exercises data changed
+    """
+    recommendation_cache.invalidate()
+    return recommendation_cache.get_stats()
+
+def with_portion(prediction: tuple, portion_grams: Optional[float]) -> tuple:
+    """
+    A cached prediction for another portion, with nutrition from the current
+    nutrition store (which may have been reloaded since it was cached)
+    """
+    return refresh_nutrition(prediction, nutrition_catalog.nutrition_store, portion_grams)
+
+async def recognize_stored_upload(stored: StoredUpload, portion_grams: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Recognize an upload already streamed to disk. Decoding reads the file
+    by path, so workers never receive the whole payload in memory.
+    """
+    portion_grams = portion_grams if portion_grams and portion_grams > 0 else None
+    food_name, confidence, _, candidates = await recognize_image(stored.digest, stored.path, portion_grams)
+    # Same figures as /recognize-food: the best candidate's portion, not per 100 g
+    best = candidates[0]
+    
+    return {
+        "message": "Image uploaded successfully",
+        "file_path": stored.path,
+        "food_name": food_name,
+        "confidence": confidence,
+        "portion_grams": best["portion_grams"],
+        "nutritional_info": best["nutritional_info"],
+        "candidates": candidates
+    }
+
 # Image upload endpoint for food recognition
 @app.post("/upload-food-image")
-async def upload_food_image(file: UploadFile = File(...)):
+async def upload_food_image(file: UploadFile = File(...), portion_grams: Optional[float] = Form(None)):
     """
     Upload food image for recognition
     """
@@ -257,28 +863,186 @@ async def upload_food_image(file: UploadFile = File(...)):
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Save file (in production, use cloud storage)
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = os.path.join(upload_dir, f"{datetime.now().timestamp()}_{file.filename}")
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream to disk under its content hash (in production, use cloud storage);
+        # re-uploads of the same photo reuse the stored file
+        with stage("upload"):
+            stored = await stream_upload(
+                iter_upload_file(file, UPLOAD_CHUNK_SIZE), UPLOAD_DIR, file.filename, MAX_UPLOAD_BYTES
+            )
+        return await recognize_stored_upload(stored, portion_grams)
+    
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Image upload error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Image upload failed")
+
+# Raw-body image upload, streamed straight from the socket without multipart parsing
+@app.post("/upload-food-image/stream")
+async def upload_food_image_stream(request: Request, filename: Optional[str] = None,
+                                   portion_grams: Optional[float] = None):
+    """
+    Upload food image as the raw request body (Content-Type: image/*)
+    """
+    try:
+        if not request.headers.get('content-type', '').startswith('image/'):
+            raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Here you would process the image with your ML model
-        # For now, return mock response
-        return {
-            "message": "Image uploaded successfully",
-            "file_path": file_path,
-            "food_name": "Cơm trắng",
-            "confidence": 0.85
-        }
+        with stage("upload"):
+            stored = await stream_upload(request.stream(), UPLOAD_DIR, filename, MAX_UPLOAD_BYTES)
+        return await recognize_stored_upload(stored, portion_grams)
     
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Image upload error: {str(e)}")
         raise HTTPException(status_code=500, detail="Image upload failed")
 
+# Asynchronous jobs: submit returns a job id at once and a worker runs the
+# job later, so bursts of uploads or long analyses do not hold requests open
+class JobSubmitRequest(BaseModel):
+    kind: str
+    payload: Dict[str, Any]
+    # Higher runs first
+    priority: int = 0
+    max_attempts: Optional[int] = None
+    # Earliest start, e.g. to schedule heavy analyses off-peak
+    run_after: Optional[datetime] = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    created_at: str
+    run_after: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
+def job_response(job: Dict[str, Any]) -> JobResponse:
+    def iso(timestamp: Optional[float]) -> Optional[str]:
+        return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+    return JobResponse(
+        job_id=job["id"], kind=job["kind"], status=job["status"], priority=job["priority"],
+        attempts=job["attempts"], max_attempts=job["max_attempts"], created_at=iso(job["created_at"]),
+        run_after=iso(job["run_after"]), started_at=iso(job["started_at"]), finished_at=iso(job["finished_at"]),
+        result=job["result"], error=job["error"]
+    )
+
+def job_handler(run):
+    """
+    Run an endpoint coroutine as a job: client errors fail the job for
+    good, server errors (busy pool or database, crashes) are retried
+    """
+    async def handle(payload: Dict[str, Any]):
+        try:
+            result = await run(payload)
+        except HTTPException as e:
+            if e.status_code < 500:
+                raise PermanentJobError(e.detail)
+            raise RuntimeError(e.detail)
+        except ValueError as e:
+            # Includes pydantic validation errors
+            raise PermanentJobError(str(e))
+        return result.model_dump() if isinstance(result, BaseModel) else result
+    return handle
+
+async def recognize_image_job(payload: Dict[str, Any]):
+    if not os.path.exists(payload["path"]):
+        raise PermanentJobError("Uploaded image no longer exists")
+    stored = StoredUpload(payload["path"], payload["digest"], os.path.getsize(payload["path"]), duplicate=True)
+    return await recognize_stored_upload(stored, payload.get("portion_grams"))
+
+JOB_REQUEST_MODELS = {
+    "analyze_users": UserNutritionAnalysisRequest,
+    "analyze_batch": NutritionBatchAnalysisRequest,
+}
+job_queue.register("recognize_image", job_handler(recognize_image_job))
+job_queue.register("analyze_users", job_handler(
+    lambda payload: analyze_nutrition_users(UserNutritionAnalysisRequest(**payload))))
+job_queue.register("analyze_batch", job_handler(
+    lambda payload: analyze_nutrition_batch(NutritionBatchAnalysisRequest(**payload))))
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(request: JobSubmitRequest):
+    """
+    Queue an analysis job ("analyze_users" or "analyze_batch", with the
+    same payload as the matching /analyze-nutrition endpoint)
+    """
+    model = JOB_REQUEST_MODELS.get(request.kind)
+    if model is None:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind, expected one of {sorted(JOB_REQUEST_MODELS)}")
+    try:
+        # Reject bad payloads now rather than when a worker picks them up
+        payload = model(**request.payload).model_dump()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = await job_queue.submit(
+        request.kind, payload, request.priority, request.max_attempts or JOB_MAX_ATTEMPTS,
+        request.run_after.timestamp() if request.run_after else None
+    )
+    return job_response(job)
+
+@app.post("/jobs/upload-food-image", response_model=JobResponse, status_code=202)
+async def submit_upload_job(file: UploadFile = File(...), portion_grams: Optional[float] = Form(None),
+                            priority: int = Form(0), run_after: Optional[datetime] = Form(None)):
+    """
+    Store a food image and queue its recognition; poll GET /jobs/{job_id}
+    """
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    try:
+        with stage("upload"):
+            stored = await stream_upload(
+                iter_upload_file(file, UPLOAD_CHUNK_SIZE), UPLOAD_DIR, file.filename, MAX_UPLOAD_BYTES
+            )
+        job = await job_queue.submit(
+            "recognize_image", {"path": stored.path, "digest": stored.digest, "portion_grams": portion_grams},
+            priority, JOB_MAX_ATTEMPTS, run_after.timestamp() if run_after else None
+        )
+        return job_response(job)
+    
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        logger.error(f"Upload job error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Image upload failed")
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return await job_queue.get_stats()
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, wait: float = 0):
+    """
+    Job status and, once succeeded, its result. With wait > 0 the request
+    is held until the job finishes or `wait` seconds pass (long polling).
+    """
+    job = await job_queue.wait(job_id, min(max(wait, 0.0), JOB_MAX_WAIT))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@app.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """
+    Cancel a job that has not started yet
+    """
+    if not await job_queue.cancel(job_id):
+        job = await job_queue.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job_response(await job_queue.get(job_id))
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -0,0 +1,122 @@
+"""
+Keras backbones for FoodRecognitionModel.
+
+'cnn' is the original four-conv network. Its Flatten -> Dense(512) head
+holds most of its 9.7M parameters at 224x224, and its size grows with
+input resolution. 'mobilenet' is a MobileNetV1-style stack of depthwise
+separable convolutions with a global-average-pooled head. At width 0.5
+it has 0.7M parameters at any resolution, and at 224x224 it needs
+122M multiply-adds per image against the CNN's 555M.
+
+    python benchmarks/backbone_benchmark.py --architectures cnn mobilenet --sizes 224 160
+"""
+from typing import Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHITECTURE = 'cnn'
+DEFAULT_INPUT_SIZE = 224
+
+# (output channels at width 1.0, stride) of each depthwise separable block
+MOBILENET_BLOCKS = [
+    (64, 1), (128, 2), (128, 1), (256, 2), (256, 1), (512, 2),
+    (512, 1), (512, 1), (512, 1), (1024, 2), (1024, 1),
+]
+
+
+def build_cnn(num_classes: int, input_size: int = DEFAULT_INPUT_SIZE, **_):
+    """
+    The original food recognition CNN
+    """
+    import tensorflow as tf
+
+    return tf.keras.Sequential([
+        tf.keras.Input(shape=(input_size, input_size, 3)),
+        tf.keras.layers.Conv2D(32, (3, 3), activation='relu'),
+        tf.keras.layers.MaxPooling2D(2, 2),
+        tf.keras.layers.Conv2D(64, (3, 3), activation='relu'),
+        tf.keras.layers.MaxPooling2D(2, 2),
+        tf.keras.layers.Conv2D(128, (3, 3), activation='relu'),
+        tf.keras.layers.MaxPooling2D(2, 2),
+        tf.keras.layers.Conv2D(128, (3, 3), activation='relu'),
+        tf.keras.layers.MaxPooling2D(2, 2),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dropout(0.5),
+        tf.keras.layers.Dense(512, activation='relu'),
+        tf.keras.layers.Dense(num_classes, activation='softmax')
+    ], name='cnn')
+
+
+def build_mobilenet(num_classes: int, input_size: int = DEFAULT_INPUT_SIZE, width: float = 0.5,
+                    dropout: float = 0.2, **_):
+    """
+    Depthwise separable backbone; `width` scales every layer's channels
+    """
+    import tensorflow as tf
+
+    layers = tf.keras.layers
+
+    def channels(base: int) -> int:
+        # Keep channel counts multiples of 8 for efficient kernels
+        return max(8, int(base * width + 4) // 8 * 8)
+
+    inputs = tf.keras.Input(shape=(input_size, input_size, 3))
+    x = layers.Conv2D(channels(32), 3, strides=2, padding='same', use_bias=False)(inputs)
+    x = layers.BatchNormalization()(x)
+    x = layers.ReLU(6.0)(x)
+    for filters, stride in MOBILENET_BLOCKS:
+        x = layers.DepthwiseConv2D(3, strides=stride, padding='same', use_bias=False)(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.ReLU(6.0)(x)
+        x = layers.Conv2D(channels(filters), 1, use_bias=False)(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.ReLU(6.0)(x)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dropout(dropout)(x)
+    outputs = layers.Dense(num_classes, activation='softmax')(x)
+    return tf.keras.Model(inputs, outputs, name=f"mobilenet_{width:g}")
+
+
+ARCHITECTURES: Dict[str, Callable] = {
+    'cnn': build_cnn,
+    'mobilenet': build_mobilenet,
+}
+
+
+def build_model(architecture: str, num_classes: int, input_size: int = DEFAULT_INPUT_SIZE, **options):
+    """
+    Build and compile a backbone by name
+    """
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture: {architecture}")
+    model = ARCHITECTURES[architecture](num_classes, input_size, **options)
+    model.compile(
+        optimizer='adam',
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+
+def count_flops(model) -> int:
+    """
+    Multiply-accumulates of one forward pass for one image, counted from
+    the convolution, depthwise and dense layers (the rest is negligible)
+    """
+    import tensorflow as tf
+
+    layers = tf.keras.layers
+    total = 0
+    for layer in model.layers:
+        if isinstance(layer, layers.DepthwiseConv2D):
+            _, height, width, channels = layer.output.shape
+            kernel_h, kernel_w = layer.kernel_size
+            total += height * width * channels * kernel_h * kernel_w
+        elif isinstance(layer, layers.Conv2D):
+            _, height, width, filters = layer.output.shape
+            kernel_h, kernel_w = layer.kernel_size
+            total += height * width * filters * kernel_h * kernel_w * layer.input.shape[-1]
+        elif isinstance(layer, layers.Dense):
+            total += layer.input.shape[-1] * layer.units
+    return int(total)
@@ -1,20 +1,69 @@
-import tensorflow as tf
 import numpy as np
-import cv2
-from PIL import Image
 import os
-from typing import Tuple, Dict, List
+import time
+from typing import Tuple, Dict, List, Optional
 import logging
 
+from .instrumentation import stage
+from .architectures import ARCHITECTURES, DEFAULT_ARCHITECTURE, DEFAULT_INPUT_SIZE, build_model
+from .preprocessing import ImagePreprocessor, ImageSource
+from .runtimes import BACKENDS, KerasRuntime, detect_backend, load_runtime
+from .nutrition_store import BASIC_FIELDS, NutritionStore, NutritionStoreWatcher
+from .nutrition_analysis import analyze_table
+from .recommendation_rules import RuleEngine, UserOverrides, default_rules
+from .shared_weights import NUTRITION_PREFIX, SNAPSHOT_FILENAME, Snapshot, is_shared_bundle
+
 logger = logging.getLogger(__name__)
 
+# Candidates returned per image
+TOP_K = 3
+
+# Grams eaten per image; None means estimate from the food's serving_size
+PortionList = List[Optional[float]]
+
+# (food_name, confidence, per-100g nutrition, top-k candidates)
+Prediction = Tuple[str, float, Dict[str, float], List[Dict]]
+
+
+def refresh_nutrition(prediction: Prediction, store: NutritionStore,
+                      portion_grams: Optional[float] = None) -> Prediction:
+    """
+    A cached prediction with its nutrition looked up again in `store`, so
+    a reloaded nutrition table applies to cached recognitions too. Every
+    candidate is scaled to portion_grams, or to its food's serving size.
+    """
+    food_name, confidence, _, candidates = prediction
+    columns = [store.field_index(field) for field in BASIC_FIELDS]
+    serving_index = store.field_index('serving_size')
+    refreshed = []
+    for candidate in candidates:
+        # Class names resolve to the same rows as in predict_batch
+        per_100g = store.values[store.row_for_name(candidate['food_name'])]
+        grams = float(per_100g[serving_index]) if portion_grams is None else float(portion_grams)
+        refreshed.append(dict(
+            candidate, portion_grams=grams,
+            nutritional_info={field: float(per_100g[i]) * grams / 100.0 for field, i in zip(BASIC_FIELDS, columns)}
+        ))
+    return food_name, confidence, store.row_to_dict(store.values[store.row_for_name(food_name)]), refreshed
+
 class FoodRecognitionModel:
     """
     Food recognition model using CNN for Vietnamese food classification
     """
     
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, backend: str = None, lazy: bool = False,
+                 nutrition_snapshot: str = None, architecture: str = None, input_size: int = None):
         self.model = None
+        self.model_path = model_path
+        self.runtime = None
+        self.backend = backend or detect_backend(model_path)
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown runtime backend: {self.backend}")
+        # Backbone and input resolution for newly built models (see models/architectures.py)
+        self.architecture = architecture or DEFAULT_ARCHITECTURE
+        if self.architecture not in ARCHITECTURES:
+            raise ValueError(f"Unknown architecture: {self.architecture}")
+        input_size = input_size or DEFAULT_INPUT_SIZE
         self.class_names = [
             'cơm trắng', 'phở bò', 'bún bò huế', 'bánh mì', 'chả cá',
             'gỏi cuốn', 'nem nướng', 'bánh xèo', 'cơm tấm', 'bún chả',
@@ -23,101 +72,207 @@ class FoodRecognitionModel:
         ]
         self.nutrition_database = self._load_nutrition_database()
         
-        if model_path and os.path.exists(model_path):
-            self.load_model(model_path)
+        # Columnar nutrition lookups; a snapshot built from the foods table
+        # (see models/nutrition_store.py) replaces the built-in table
+        self._nutrition_watcher = NutritionStoreWatcher(nutrition_snapshot) if nutrition_snapshot else None
+        self._nutrition_store = NutritionStore.from_nutrition_dict(self.nutrition_database, self.class_names)
+        if self.backend == 'shared' and is_shared_bundle(model_path):
+            # Rows of the bundle the runtime maps, also for lazy instances that
+            # never load it (e.g. the API's catalog), so both report the same
+            self._nutrition_store = NutritionStore.from_snapshot(
+                Snapshot(os.path.join(model_path, SNAPSHOT_FILENAME)), NUTRITION_PREFIX
+            )
+        self.preprocessor = ImagePreprocessor(target_size=(input_size, input_size))
+        
+        # With lazy=True the model is built or loaded on first prediction
+        if not lazy:
+            self.ensure_loaded()
+    
+    @property
+    def nutrition_store(self) -> NutritionStore:
+        if self._nutrition_watcher is not None:
+            return self._nutrition_watcher.current()
+        return self._nutrition_store
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self.runtime is not None
+    
+    def ensure_loaded(self):
+        """
+        Build or load the model if that has not happened yet
+        """
+        if self.runtime is not None:
+            return
+        if self.model_path and os.path.exists(self.model_path):
+            self.load_model(self.model_path)
         else:
             self._create_model()
     
+    def warm_up(self, batch_size: int = 1) -> float:
+        """
+        Load the model and run one dummy batch so the first real request
+        does not pay for graph tracing and kernel setup. Returns seconds taken.
+        """
+        started = time.perf_counter()
+        self.ensure_loaded()
+        self.runtime.predict(np.zeros((batch_size,) + self.preprocessor.image_shape, dtype=np.float32))
+        return time.perf_counter() - started
+    
     def _create_model(self):
         """
-        Create a CNN model for food recognition
-        """
-        model = tf.keras.Sequential([
-            tf.keras.layers.Conv2D(32, (3, 3), activation='relu', input_shape=(224, 224, 3)),
-            tf.keras.layers.MaxPooling2D(2, 2),
-            tf.keras.layers.Conv2D(64, (3, 3), activation='relu'),
-            tf.keras.layers.MaxPooling2D(2, 2),
-            tf.keras.layers.Conv2D(128, (3, 3), activation='relu'),
-            tf.keras.layers.MaxPooling2D(2, 2),
-            tf.keras.layers.Conv2D(128, (3, 3), activation='relu'),
-            tf.keras.layers.MaxPooling2D(2, 2),
-            tf.keras.layers.Flatten(),
-            tf.keras.layers.Dropout(0.5),
-            tf.keras.layers.Dense(512, activation='relu'),
-            tf.keras.layers.Dense(len(self.class_names), activation='softmax')
-        ])
-        
-        model.compile(
-            optimizer='adam',
-            loss='categorical_crossentropy',
-            metrics=['accuracy']
-        )
+        Create a CNN model for food recognition (the configured backbone;
+        TensorFlow is only imported here, when a Keras model is needed)
+        """
+        model = build_model(self.architecture, len(self.class_names), self.preprocessor.target_size[0])
         
         self.model = model
-        logger.info("Food recognition model created successfully")
+        self.runtime = KerasRuntime(model)
+        self.backend = 'keras'
+        logger.info(f"Food recognition model created successfully ({self.architecture}, "
+                    f"{self.preprocessor.target_size[0]}px)")
     
     def load_model(self, model_path: str):
         """
-        Load pre-trained model
+        Load pre-trained model (Keras, an exported .tflite/.onnx file, or a
+        shared-weights bundle directory)
         """
         try:
-            self.model = tf.keras.models.load_model(model_path)
-            logger.info(f"Model loaded from {model_path}")
+            if self.backend == 'keras':
+                import tensorflow as tf
+                self.model = tf.keras.models.load_model(model_path)
+                self.runtime = KerasRuntime(self.model)
+                # Feed images at the resolution the saved model was built for
+                height, width = self.model.input_shape[1:3]
+                if height and width and (width, height) != self.preprocessor.target_size:
+                    self.preprocessor = ImagePreprocessor(target_size=(width, height))
+            else:
+                self.runtime = load_runtime(model_path, self.backend)
+            if self.backend == 'shared':
+                # Nutrition rows come from the same memory-mapped snapshot
+                self._nutrition_store = NutritionStore.from_snapshot(self.runtime.snapshot, NUTRITION_PREFIX)
+            logger.info(f"Model loaded from {model_path} (backend={self.backend})")
         except Exception as e:
             logger.error(f"Failed to load model: {str(e)}")
             self._create_model()
     
-    def preprocess_image(self, image_path: str) -> np.ndarray:
+    def preprocess_image(self, image_path: ImageSource) -> np.ndarray:
         """
-        Preprocess image for model input
+        Preprocess image (file path, bytes or binary file object) for model input
         """
         try:
-            # Load and resize image
-            image = Image.open(image_path)
-            image = image.convert('RGB')
-            image = image.resize((224, 224))
-            
-            # Convert to numpy array and normalize
-            image_array = np.array(image) / 255.0
-            image_array = np.expand_dims(image_array, axis=0)
-            
-            return image_array
+            with stage('decode'):
+                return self.preprocessor.preprocess(image_path)
         except Exception as e:
             logger.error(f"Image preprocessing failed: {str(e)}")
             raise
     
-    def predict(self, image_path: str) -> Tuple[str, float, Dict[str, float]]:
+    def predict(self, image_path: str, portion_grams: Optional[float] = None,
+                top_k: int = TOP_K) -> Prediction:
         """
         Predict food from image
         """
         try:
-            if self.model is None:
-                raise ValueError("Model not loaded")
-            
             # Preprocess image
             processed_image = self.preprocess_image(image_path)
             
             # Make prediction
-            predictions = self.model.predict(processed_image)
-            confidence = float(np.max(predictions))
-            predicted_class_idx = int(np.argmax(predictions))
-            predicted_food = self.class_names[predicted_class_idx]
-            
-            # Get nutritional information
-            nutritional_info = self.nutrition_database.get(predicted_food, {
-                'calories': 200.0,
-                'protein': 10.0,
-                'carbs': 30.0,
-                'fat': 5.0,
-                'fiber': 2.0
-            })
-            
-            return predicted_food, confidence, nutritional_info
+            return self.predict_batch(processed_image, [portion_grams], top_k)[0]
             
         except Exception as e:
             logger.error(f"Prediction failed: {str(e)}")
             raise
     
+    def predict_top_k(self, images: np.ndarray, portions: Optional[PortionList] = None,
+                      top_k: int = TOP_K) -> Dict[str, np.ndarray]:
+        """
+        Top-k classes of a batch of preprocessed images, with nutrition
+        scaled to a portion, as (n, k) arrays in one pass. portions holds
+        grams per image; None (or a None entry) estimates the portion as
+        each candidate food's serving_size.
+        """
+        self.ensure_loaded()
+        with stage('inference'):
+            probabilities = np.asarray(self.runtime.predict(images))
+        
+        with stage('postprocess'):
+            return self._top_k(probabilities, portions, top_k)
+    
+    def _top_k(self, probabilities: np.ndarray, portions: Optional[PortionList], top_k: int) -> Dict[str, np.ndarray]:
+        k = min(top_k, probabilities.shape[1])
+        
+        # argpartition finds the k best in O(classes); only those k get sorted
+        top = np.argpartition(probabilities, -k, axis=1)[:, -k:]
+        top_probabilities = np.take_along_axis(probabilities, top, axis=1)
+        order = np.argsort(-top_probabilities, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_probabilities = np.take_along_axis(top_probabilities, order, axis=1)
+        
+        # Foods rows hold values per 100 g; scale every candidate to its portion
+        store = self.nutrition_store
+        per_100g = store.values[store.rows_for_classes(top)]
+        serving_sizes = per_100g[..., store.field_index('serving_size')]
+        requested = np.full(len(top), np.nan) if portions is None else \
+            np.array([np.nan if grams is None else grams for grams in portions], dtype=np.float64)
+        grams = np.where(np.isnan(requested)[:, None], serving_sizes, requested[:, None])
+        columns = [store.field_index(field) for field in BASIC_FIELDS]
+        
+        return {
+            'class_indices': top,
+            'probabilities': top_probabilities,
+            'per_100g': per_100g[..., columns],
+            'portion_grams': grams,
+            'nutrition': per_100g[..., columns] * (grams / 100.0)[..., None],
+        }
+    
+    def predict_batch(self, images: np.ndarray, portions: Optional[PortionList] = None,
+                      top_k: int = TOP_K) -> List[Prediction]:
+        """
+        Predict food for a batch of preprocessed images in one forward pass.
+        Each result is (food_name, confidence, per-100g nutrition of the best
+        class, top-k candidates with portion-scaled nutrition).
+        """
+        top = self.predict_top_k(images, portions, top_k)
+        
+        results = []
+        for classes, probabilities, per_100g, grams, nutrition in zip(
+                top['class_indices'], top['probabilities'], top['per_100g'], top['portion_grams'], top['nutrition']):
+            candidates = [
+                {
+                    'food_name': self.class_names[int(class_idx)],
+                    'probability': float(probability),
+                    'portion_grams': float(portion),
+                    'nutritional_info': dict(zip(BASIC_FIELDS, values.tolist())),
+                }
+                for class_idx, probability, portion, values in zip(classes, probabilities, grams, nutrition)
+            ]
+            results.append((
+                self.class_names[int(classes[0])], float(probabilities[0]),
+                dict(zip(BASIC_FIELDS, per_100g[0].tolist())), candidates
+            ))
+        
+        return results
+    
+    def predict_images(self, sources: List[ImageSource], portions: Optional[PortionList] = None,
+                       top_k: int = TOP_K) -> Tuple[Dict[int, Prediction], Dict[int, str]]:
+        """
+        Decode many images into a pooled batch buffer and predict them in one
+        forward pass. Returns predictions and decode errors keyed by position.
+        """
+        with self.preprocessor.preprocess_batch(sources) as batch:
+            if not batch.indices:
+                return {}, batch.errors
+            batch_portions = [portions[i] for i in batch.indices] if portions is not None else None
+            predictions = self.predict_batch(batch.images, batch_portions, top_k)
+            return dict(zip(batch.indices, predictions)), batch.errors
+    
+    def get_nutritional_info(self, food_name: str) -> Dict[str, float]:
+        """
+        Get nutritional information for a recognized food
+        """
+        store = self.nutrition_store
+        return store.row_to_dict(store.values[store.row_for_name(food_name)])
+    
     def _load_nutrition_database(self) -> Dict[str, Dict[str, float]]:
         """
         Load Vietnamese food nutrition database
@@ -195,14 +350,23 @@ class FoodRecognitionModel:
             }
         }
     
-    def train(self, train_data_path: str, epochs: int = 50):
+    def train(self, train_data_path: str, epochs: int = 50, batch_size: int = 32,
+              cache_dir: Optional[str] = None, checkpoint_dir: Optional[str] = None,
+              checkpoint_steps: Optional[int] = None, validation_split: float = 0.1,
+              seed: Optional[int] = None) -> Dict:
         """
-        Train the model with Vietnamese food dataset
+        Train the model with Vietnamese food dataset (one directory of photos
+        per class, see models/training.py). Returns a report with images/sec.
         """
-        # This would be implemented with actual training data
-        # For now, it's a placeholder
-        logger.info("Training functionality would be implemented here")
-        pass
+        from .training import train_model
+        
+        report = train_model(
+            self, train_data_path, epochs=epochs, batch_size=batch_size, cache_dir=cache_dir,
+            checkpoint_dir=checkpoint_dir, checkpoint_steps=checkpoint_steps,
+            validation_split=validation_split, seed=seed
+        )
+        logger.info(f"Training finished: {report['images_per_s']:.1f} images/s over {len(report['epochs'])} epochs")
+        return report
     
     def save_model(self, model_path: str):
         """
@@ -219,107 +383,77 @@ class NutritionAnalyzer:
     Analyze nutrition patterns and provide recommendations
     """
     
-    def __init__(self):
-        self.recommendation_rules = self._load_recommendation_rules()
+    def __init__(self, rules: Optional[Dict] = None):
+        self.recommendation_rules = rules if rules is not None else self._load_recommendation_rules()
+        # Compiled once; per-user goals are applied as overrides at evaluation time
+        self.rules = RuleEngine.compile(self.recommendation_rules)
+        self.user_overrides = self.rules.compile_overrides([])
+    
+    def set_user_goals(self, goals: List[Dict]):
+        """
+        Replace the per-user thresholds with the given active user_goals rows
+        """
+        self.user_overrides = self.rules.compile_overrides(goals)
+    
+    def overrides_for(self, goals: Optional[List[Dict]]) -> UserOverrides:
+        return self.rules.compile_overrides(goals) if goals else self.user_overrides
     
-    def analyze_daily_nutrition(self, meals: List[Dict]) -> Dict:
+    def analyze_daily_nutrition(self, meals: List[Dict], user_id: Optional[int] = None,
+                                goals: Optional[List[Dict]] = None) -> Dict:
         """
         Analyze daily nutrition intake
         """
-        total_calories = sum(meal.get('calories', 0) for meal in meals)
-        total_protein = sum(meal.get('protein', 0) for meal in meals)
-        total_carbs = sum(meal.get('carbs', 0) for meal in meals)
-        total_fat = sum(meal.get('fat', 0) for meal in meals)
-        
-        # Calculate health score
-        health_score = self._calculate_health_score(total_calories, total_protein, total_carbs, total_fat)
-        
-        # Generate recommendations
-        recommendations = self._generate_recommendations(total_calories, total_protein, total_carbs, total_fat)
+        totals = {
+            'calories': sum(meal.get('calories', 0) for meal in meals),
+            'protein': sum(meal.get('protein', 0) for meal in meals),
+            'carbs': sum(meal.get('carbs', 0) for meal in meals),
+            'fat': sum(meal.get('fat', 0) for meal in meals)
+        }
+        return self.analyze_totals(totals, user_id, goals)
+    
+    def analyze_totals(self, totals: Dict[str, float], user_id: Optional[int] = None,
+                       goals: Optional[List[Dict]] = None) -> Dict:
+        """
+        Analyze precomputed daily totals (e.g. from services/daily_totals.py)
+        """
+        # Score and recommend with the same compiled rules as analyze_batch
+        nutrients = {field: totals.get(field, 0) for field in ('calories', 'protein', 'carbs', 'fat')}
+        evaluation = self.rules.evaluate_one(nutrients, user_id, self.overrides_for(goals))
         
         return {
-            'total_calories': total_calories,
-            'total_protein': total_protein,
-            'total_carbs': total_carbs,
-            'total_fat': total_fat,
-            'health_score': health_score,
-            'recommendations': recommendations
+            'total_calories': nutrients['calories'],
+            'total_protein': nutrients['protein'],
+            'total_carbs': nutrients['carbs'],
+            'total_fat': nutrients['fat'],
+            'health_score': evaluation['health_score'],
+            'recommendations': evaluation['recommendations']
         }
     
+    def analyze_batch(self, meals, user_column: str = 'user_id', date_column: str = 'meal_date',
+                      goals: Optional[List[Dict]] = None) -> Dict[str, np.ndarray]:
+        """
+        Analyze meals for many users and days at once. `meals` is a
+        DataFrame, pyarrow Table or dict of columns with one row per meal;
+        the result has one row per (user, date), see models/nutrition_analysis.py
+        """
+        return analyze_table(self.rules, meals, user_column, date_column, self.overrides_for(goals))
+    
     def _calculate_health_score(self, calories: float, protein: float, carbs: float, fat: float) -> float:
         """
         Calculate health score based on nutrition intake
         """
-        score = 100.0
-        
-        # Calorie range check (1500-2500 for adults)
-        if calories < 1200:
-            score -= 20
-        elif calories > 3000:
-            score -= 15
-        elif calories > 2500:
-            score -= 10
-        
-        # Protein check (50-100g for adults)
-        if protein < 40:
-            score -= 15
-        elif protein > 150:
-            score -= 10
-        
-        # Fat check (should be 20-35% of calories)
-        fat_percentage = (fat * 9) / calories * 100 if calories > 0 else 0
-        if fat_percentage < 15:
-            score -= 10
-        elif fat_percentage > 40:
-            score -= 15
-        
-        return max(0, min(100, score))
+        totals = {'calories': calories, 'protein': protein, 'carbs': carbs, 'fat': fat}
+        return self.rules.evaluate_one(totals)['health_score']
     
     def _generate_recommendations(self, calories: float, protein: float, carbs: float, fat: float) -> List[str]:
         """
         Generate personalized recommendations
         """
-        recommendations = []
-        
-        if calories < 1200:
-            recommendations.append("Lượng calo quá thấp. Hãy tăng khẩu phần ăn với thực phẩm lành mạnh.")
-        elif calories > 2500:
-            recommendations.append("Lượng calo hơi cao. Hãy giảm khẩu phần và tăng hoạt động thể chất.")
-        
-        if protein < 50:
-            recommendations.append("Cần tăng protein. Hãy thêm thịt, cá, đậu, trứng vào bữa ăn.")
-        elif protein > 120:
-            recommendations.append("Lượng protein hơi cao. Hãy cân bằng với rau củ và trái cây.")
-        
-        fat_percentage = (fat * 9) / calories * 100 if calories > 0 else 0
-        if fat_percentage < 20:
-            recommendations.append("Cần tăng chất béo lành mạnh từ dầu olive, bơ, các loại hạt.")
-        elif fat_percentage > 35:
-            recommendations.append("Lượng chất béo hơi cao. Hãy chọn thực phẩm ít béo hơn.")
-        
-        if not recommendations:
-            recommendations.append("Chế độ dinh dưỡng của bạn rất cân bằng! Hãy duy trì.")
-        
-        return recommendations
+        totals = {'calories': calories, 'protein': protein, 'carbs': carbs, 'fat': fat}
+        return self.rules.evaluate_one(totals)['recommendations']
     
     def _load_recommendation_rules(self) -> Dict:
         """
-        Load recommendation rules and thresholds
+        Load recommendation rules and thresholds (see models/recommendation_rules.py)
         """
-        return {
-            'calorie_ranges': {
-                'low': 1200,
-                'high': 2500,
-                'very_high': 3000
-            },
-            'protein_ranges': {
-                'low': 40,
-                'high': 120,
-                'very_high': 150
-            },
-            'fat_percentage_ranges': {
-                'low': 15,
-                'high': 35,
-                'very_high': 40
-            }
-        }
+        return default_rules()
@@ -0,0 +1,294 @@
+"""
+In-process fuzzy search over food names.
+
+Names (foods.name and foods.name_vietnamese) and queries are folded to
+lowercase ASCII ("Bún bò Huế" -> "bun bo hue"), so "pho bo" matches
+"Phở bò". Matching uses a character trigram inverted index stored as CSR
+arrays (gram -> sorted document ids). A query's postings are counted with
+one np.bincount and scored with the Dice coefficient, plus small bonuses
+for exact, diacritic-exact and prefix matches.
+
+The index persists to the aligned snapshot format from shared_weights
+and reloads as a memory map:
+
+    python -m models.food_search --output food_search.snap [--nutrition-snapshot nutrition.snap]
+"""
+import argparse
+import os
+import re
+import tempfile
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from .nutrition_store import NutritionStore, normalize_name
+from .shared_weights import Snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+NGRAM = 3
+MIN_SCORE = 0.3
+EXACT_BONUS = 0.2
+ACCENT_BONUS = 0.1
+PREFIX_BONUS = 0.05
+# Candidates kept per requested result before prefix bonuses and de-duplication
+SHORTLIST_FACTOR = 8
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def fold(text: Optional[str]) -> str:
+    """
+    Lowercase, strip Vietnamese diacritics and punctuation: "Phở bò!" -> "pho bo"
+    """
+    text = unicodedata.normalize('NFD', (text or '').lower().replace('đ', 'd').replace('Đ', 'd'))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def ngrams(folded: str) -> List[str]:
+    """
+    Distinct character trigrams of a folded string, padded at both ends
+    """
+    padded = f" {folded} "
+    return list(dict.fromkeys(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)))
+
+
+class FoodSearchIndex:
+    """
+    Trigram inverted index; one document per distinct folded food name
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]):
+        self.indptr = arrays['indptr']
+        self.postings = arrays['postings']
+        self.doc_lengths = arrays['doc_lengths']
+        self.doc_food_rows = arrays['doc_food_rows']
+        self.documents = metadata['documents']
+        self.display_names = metadata['display_names']
+        self.version = metadata.get('version', '')
+        self.accented = metadata['accented']
+        self._gram_index = {gram: i for i, gram in enumerate(metadata['grams'])}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def build(cls, names: Iterable[Tuple[int, str]], display_names: Dict[int, str], version: str = '') -> 'FoodSearchIndex':
+        """
+        Build in one pass from (food row, name) pairs; display_names maps a
+        food row to the name returned for it
+        """
+        documents, doc_rows, doc_names = [], [], []
+        seen = set()
+        gram_ids: Dict[str, int] = {}
+        doc_grams: List[List[int]] = []
+        for row, name in names:
+            folded = fold(name)
+            if not folded or (row, folded) in seen:
+                continue
+            seen.add((row, folded))
+            documents.append(folded)
+            doc_rows.append(row)
+            # Keep the accented spelling so exact Vietnamese input wins ties
+            doc_names.append(name)
+            doc_grams.append([gram_ids.setdefault(gram, len(gram_ids)) for gram in ngrams(folded)])
+
+        # CSR postings: documents per gram, in document order
+        lengths = np.array([len(grams) for grams in doc_grams], dtype=np.int32)
+        flat = np.fromiter((g for grams in doc_grams for g in grams), dtype=np.int32, count=int(lengths.sum()))
+        owners = np.repeat(np.arange(len(doc_grams), dtype=np.int32), lengths)
+        order = np.argsort(flat, kind='stable')
+        postings = owners[order]
+        indptr = np.zeros(len(gram_ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(flat, minlength=len(gram_ids)), out=indptr[1:])
+
+        arrays = {
+            'indptr': indptr,
+            'postings': postings,
+            'doc_lengths': lengths,
+            'doc_food_rows': np.array(doc_rows, dtype=np.int32),
+        }
+        metadata = {
+            'grams': list(gram_ids),
+            'documents': documents,
+            'display_names': [display_names.get(row, name) for row, name in zip(doc_rows, doc_names)],
+            'accented': [normalize_name(name) for name in doc_names],
+            'version': version,
+        }
+        return cls(arrays, metadata)
+
+    @classmethod
+    def from_store(cls, store: NutritionStore) -> 'FoodSearchIndex':
+        """
+        Index every food's Vietnamese and English name
+        """
+        names, display_names = [], {}
+        for row in range(len(store)):
+            vietnamese, english = store.names_vietnamese[row], store.names[row]
+            display_names[row] = vietnamese or english
+            names += [(row, vietnamese), (row, english)]
+        return cls.build(names, display_names, version=store.version)
+
+    # -- persistence --------------------------------------------------------
+
+    def save(self, path: str):
+        arrays = {
+            'indptr': self.indptr, 'postings': self.postings,
+            'doc_lengths': self.doc_lengths, 'doc_food_rows': self.doc_food_rows,
+        }
+        metadata = {
+            'grams': list(self._gram_index), 'documents': self.documents,
+            'display_names': self.display_names, 'accented': self.accented, 'version': self.version,
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            write_snapshot(tmp_path, arrays, {'food_search': metadata})
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'FoodSearchIndex':
+        snapshot = Snapshot(path)
+        return cls(snapshot.arrays, snapshot.metadata['food_search'])
+
+    # -- queries ------------------------------------------------------------
+
+    def search(self, query: str, k: int = 5, min_score: float = MIN_SCORE) -> List[Tuple[int, str, float]]:
+        """
+        Best matches as (food row, display name, score in [0, 1]), best first.
+        Several names of one food collapse into its best-scoring match.
+        """
+        folded = fold(query)
+        if not folded or not len(self):
+            return []
+        grams = ngrams(folded)
+        gram_ids = [self._gram_index[gram] for gram in grams if gram in self._gram_index]
+        if not gram_ids:
+            return []
+
+        postings = np.concatenate([self.postings[self.indptr[g]:self.indptr[g + 1]] for g in gram_ids])
+        shared = np.bincount(postings, minlength=len(self))
+        candidates = np.flatnonzero(shared)
+        shared = shared[candidates]
+        lengths = self.doc_lengths[candidates]
+        scores = 2.0 * shared / (len(grams) + lengths)
+
+        # Identical trigram sets pick out exact (folded) matches without
+        # touching the strings of every candidate
+        accented = normalize_name(query)
+        for i in np.flatnonzero((shared == len(grams)) & (lengths == len(grams))):
+            doc = candidates[i]
+            if self.documents[doc] == folded:
+                scores[i] += EXACT_BONUS
+                if self.accented[doc] == accented:
+                    scores[i] += ACCENT_BONUS
+
+        # Only a shortlist is checked for prefix matches and de-duplicated
+        shortlist = min(len(candidates), SHORTLIST_FACTOR * k)
+        top = np.argpartition(-scores, shortlist - 1)[:shortlist] if shortlist < len(candidates) else \
+            np.arange(len(candidates))
+        for i in top:
+            document = self.documents[candidates[i]]
+            if document != folded and (document.startswith(folded) or folded.startswith(document)):
+                scores[i] += PREFIX_BONUS
+        scores = np.minimum(scores / (1.0 + EXACT_BONUS + ACCENT_BONUS), 1.0)
+
+        results, seen = [], set()
+        for i in top[np.argsort(-scores[top], kind='stable')]:
+            if scores[i] < min_score or len(results) >= k:
+                break
+            row = int(self.doc_food_rows[candidates[i]])
+            if row in seen:
+                continue
+            seen.add(row)
+            results.append((row, self.display_names[candidates[i]], float(scores[i])))
+        return results
+
+
+class FoodSearch:
+    """
+    Keep a search index in step with a (possibly reloading) NutritionStore.
+    With index_path, an index saved for the same store version is reloaded
+    from disk instead of rebuilt, and fresh builds are saved there.
+    """
+
+    def __init__(self, store_provider: Callable[[], NutritionStore], index_path: Optional[str] = None):
+        self.store_provider = store_provider
+        self.index_path = index_path
+        self._store = None
+        self._index: Optional[FoodSearchIndex] = None
+
+    def current(self) -> Tuple[NutritionStore, FoodSearchIndex]:
+        """
+        The store and the index built for it, as one consistent pair
+        """
+        store = self.store_provider()
+        if store is not self._store:
+            self._index = self._load_or_build(store)
+            self._store = store
+        return self._store, self._index
+
+    def _load_or_build(self, store: NutritionStore) -> FoodSearchIndex:
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                index = FoodSearchIndex.load(self.index_path)
+                if index.version == store.version and len(index.doc_food_rows) and \
+                        int(index.doc_food_rows.max()) < len(store):
+                    return index
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Failed to load food search index: {str(e)}")
+        index = FoodSearchIndex.from_store(store)
+        if self.index_path:
+            index.save(self.index_path)
+        logger.info(f"Food search index built ({len(index)} names, version {index.version})")
+        return index
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Best matches with their nutrition for one serving (serving_size grams)
+        """
+        store, index = self.current()
+        serving_index = store.field_index('serving_size')
+        results = []
+        for row, name, score in index.search(query, k):
+            # Foods rows hold values per 100 g
+            serving_size = float(store.values[row, serving_index])
+            results.append({
+                'food_name': name,
+                'score': score,
+                'serving_size': serving_size,
+                'nutrition': store.row_to_dict(store.values[row] * (serving_size / 100.0)),
+            })
+        return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True, help='Index file to write')
+    parser.add_argument('--nutrition-snapshot', help='Build from this NutritionStore snapshot (default: built-in table)')
+    parser.add_argument('--query', nargs='*', default=[], help='Run these queries against the new index')
+    args = parser.parse_args(argv)
+
+    if args.nutrition_snapshot:
+        store = NutritionStore.load(args.nutrition_snapshot)
+    else:
+        from .food_recognition import FoodRecognitionModel
+        store = FoodRecognitionModel(lazy=True).nutrition_store
+
+    index = FoodSearchIndex.from_store(store)
+    index.save(args.output)
+    logger.info(f"Wrote {len(index)} names to {args.output}")
+    for query in args.query:
+        print(query, '->', index.search(query))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
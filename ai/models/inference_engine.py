@@ -0,0 +1,214 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BatchInferenceEngine:
+    """
+    Dynamic micro-batching engine in front of FoodRecognitionModel
+
+    Requests from the FastAPI handlers are queued and grouped into batches
+    bounded by max_batch_size and max_wait_ms, so each forward pass serves
+    as many waiting callers as possible.
+
+    Requests carry undecoded images (bytes or file paths), so a batch is
+    decoded once into the model's pooled batch buffer rather than into one
+    array per request that would then be stacked. By default each batch
+    runs model.predict_images on the loop's default executor; pass `runner`
+    to dispatch batches elsewhere (e.g. a worker pool). A runner is called
+    with the images and the per-image portion sizes (grams, or None to
+    estimate) and returns predict_images' (predictions, decode errors),
+    both keyed by position; an image that fails to decode fails only its
+    own request with ValueError. Up to max_concurrent_batches
+    batches run at once (set it to the pool's worker count); the next batch
+    is only formed once a slot is free, so requests arriving while every
+    worker is busy join it. With max_queue_size > 0, predict raises
+    asyncio.QueueFull instead of queueing without bound.
+    """
+
+    def __init__(self, model=None, max_batch_size: int = 16, max_wait_ms: float = 5.0,
+                 max_queue_size: int = 0,
+                 runner: Optional[Callable[[List[Any], List[Optional[float]]], Awaitable[Tuple[Dict, Dict]]]] = None,
+                 max_concurrent_batches: int = 1):
+        if model is None and runner is None:
+            raise ValueError("Either model or runner must be provided")
+        self.model = model
+        self.runner = runner or self._run_on_default_executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+        # Tuning statistics
+        self.batch_size_histogram: Counter = Counter()
+        self.queue_depth_histogram: Counter = Counter()
+        self.total_batches = 0
+        self.total_images = 0
+        self.total_inference_seconds = 0.0
+
+    async def start(self):
+        """
+        Start the background batching loop
+        """
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Inference engine started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f}, max_concurrent_batches={self.max_concurrent_batches})"
+        )
+
+    async def stop(self):
+        """
+        Stop the batching loop, let batches already dispatched finish and
+        fail any requests still queued
+        """
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+        queued = []
+        while not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+        self._fail_stopped(queued)
+        logger.info("Inference engine stopped")
+
+    @staticmethod
+    def _fail_stopped(items: List[Tuple[Any, Optional[float], asyncio.Future]]):
+        for _, _, future in items:
+            if not future.done():
+                future.set_exception(RuntimeError("Inference engine stopped"))
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def predict(self, image: Any, portion_grams: Optional[float] = None) -> Tuple:
+        """
+        Queue a single image (bytes or file path) and wait for its prediction
+        """
+        if self._worker is None:
+            raise RuntimeError("Inference engine is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((image, portion_grams, future))
+        return await future
+
+    async def _run_on_default_executor(self, images: List[Any], portions: List[Optional[float]]) -> Tuple[Dict, Dict]:
+        # Keep the event loop free while decoding and TensorFlow run
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.model.predict_images, images, portions)
+
+    async def _collect_batch(self) -> List[Tuple[Any, Optional[float], asyncio.Future]]:
+        """
+        Wait for the first request, then keep collecting until the batch is
+        full or max_wait has elapsed since that first request arrived.
+        If stop() cancels the collection, requests already taken off the
+        queue are failed rather than left waiting forever.
+        """
+        batch = []
+        try:
+            batch.append(await self._queue.get())
+            self.queue_depth_histogram[self._queue.qsize() + 1] += 1
+
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            self._fail_stopped(batch)
+            raise
+
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free slot before forming the batch, so requests keep
+            # joining it while every runner is busy
+            await self._slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._slots.release()
+                raise
+
+            # Drop callers that gave up while waiting in the queue
+            batch = [item for item in batch if not item[2].cancelled()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._run_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Any, Optional[float], asyncio.Future]]):
+        try:
+            images = [image for image, _, _ in batch]
+            portions = [portion for _, portion, _ in batch]
+            started = time.perf_counter()
+            try:
+                results, errors = await self.runner(images, portions)
+            except Exception as e:
+                logger.error(f"Batch inference failed: {str(e)}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.total_inference_seconds += time.perf_counter() - started
+            self.total_batches += 1
+            self.total_images += len(results)
+            self.batch_size_histogram[len(batch)] += 1
+
+            for index, (_, _, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if index in results:
+                    future.set_result(results[index])
+                else:
+                    future.set_exception(ValueError(errors.get(index, "Image could not be decoded")))
+        finally:
+            self._slots.release()
+
+    def get_stats(self) -> Dict:
+        """
+        Snapshot of queue depth and batch-size statistics for tuning
+        """
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'max_queue_size': self.max_queue_size,
+            'max_concurrent_batches': self.max_concurrent_batches,
+            'batches_in_flight': len(self._in_flight),
+            'queue_depth': self.queue_depth,
+            'total_batches': self.total_batches,
+            'total_images': self.total_images,
+            'mean_batch_size': self.total_images / self.total_batches if self.total_batches else 0.0,
+            'mean_batch_latency_ms': (
+                self.total_inference_seconds / self.total_batches * 1000 if self.total_batches else 0.0
+            ),
+            'batch_size_histogram': dict(sorted(self.batch_size_histogram.items())),
+            'queue_depth_histogram': dict(sorted(self.queue_depth_histogram.items())),
+        }
@@ -0,0 +1,79 @@
+"""
+Per-stage timing hooks for the model code.
+
+Model methods wrap their phases in `stage('decode')`, `stage('inference')`
+and so on. Nothing is measured until an observer is registered (the API
+registers services/metrics.py), so library and CLI users pay only for
+one list check per stage. Observers are called with (stage, seconds) on
+the thread that ran the stage and must be thread-safe.
+
+Observers live in the process that registered them: stages run by
+process-mode inference workers are not reported to the API process.
+
+A caller may also open a stage total with `track_stages()` (the metrics
+middleware does, per request); stages run in the same context add their
+time to it, so what remains of the request is framework work such as
+validation and serialization. Stages in one such context must not nest.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+StageObserver = Callable[[str, float], None]
+
+_observers: List[StageObserver] = []
+_stage_total: ContextVar[Optional[List[float]]] = ContextVar('stage_total', default=None)
+
+
+def add_stage_observer(observer: StageObserver):
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_stage_observer(observer: StageObserver):
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def record_stage(name: str, seconds: float):
+    total = _stage_total.get()
+    if total is not None:
+        total[0] += seconds
+    for observer in _observers:
+        try:
+            observer(name, seconds)
+        except Exception as e:
+            logger.error(f"Stage observer failed: {str(e)}")
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time the enclosed block as `name`, including when it raises
+    """
+    if not _observers and _stage_total.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+@contextmanager
+def track_stages() -> Iterator[List[float]]:
+    """
+    Sum the seconds of every stage run in this context into the yielded
+    one-element list
+    """
+    total = [0.0]
+    token = _stage_total.set(total)
+    try:
+        yield total
+    finally:
+        _stage_total.reset(token)
@@ -0,0 +1,164 @@
+"""
+Export FoodRecognitionModel to TFLite and/or ONNX for CPU serving.
+
+    python -m models.model_export --model food_model.keras --format tflite \
+        --quantize int8 --calibration-dir data/calibration --output food_model_int8.tflite
+
+Int8 post-training quantization calibrates activation ranges on a sample
+of real food photos; a few hundred images covering every class is enough.
+Model inputs and outputs stay float32, so the serving preprocessing is
+unchanged.
+"""
+import argparse
+import os
+import tempfile
+from typing import Iterator, List, Optional
+import logging
+
+import numpy as np
+
+from .preprocessing import ImagePreprocessor
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+QUANTIZATION_MODES = ('none', 'float16', 'int8')
+
+
+def iter_image_files(directory: str) -> Iterator[str]:
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def load_calibration_images(directory: str, limit: int = 200,
+                            target_size=(224, 224)) -> np.ndarray:
+    """
+    Preprocess up to `limit` images from a directory tree into one array
+    """
+    preprocessor = ImagePreprocessor(target_size=target_size)
+    images = []
+    for path in iter_image_files(directory):
+        try:
+            images.append(preprocessor.preprocess(path)[0])
+        except Exception as e:
+            logger.warning(f"Skipping calibration image {path}: {str(e)}")
+        if len(images) >= limit:
+            break
+    if not images:
+        raise ValueError(f"No usable calibration images found in {directory}")
+    return np.stack(images)
+
+
+def export_tflite(keras_model, output_path: str, quantization: str = 'none',
+                  calibration_images: Optional[np.ndarray] = None) -> str:
+    """
+    Convert a Keras model to a .tflite flatbuffer
+    """
+    import tensorflow as tf
+
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {quantization}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if quantization == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if calibration_images is None:
+            raise ValueError("int8 quantization requires calibration images")
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis].astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    flatbuffer = converter.convert()
+    with open(output_path, 'wb') as f:
+        f.write(flatbuffer)
+    logger.info(f"TFLite model ({quantization}) written to {output_path} ({len(flatbuffer) / 1e6:.1f} MB)")
+    return output_path
+
+
+class _CalibrationReader:
+    """
+    onnxruntime CalibrationDataReader over preprocessed images
+    """
+
+    def __init__(self, input_name: str, images: np.ndarray):
+        self._batches = iter([{input_name: image[np.newaxis].astype(np.float32)} for image in images])
+
+    def get_next(self):
+        return next(self._batches, None)
+
+
+def export_onnx(keras_model, output_path: str, quantization: str = 'none',
+                calibration_images: Optional[np.ndarray] = None, opset: int = 13) -> str:
+    """
+    Convert a Keras model to ONNX, optionally with static int8 (QDQ)
+    quantization. Requires the tf2onnx and onnxruntime packages.
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    if quantization not in ('none', 'int8'):
+        raise ValueError(f"Unsupported ONNX quantization mode: {quantization}")
+
+    input_shape = (None,) + tuple(keras_model.input_shape[1:])
+    signature = (tf.TensorSpec(input_shape, tf.float32, name='input'),)
+    forward = tf.function(lambda images: keras_model(images, training=False))
+
+    float_path = output_path
+    if quantization == 'int8':
+        float_path = os.path.join(tempfile.mkdtemp(), 'float.onnx')
+    tf2onnx.convert.from_function(forward, input_signature=signature, opset=opset, output_path=float_path)
+
+    if quantization == 'int8':
+        if calibration_images is None:
+            raise ValueError("int8 quantization requires calibration images")
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+        quantize_static(
+            float_path, output_path, _CalibrationReader('input', calibration_images),
+            quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8
+        )
+        os.remove(float_path)
+
+    logger.info(f"ONNX model ({quantization}) written to {output_path}")
+    return output_path
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Keras model to export (a freshly built model if omitted)')
+    parser.add_argument('--format', choices=['tflite', 'onnx'], required=True)
+    parser.add_argument('--quantize', choices=QUANTIZATION_MODES, default='none')
+    parser.add_argument('--calibration-dir', help='Directory of sample images for int8 calibration')
+    parser.add_argument('--calibration-limit', type=int, default=200)
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args(argv)
+
+    from .food_recognition import FoodRecognitionModel
+
+    model = FoodRecognitionModel(args.model, backend='keras')
+    calibration_images = None
+    if args.quantize == 'int8':
+        if not args.calibration_dir:
+            parser.error("--calibration-dir is required for int8 quantization")
+        calibration_images = load_calibration_images(
+            args.calibration_dir, args.calibration_limit, model.preprocessor.target_size
+        )
+
+    if args.format == 'tflite':
+        export_tflite(model.model, args.output, args.quantize, calibration_images)
+    else:
+        export_onnx(model.model, args.output, args.quantize, calibration_images)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
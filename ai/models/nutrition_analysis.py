@@ -0,0 +1,123 @@
+"""
+Vectorized nutrition analysis over many users and days at once.
+
+Meals come in as columns (NumPy arrays, a pandas DataFrame or a pyarrow
+Table) keyed by user_id and meal_date. Totals are computed with one
+group-by reduction per nutrient, and health scores and recommendation
+flags for every user-day come from one RuleEngine.evaluate call, the same
+rules NutritionAnalyzer.analyze_daily_nutrition applies to a single day.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+from .recommendation_rules import RuleEngine, UserOverrides, metric_values
+
+logger = logging.getLogger(__name__)
+
+NUTRIENT_COLUMNS = ('calories', 'protein', 'carbs', 'fat')
+
+
+def _column(table: Any, name: str) -> np.ndarray:
+    """
+    Read one column from a dict of arrays, a DataFrame or a pyarrow Table
+    """
+    if hasattr(table, 'column') and hasattr(table, 'num_rows'):
+        return table.column(name).to_numpy()
+    return np.asarray(table[name])
+
+
+def _has_column(table: Any, name: str) -> bool:
+    if hasattr(table, 'column_names'):
+        return name in table.column_names
+    return name in table
+
+
+def group_keys(user_ids: np.ndarray, meal_dates: np.ndarray):
+    """
+    Factorize (user_id, meal_date) pairs. Returns the unique users, the
+    unique dates and, per meal, the index of its user-day group.
+    """
+    users, user_codes = np.unique(user_ids, return_inverse=True)
+    dates, date_codes = np.unique(meal_dates, return_inverse=True)
+    pair_codes = user_codes.astype(np.int64) * len(dates) + date_codes
+    groups, inverse = np.unique(pair_codes, return_inverse=True)
+    return users[groups // len(dates)], dates[groups % len(dates)], inverse
+
+
+def analyze_columns(engine: RuleEngine, user_ids: Sequence, meal_dates: Sequence, calories: Sequence,
+                    protein: Sequence, carbs: Sequence, fat: Sequence,
+                    overrides: Optional[UserOverrides] = None) -> Dict[str, np.ndarray]:
+    """
+    Analyze meals given as parallel columns, one row per meal. Missing
+    nutrient values (NaN) count as 0, like a missing key in the dict API.
+
+    Returns columns with one row per (user_id, meal_date), sorted by user
+    and date.
+    """
+    users, dates, inverse = group_keys(np.asarray(user_ids), np.asarray(meal_dates))
+    result = {'user_id': users, 'meal_date': dates}
+    for name, values in zip(NUTRIENT_COLUMNS, (calories, protein, carbs, fat)):
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+        # bincount accumulates in row order, matching sum() over the meal list
+        result[f"total_{name}"] = np.bincount(inverse, weights=values, minlength=len(users))
+
+    totals = {name: result[f"total_{name}"] for name in NUTRIENT_COLUMNS}
+    evaluation = engine.evaluate(totals, users, overrides)
+    result['fat_percentage'] = metric_values('fat_percentage', totals)
+    result['health_score'] = evaluation['health_score']
+    result['recommendation_flags'] = evaluation['recommendation_flags']
+    return result
+
+
+def analyze_table(engine: RuleEngine, table: Any, user_column: str = 'user_id', date_column: str = 'meal_date',
+                  overrides: Optional[UserOverrides] = None) -> Dict[str, np.ndarray]:
+    """
+    Analyze a DataFrame, pyarrow Table or dict of columns. Nutrient
+    columns that are absent count as 0.
+    """
+    user_ids = _column(table, user_column)
+    nutrients = [
+        _column(table, name) if _has_column(table, name) else np.zeros(len(user_ids))
+        for name in NUTRIENT_COLUMNS
+    ]
+    return analyze_columns(engine, user_ids, _column(table, date_column), *nutrients, overrides=overrides)
+
+
+def analyze_meal_records(engine: RuleEngine, meals: List[Dict], user_id: Optional[Any] = None,
+                         meal_date: Optional[Any] = None, overrides: Optional[UserOverrides] = None) -> Dict[str, np.ndarray]:
+    """
+    Analyze meal dicts (as accepted by analyze_daily_nutrition) that carry
+    their own user_id / meal_date keys, defaulting to the given values
+    """
+    return analyze_columns(
+        engine,
+        [meal.get('user_id', user_id) for meal in meals],
+        [meal.get('meal_date', meal_date) for meal in meals],
+        *[[meal.get(name, 0) for meal in meals] for name in NUTRIENT_COLUMNS],
+        overrides=overrides
+    )
+
+
+def _to_python(value: Any) -> Any:
+    if isinstance(value, np.datetime64):
+        return str(value)
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def iter_results(result: Dict[str, np.ndarray], engine: RuleEngine) -> Iterator[Dict]:
+    """
+    Yield one analyze_daily_nutrition-style dict per user-day
+    """
+    for i in range(len(result['user_id'])):
+        yield {
+            'user_id': _to_python(result['user_id'][i]),
+            'meal_date': _to_python(result['meal_date'][i]),
+            'total_calories': float(result['total_calories'][i]),
+            'total_protein': float(result['total_protein'][i]),
+            'total_carbs': float(result['total_carbs'][i]),
+            'total_fat': float(result['total_fat'][i]),
+            'health_score': float(result['health_score'][i]),
+            'recommendations': engine.recommendations_for(int(result['recommendation_flags'][i])),
+        }
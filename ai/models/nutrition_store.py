@@ -0,0 +1,354 @@
+"""
+Columnar nutrition store built from the `foods` table.
+
+Per-100g nutrient values live in one float64 matrix with a row per food
+(plus a trailing default row for unknown foods), addressable by food id
+through a sorted id index (binary search, so sparse or very large ids
+cost nothing extra) and by recognition class id through a dense int32
+array, so whole prediction batches resolve with vectorized lookups.
+
+Stores persist to the aligned snapshot format from models.shared_weights
+and load back as read-only memory maps, which makes a reload after the
+foods table changes a cheap file swap:
+
+    python -m models.nutrition_store --output nutrition.snap
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+import numpy as np
+
+from .shared_weights import Snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+NUTRIENT_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar', 'sodium', 'serving_size')
+
+# Fields returned by FoodRecognitionModel.get_nutritional_info
+BASIC_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'fiber')
+
+DEFAULT_NUTRITION = {
+    'calories': 200.0,
+    'protein': 10.0,
+    'carbs': 30.0,
+    'fat': 5.0,
+    'fiber': 2.0,
+    'sugar': 0.0,
+    'sodium': 0.0,
+    'serving_size': 100.0,
+}
+
+FOODS_QUERY = (
+    "SELECT id, name, name_vietnamese, category, calories, protein, carbs, fat, fiber, sugar, "
+    "sodium, serving_size, is_vietnamese, is_verified, tags, updated_at FROM foods ORDER BY id"
+)
+
+FLAG_VIETNAMESE = 1
+FLAG_VERIFIED = 2
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return unicodedata.normalize('NFC', (name or '').strip().lower())
+
+
+def _parse_tags(tags: Any) -> List[str]:
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags)
+        except ValueError:
+            return []
+    return [str(tag) for tag in tags] if isinstance(tags, list) else []
+
+
+class NutritionStore:
+    """
+    Immutable, array-backed view of the foods table
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]):
+        self.values = arrays['values']
+        self.food_ids = arrays['food_ids']
+        if 'sorted_food_ids' in arrays:
+            self.sorted_food_ids = arrays['sorted_food_ids']
+            self.sorted_rows = arrays['sorted_rows']
+        else:
+            # Snapshots written before the sorted index existed
+            self.sorted_food_ids, self.sorted_rows = self._build_id_index(self.food_ids)
+        self.class_to_row = arrays['class_to_row']
+        self.category_codes = arrays['category_codes']
+        self.flags = arrays['flags']
+        self.tag_matrix = arrays['tag_matrix']
+        self.fields = list(metadata['fields'])
+        self.names = metadata['names']
+        self.names_vietnamese = metadata['names_vietnamese']
+        self.categories = metadata['categories']
+        self.tags = metadata['tags']
+        self.class_names = metadata['class_names']
+        self.version = metadata.get('version', '')
+        self._field_index = {field: i for i, field in enumerate(self.fields)}
+        self._name_index = self._build_name_index(self.names, self.names_vietnamese)
+
+    def __len__(self) -> int:
+        return len(self.food_ids)
+
+    @property
+    def default_row(self) -> int:
+        return len(self.food_ids)
+
+    def field_index(self, field: str) -> int:
+        return self._field_index[field]
+
+    @staticmethod
+    def _build_id_index(food_ids: np.ndarray):
+        rows = np.argsort(food_ids, kind='stable').astype(np.int32)
+        return np.ascontiguousarray(food_ids[rows]), rows
+
+    @staticmethod
+    def _build_name_index(names: List[str], names_vietnamese: List[str]) -> Dict[str, int]:
+        index = {}
+        for i, (name, name_vietnamese) in enumerate(zip(names, names_vietnamese)):
+            index.setdefault(normalize_name(name_vietnamese), i)
+            index.setdefault(normalize_name(name), i)
+        index.pop('', None)
+        return index
+
+    # -- construction -------------------------------------------------------
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], class_names: List[str], version: str = '') -> 'NutritionStore':
+        """
+        Build a store in one pass over foods rows (dicts keyed by column name)
+        """
+        rows = list(rows)
+        n = len(rows)
+        values = np.empty((n + 1, len(NUTRIENT_FIELDS)), dtype=np.float64)
+        food_ids = np.empty(n, dtype=np.int32)
+        category_codes = np.empty(n, dtype=np.int16)
+        flags = np.zeros(n, dtype=np.uint8)
+        names, names_vietnamese = [], []
+        categories: Dict[str, int] = {}
+        tag_vocabulary: Dict[str, int] = {}
+        food_tags = []
+
+        for i, row in enumerate(rows):
+            for j, field in enumerate(NUTRIENT_FIELDS):
+                value = row.get(field)
+                values[i, j] = DEFAULT_NUTRITION[field] if value is None else value
+            food_ids[i] = row['id']
+            category_codes[i] = categories.setdefault(row.get('category') or '', len(categories))
+            flags[i] = (FLAG_VIETNAMESE if row.get('is_vietnamese', True) else 0) | \
+                (FLAG_VERIFIED if row.get('is_verified') else 0)
+            names.append(row.get('name') or '')
+            names_vietnamese.append(row.get('name_vietnamese') or '')
+            food_tags.append([tag_vocabulary.setdefault(tag, len(tag_vocabulary)) for tag in _parse_tags(row.get('tags'))])
+        values[n] = [DEFAULT_NUTRITION[field] for field in NUTRIENT_FIELDS]
+
+        tag_matrix = np.zeros((n, max(len(tag_vocabulary), 1)), dtype=np.uint8)
+        for i, tag_ids in enumerate(food_tags):
+            tag_matrix[i, tag_ids] = 1
+
+        sorted_food_ids, sorted_rows = cls._build_id_index(food_ids)
+
+        # Recognition classes are matched to foods by Vietnamese (or English) name
+        by_name = cls._build_name_index(names, names_vietnamese)
+        class_to_row = np.array([by_name.get(normalize_name(c), -1) for c in class_names], dtype=np.int32)
+
+        arrays = {
+            'values': values,
+            'food_ids': food_ids,
+            'sorted_food_ids': sorted_food_ids,
+            'sorted_rows': sorted_rows,
+            'class_to_row': class_to_row,
+            'category_codes': category_codes,
+            'flags': flags,
+            'tag_matrix': tag_matrix,
+        }
+        metadata = {
+            'fields': list(NUTRIENT_FIELDS),
+            'names': names,
+            'names_vietnamese': names_vietnamese,
+            'categories': list(categories),
+            'tags': list(tag_vocabulary),
+            'class_names': list(class_names),
+            'version': version,
+        }
+        return cls(arrays, metadata)
+
+    @classmethod
+    def from_nutrition_dict(cls, nutrition_database: Dict[str, Dict[str, float]], class_names: List[str]) -> 'NutritionStore':
+        """
+        Build a store from the built-in {name: nutrients} table. Ids follow
+        the order of the seed rows in database/schema.sql.
+        """
+        rows = [dict(nutrients, id=i + 1, name_vietnamese=name) for i, (name, nutrients) in enumerate(nutrition_database.items())]
+        return cls.from_rows(rows, class_names, version='builtin')
+
+    @classmethod
+    def from_database(cls, connection, class_names: List[str]) -> 'NutritionStore':
+        """
+        Build a store from a DB-API connection whose cursors return dict rows
+        (e.g. pymysql with DictCursor)
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(FOODS_QUERY)
+            rows = cursor.fetchall()
+        return cls.from_rows(rows, class_names, version=cls.fingerprint(rows))
+
+    @staticmethod
+    def fingerprint(rows: List[Dict[str, Any]]) -> str:
+        """
+        Cheap change marker for the foods table: row count plus newest update
+        """
+        updated = [str(row['updated_at']) for row in rows if row.get('updated_at') is not None]
+        return f"{len(rows)}:{max(updated) if updated else ''}"
+
+    # -- snapshots ----------------------------------------------------------
+
+    def to_arrays(self, prefix: str = '') -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}{name}": getattr(self, name)
+            for name in ('values', 'food_ids', 'sorted_food_ids', 'sorted_rows', 'class_to_row', 'category_codes',
+                         'flags', 'tag_matrix')
+        }
+
+    def to_metadata(self) -> Dict[str, Any]:
+        return {
+            'fields': self.fields,
+            'names': self.names,
+            'names_vietnamese': self.names_vietnamese,
+            'categories': self.categories,
+            'tags': self.tags,
+            'class_names': self.class_names,
+            'version': self.version,
+        }
+
+    def save(self, path: str):
+        """
+        Write a binary snapshot atomically, so readers never see a partial file
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            write_snapshot(tmp_path, self.to_arrays(), {'nutrition': self.to_metadata()})
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot, prefix: str = '') -> 'NutritionStore':
+        arrays = {name[len(prefix):]: array for name, array in snapshot.arrays.items() if name.startswith(prefix)}
+        return cls(arrays, snapshot.metadata['nutrition'])
+
+    @classmethod
+    def load(cls, path: str) -> 'NutritionStore':
+        """
+        Memory-map a snapshot; loading cost does not depend on table size
+        """
+        return cls.from_snapshot(Snapshot(path))
+
+    # -- lookups ------------------------------------------------------------
+
+    def rows_for_food_ids(self, food_ids: np.ndarray) -> np.ndarray:
+        food_ids = np.asarray(food_ids, dtype=np.int64)
+        if not len(self.sorted_food_ids):
+            return np.full(food_ids.shape, self.default_row, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.sorted_food_ids, food_ids), len(self.sorted_food_ids) - 1)
+        found = self.sorted_food_ids[positions] == food_ids
+        return np.where(found, self.sorted_rows[positions], self.default_row)
+
+    def rows_for_classes(self, class_ids: np.ndarray) -> np.ndarray:
+        rows = self.class_to_row[np.asarray(class_ids, dtype=np.int64)]
+        return np.where(rows < 0, self.default_row, rows)
+
+    def row_for_name(self, name: str) -> int:
+        return self._name_index.get(normalize_name(name), self.default_row)
+
+    def lookup_food_ids(self, food_ids: np.ndarray) -> np.ndarray:
+        """
+        Per-100g nutrient matrix (len(food_ids), len(fields)); unknown ids
+        get the default row
+        """
+        return self.values[self.rows_for_food_ids(food_ids)]
+
+    def lookup_classes(self, class_ids: np.ndarray) -> np.ndarray:
+        return self.values[self.rows_for_classes(class_ids)]
+
+    def row_to_dict(self, values: np.ndarray, fields=BASIC_FIELDS) -> Dict[str, float]:
+        return {field: float(values[self._field_index[field]]) for field in fields}
+
+
+class NutritionStoreWatcher:
+    """
+    Serve a snapshot-backed store and pick up a replaced snapshot file.
+    The file is stat'ed at most every check_interval seconds, and a reload
+    is just a new memory map, so this is safe to call on the hot path.
+    """
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._mtime = os.stat(path).st_mtime_ns
+        self._store = NutritionStore.load(path)
+        self._next_check = time.monotonic() + check_interval
+
+    def current(self) -> NutritionStore:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime != self._mtime:
+                    self._store = NutritionStore.load(self.path)
+                    self._mtime = mtime
+                    logger.info(f"Nutrition store reloaded from {self.path} (version {self._store.version})")
+            except (OSError, ValueError) as e:
+                logger.error(f"Nutrition store reload failed: {str(e)}")
+        return self._store
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True, help='Snapshot file to write')
+    parser.add_argument('--builtin', action='store_true', help='Use the built-in table instead of the database')
+    args = parser.parse_args(argv)
+
+    from .food_recognition import FoodRecognitionModel
+
+    model = FoodRecognitionModel(lazy=True)
+    if args.builtin:
+        store = NutritionStore.from_nutrition_dict(model._load_nutrition_database(), model.class_names)
+    else:
+        import pymysql
+
+        connection = pymysql.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=int(os.getenv('DB_PORT', '3306')),
+            user=os.getenv('DB_USER', 'root'),
+            password=os.getenv('DB_PASSWORD', ''),
+            database=os.getenv('DB_NAME', 'health_tracker'),
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor
+        )
+        try:
+            store = NutritionStore.from_database(connection, model.class_names)
+        finally:
+            connection.close()
+
+    store.save(args.output)
+    mapped = int((store.class_to_row >= 0).sum())
+    logger.info(f"Wrote {len(store)} foods to {args.output} ({mapped}/{len(store.class_names)} classes mapped)")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
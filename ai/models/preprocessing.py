@@ -0,0 +1,118 @@
+import io
+import queue
+from contextlib import contextmanager
+from typing import Dict, IO, Iterator, List, Tuple, Union
+import logging
+
+import numpy as np
+from PIL import Image
+
+from .instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+ImageSource = Union[str, bytes, IO[bytes]]
+
+
+class PreprocessedBatch:
+    """
+    Result of decoding a list of payloads into a pooled batch buffer
+
+    `images` is a view into a reused buffer and is only valid inside the
+    ImagePreprocessor.preprocess_batch context. `indices[i]` is the position
+    of `images[i]` in the original payload list; failed payloads are
+    reported in `errors` by position.
+    """
+
+    def __init__(self, images: np.ndarray, indices: List[int], errors: Dict[int, str]):
+        self.images = images
+        self.indices = indices
+        self.errors = errors
+
+
+class ImagePreprocessor:
+    """
+    Decode images straight from bytes into preallocated float32 batch buffers
+
+    JPEGs are decoded at reduced resolution with PIL's draft mode, which lets
+    libjpeg scale by 1/2, 1/4 or 1/8 during decoding instead of producing a
+    full-size bitmap first. Normalization writes directly into the buffer,
+    so no float64 intermediate is ever created.
+    """
+
+    def __init__(self, target_size: Tuple[int, int] = (224, 224), max_batch_size: int = 16,
+                 pool_size: int = 4):
+        self.target_size = target_size
+        self.max_batch_size = max_batch_size
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    @property
+    def image_shape(self) -> Tuple[int, int, int]:
+        width, height = self.target_size
+        return (height, width, 3)
+
+    def _open(self, source: ImageSource) -> Image.Image:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        image = Image.open(source)
+        # Only JPEG supports draft decoding; other formats ignore the request
+        image.draft('RGB', self.target_size)
+        return image
+
+    def decode_into(self, source: ImageSource, out: np.ndarray) -> None:
+        """
+        Decode, resize and normalize one image into `out` (H, W, 3) float32
+        """
+        with self._open(source) as image:
+            image = image.convert('RGB')
+            if image.size != self.target_size:
+                image = image.resize(self.target_size)
+            pixels = np.asarray(image, dtype=np.uint8)
+        np.multiply(pixels, np.float32(1.0 / 255.0), out=out, casting='unsafe')
+
+    def preprocess(self, source: ImageSource) -> np.ndarray:
+        """
+        Preprocess a single image into a new (1, H, W, 3) float32 array
+        """
+        image_array = np.empty((1,) + self.image_shape, dtype=np.float32)
+        self.decode_into(source, image_array[0])
+        return image_array
+
+    def _acquire(self, size: int) -> np.ndarray:
+        if size > self.max_batch_size:
+            # Oversized batches get a one-off buffer that is not pooled
+            return np.empty((size,) + self.image_shape, dtype=np.float32)
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return np.empty((self.max_batch_size,) + self.image_shape, dtype=np.float32)
+
+    def _release(self, buffer: np.ndarray) -> None:
+        if buffer.shape[0] != self.max_batch_size:
+            return
+        try:
+            self._pool.put_nowait(buffer)
+        except queue.Full:
+            pass
+
+    @contextmanager
+    def preprocess_batch(self, sources: List[ImageSource]) -> Iterator[PreprocessedBatch]:
+        """
+        Decode many images into a pooled buffer. Images that fail to decode
+        are skipped and the successful ones are packed contiguously.
+        """
+        buffer = self._acquire(len(sources))
+        try:
+            indices = []
+            errors = {}
+            with stage('decode'):
+                for index, source in enumerate(sources):
+                    try:
+                        self.decode_into(source, buffer[len(indices)])
+                        indices.append(index)
+                    except Exception as e:
+                        logger.error(f"Image preprocessing failed for item {index}: {str(e)}")
+                        errors[index] = str(e)
+            yield PreprocessedBatch(buffer[:len(indices)], indices, errors)
+        finally:
+            self._release(buffer)
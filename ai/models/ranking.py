@@ -0,0 +1,334 @@
+"""
+Candidate ranking over the foods and exercises catalogs.
+
+Every item is a row of a precomputed float32 feature matrix. A query is a
+weight vector, so scoring the whole catalog is one matrix-vector product
+(or one matrix product for several queries at once), and the top k come
+from np.argpartition instead of a full sort.
+
+Fit to a target (e.g. "about 600 kcal and 30 g protein for this meal")
+is a weighted squared distance, sum_j w_j * (x_j - t_j)^2. Expanded, it is
+linear in x_j and x_j^2, so the matrix stores both and a target becomes
+part of the weight vector.
+
+Before scoring, candidates are prefiltered with per-category and per-tag
+bitmaps (np.packbits over the item axis), combined with bitwise and/or.
+"""
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+from .nutrition_store import NutritionStore, _parse_tags
+
+logger = logging.getLogger(__name__)
+
+# Above this candidate share, scoring the full matrix beats gathering rows
+SUBSET_SCORING_RATIO = 0.5
+
+FOOD_FEATURES = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar', 'sodium')
+FIT_NUTRIENTS = ('calories', 'protein', 'carbs', 'fat')
+
+# Typical deviation that costs one unit of score, per nutrient
+FIT_SCALES = {'calories': 100.0, 'protein': 10.0, 'carbs': 20.0, 'fat': 10.0}
+
+DAILY_CALORIES = {
+    'sedentary': 1800,
+    'lightly_active': 2000,
+    'moderately_active': 2200,
+    'very_active': 2500,
+    'extremely_active': 2800,
+}
+GOAL_CALORIE_ADJUSTMENT = {'lose_weight': -400, 'gain_weight': 400, 'maintain_weight': 0}
+
+# Share of calories per macro, and calories per gram
+MACRO_SPLIT = {'protein': (0.20, 4), 'carbs': (0.50, 4), 'fat': (0.30, 9)}
+
+# Linear preferences per goal on per-serving fiber, sugar (g) and sodium (mg)
+GOAL_PREFERENCES = {
+    'lose_weight': {'fiber': 0.3, 'sugar': -0.1, 'sodium': -0.001},
+    'gain_weight': {'fiber': 0.05},
+    'maintain_weight': {'fiber': 0.15, 'sugar': -0.05, 'sodium': -0.0005},
+}
+
+INTENSITIES = ('low', 'moderate', 'high')
+INTENSITY_PREFERENCES = {
+    'sedentary': {'low': 1.0, 'moderate': 0.3, 'high': -1.0},
+    'lightly_active': {'low': 0.6, 'moderate': 0.6, 'high': -0.5},
+    'moderately_active': {'low': 0.0, 'moderate': 1.0, 'high': 0.3},
+    'very_active': {'low': -0.5, 'moderate': 0.5, 'high': 1.0},
+    'extremely_active': {'low': -1.0, 'moderate': 0.3, 'high': 1.0},
+}
+SESSION_BURN = {'lose_weight': 300.0, 'maintain_weight': 200.0, 'gain_weight': 150.0}
+BURN_SCALE = 100.0
+
+# Seed rows of the exercises table (database/schema.sql)
+DEFAULT_EXERCISES = [
+    {'id': 1, 'name': 'Walking', 'name_vietnamese': 'Đi bộ', 'category': 'cardio', 'calories_per_hour': 200, 'intensity': 'low', 'muscle_groups': ['legs', 'core'], 'equipment_needed': []},
+    {'id': 2, 'name': 'Running', 'name_vietnamese': 'Chạy bộ', 'category': 'cardio', 'calories_per_hour': 600, 'intensity': 'high', 'muscle_groups': ['legs', 'core', 'arms'], 'equipment_needed': []},
+    {'id': 3, 'name': 'Cycling', 'name_vietnamese': 'Đạp xe', 'category': 'cardio', 'calories_per_hour': 400, 'intensity': 'moderate', 'muscle_groups': ['legs', 'core'], 'equipment_needed': ['bicycle']},
+    {'id': 4, 'name': 'Swimming', 'name_vietnamese': 'Bơi lội', 'category': 'cardio', 'calories_per_hour': 500, 'intensity': 'moderate', 'muscle_groups': ['full_body'], 'equipment_needed': ['pool']},
+    {'id': 5, 'name': 'Yoga', 'name_vietnamese': 'Yoga', 'category': 'flexibility', 'calories_per_hour': 200, 'intensity': 'low', 'muscle_groups': ['full_body'], 'equipment_needed': ['yoga_mat']},
+    {'id': 6, 'name': 'Push-ups', 'name_vietnamese': 'Hít đất', 'category': 'strength', 'calories_per_hour': 300, 'intensity': 'moderate', 'muscle_groups': ['chest', 'arms', 'core'], 'equipment_needed': []},
+    {'id': 7, 'name': 'Squats', 'name_vietnamese': 'Squat', 'category': 'strength', 'calories_per_hour': 250, 'intensity': 'moderate', 'muscle_groups': ['legs', 'glutes'], 'equipment_needed': []},
+    {'id': 8, 'name': 'Badminton', 'name_vietnamese': 'Cầu lông', 'category': 'sports', 'calories_per_hour': 350, 'intensity': 'moderate', 'muscle_groups': ['arms', 'legs', 'core'], 'equipment_needed': ['racket', 'shuttlecock']},
+    {'id': 9, 'name': 'Football', 'name_vietnamese': 'Bóng đá', 'category': 'sports', 'calories_per_hour': 500, 'intensity': 'high', 'muscle_groups': ['legs', 'core', 'arms'], 'equipment_needed': ['ball']},
+    {'id': 10, 'name': 'Tai Chi', 'name_vietnamese': 'Thái cực quyền', 'category': 'flexibility', 'calories_per_hour': 150, 'intensity': 'low', 'muscle_groups': ['full_body'], 'equipment_needed': []},
+]
+
+EXERCISES_QUERY = (
+    "SELECT id, name, name_vietnamese, category, calories_per_hour, intensity, duration_minutes, "
+    "muscle_groups, equipment_needed FROM exercises ORDER BY id"
+)
+
+
+def daily_targets(current_goals: str, activity_level: str) -> Dict[str, float]:
+    """
+    Daily calorie and macro targets for a goal and activity level
+    """
+    calories = DAILY_CALORIES.get(activity_level, DAILY_CALORIES['moderately_active'])
+    calories += GOAL_CALORIE_ADJUSTMENT.get(current_goals, 0)
+    targets = {'calories': float(calories)}
+    for macro, (share, per_gram) in MACRO_SPLIT.items():
+        targets[macro] = calories * share / per_gram
+    return targets
+
+
+class CandidateRanker:
+    """
+    Feature matrix plus category/tag bitmaps for one catalog
+    """
+
+    def __init__(self, item_ids: np.ndarray, features: np.ndarray, feature_names: Sequence[str],
+                 categories: List[str], category_codes: np.ndarray, tags: List[str], tag_matrix: np.ndarray):
+        self.item_ids = np.asarray(item_ids)
+        self.features = np.ascontiguousarray(features, dtype=np.float32)
+        self.feature_names = list(feature_names)
+        self.categories = list(categories)
+        self.tags = list(tags)
+        self._feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        self._category_index = {name: i for i, name in enumerate(self.categories)}
+        self._tag_index = {name: i for i, name in enumerate(self.tags)}
+
+        # One packed bitset over the items per category and per tag
+        n = len(self.item_ids)
+        members = np.asarray(category_codes)[np.newaxis, :] == np.arange(len(self.categories))[:, np.newaxis]
+        self.category_bitmaps = np.packbits(members, axis=1)
+        self.tag_bitmaps = np.packbits(np.asarray(tag_matrix, dtype=bool)[:, :len(self.tags)].T, axis=1)
+        self._all_items = np.packbits(np.ones(n, dtype=bool))
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def feature_index(self, name: str) -> int:
+        return self._feature_index[name]
+
+    def candidate_bitmap(self, categories: Optional[Iterable[str]] = None,
+                         require_tags: Optional[Iterable[str]] = None,
+                         exclude_tags: Optional[Iterable[str]] = None) -> Optional[np.ndarray]:
+        """
+        Packed bitset of items in any of `categories` that carry all of
+        `require_tags` and none of `exclude_tags`. None means no filter.
+        Unknown categories or required tags match nothing.
+        """
+        if not categories and not require_tags and not exclude_tags:
+            return None
+        bitmap = self._all_items.copy()
+        if categories:
+            codes = [self._category_index.get(category) for category in categories]
+            codes = [code for code in codes if code is not None]
+            bitmap &= np.bitwise_or.reduce(self.category_bitmaps[codes], axis=0) if codes else 0
+        for tag in require_tags or ():
+            code = self._tag_index.get(tag)
+            bitmap &= self.tag_bitmaps[code] if code is not None else 0
+        for tag in exclude_tags or ():
+            code = self._tag_index.get(tag)
+            if code is not None:
+                bitmap &= ~self.tag_bitmaps[code]
+        return bitmap
+
+    def top_k(self, weights: np.ndarray, k: int, bitmap: Optional[np.ndarray] = None, bias: float = 0.0):
+        """
+        Indices and scores of the k best items for one weight vector,
+        best first
+        """
+        weights = np.asarray(weights, dtype=np.float32)
+        if bitmap is None:
+            candidates = None
+            scores = self.features @ weights
+        else:
+            mask = np.unpackbits(bitmap, count=len(self)).view(bool)
+            candidates = np.flatnonzero(mask)
+            if len(candidates) < SUBSET_SCORING_RATIO * len(self):
+                scores = self.features[candidates] @ weights
+            else:
+                scores = (self.features @ weights)[candidates]
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        indices = best if candidates is None else candidates[best]
+        return indices, scores[best] + bias
+
+    def top_k_batch(self, weights: np.ndarray, k: int) -> np.ndarray:
+        """
+        Top-k indices for several weight vectors (queries, features) with a
+        single matrix product; rows are best first
+        """
+        # (items, features) @ (features, queries) is the BLAS-friendly layout
+        scores = np.ascontiguousarray((self.features @ np.asarray(weights, dtype=np.float32).T).T)
+        k = min(k, scores.shape[1])
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1, kind='stable')
+        return np.take_along_axis(best, order, axis=1)
+
+
+def fit_weights(ranker: CandidateRanker, targets: Dict[str, float], scales: Dict[str, float],
+                linear: Optional[Dict[str, float]] = None):
+    """
+    Weight vector for -sum((x - t)^2 / s^2) + sum(linear * x), plus the
+    constant term dropped from the expansion (so scores stay comparable)
+    """
+    weights = np.zeros(len(ranker.feature_names), dtype=np.float64)
+    bias = 0.0
+    for name, target in targets.items():
+        inverse = 1.0 / scales[name] ** 2
+        weights[ranker.feature_index(f"{name}_sq")] -= inverse
+        weights[ranker.feature_index(name)] += 2.0 * target * inverse
+        bias -= target * target * inverse
+    for name, weight in (linear or {}).items():
+        weights[ranker.feature_index(name)] += weight
+    return weights, bias
+
+
+class FoodRanker:
+    """
+    Rank foods by per-serving fit to a meal's macro budget, goal
+    preferences and dietary tags
+    """
+
+    def __init__(self, store: NutritionStore):
+        self.store = store
+        n = len(store)
+        serving = store.values[:n, store.field_index('serving_size')] / 100.0
+        per_serving = np.column_stack([store.values[:n, store.field_index(field)] * serving for field in FOOD_FEATURES])
+        squares = per_serving[:, :len(FIT_NUTRIENTS)] ** 2
+        self.per_serving = per_serving
+        self.ranker = CandidateRanker(
+            store.food_ids,
+            np.hstack([per_serving, squares]),
+            list(FOOD_FEATURES) + [f"{name}_sq" for name in FIT_NUTRIENTS],
+            store.categories, store.category_codes,
+            store.tags, store.tag_matrix
+        )
+
+    def rank(self, targets: Dict[str, float], current_goals: str, k: int = 5,
+             categories: Optional[List[str]] = None, require_tags: Optional[List[str]] = None,
+             exclude_tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        fit_targets = {name: targets[name] for name in FIT_NUTRIENTS if name in targets}
+        weights, bias = fit_weights(self.ranker, fit_targets, FIT_SCALES, GOAL_PREFERENCES.get(current_goals))
+        bitmap = self.ranker.candidate_bitmap(categories, require_tags, exclude_tags)
+        indices, scores = self.ranker.top_k(weights, k, bitmap, bias)
+        return [self._suggestion(int(i), float(score)) for i, score in zip(indices, scores)]
+
+    def _suggestion(self, i: int, score: float) -> Dict[str, Any]:
+        store = self.store
+        nutrients = dict(zip(FOOD_FEATURES, self.per_serving[i].tolist()))
+        serving_size = float(store.values[i, store.field_index('serving_size')])
+        category = store.categories[store.category_codes[i]] if store.categories else ''
+        name = store.names_vietnamese[i] or store.names[i]
+        return {
+            'id': int(store.food_ids[i]),
+            'name': name,
+            'calories': round(nutrients['calories'], 1),
+            'protein': round(nutrients['protein'], 1),
+            'carbs': round(nutrients['carbs'], 1),
+            'fat': round(nutrients['fat'], 1),
+            'serving_size': serving_size,
+            'category': category,
+            'description': f"{name} ({serving_size:g}g): {nutrients['calories']:.0f} kcal, "
+                           f"{nutrients['protein']:.0f}g protein",
+            'score': round(score, 4),
+        }
+
+
+class ExerciseRanker:
+    """
+    Rank exercises by calorie burn per session against a target and by
+    intensity fit to the activity level
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        n = len(rows)
+        burn = np.array([
+            float(row['calories_per_hour']) * float(row.get('duration_minutes') or 30) / 60.0 for row in rows
+        ])
+        intensity = np.zeros((n, len(INTENSITIES)))
+        for i, row in enumerate(rows):
+            intensity[i, INTENSITIES.index(row.get('intensity') or 'moderate')] = 1.0
+        self.burn = burn
+
+        categories: Dict[str, int] = {}
+        tags: Dict[str, int] = {}
+        category_codes = np.empty(n, dtype=np.int16)
+        item_tags = []
+        for i, row in enumerate(rows):
+            category_codes[i] = categories.setdefault(row.get('category') or '', len(categories))
+            # Equipment is tagged "equipment:<name>" so it can be excluded
+            row_tags = _parse_tags(row.get('muscle_groups')) + [
+                f"equipment:{item}" for item in _parse_tags(row.get('equipment_needed'))
+            ]
+            item_tags.append([tags.setdefault(tag, len(tags)) for tag in row_tags])
+        tag_matrix = np.zeros((n, len(tags)), dtype=bool)
+        for i, tag_ids in enumerate(item_tags):
+            tag_matrix[i, tag_ids] = True
+
+        self.ranker = CandidateRanker(
+            np.array([row['id'] for row in rows]),
+            np.column_stack([burn, burn ** 2, intensity]),
+            ['calories_burned', 'calories_burned_sq'] + [f"intensity_{level}" for level in INTENSITIES],
+            list(categories), category_codes, list(tags), tag_matrix
+        )
+
+    @classmethod
+    def from_json(cls, path: str) -> 'ExerciseRanker':
+        """
+        Load an export of the exercises table (a JSON list of rows)
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_database(cls, connection) -> 'ExerciseRanker':
+        with connection.cursor() as cursor:
+            cursor.execute(EXERCISES_QUERY)
+            return cls(list(cursor.fetchall()))
+
+    def rank(self, target_burn: float, activity_level: str, k: int = 3,
+             categories: Optional[List[str]] = None, exclude_tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        preferences = INTENSITY_PREFERENCES.get(activity_level, INTENSITY_PREFERENCES['moderately_active'])
+        weights, bias = fit_weights(
+            self.ranker, {'calories_burned': target_burn}, {'calories_burned': BURN_SCALE},
+            {f"intensity_{level}": weight for level, weight in preferences.items()}
+        )
+        bitmap = self.ranker.candidate_bitmap(categories, None, exclude_tags)
+        indices, scores = self.ranker.top_k(weights, k, bitmap, bias)
+        return [self._suggestion(int(i), float(score)) for i, score in zip(indices, scores)]
+
+    def _suggestion(self, i: int, score: float) -> Dict[str, Any]:
+        row = self.rows[i]
+        name = row.get('name_vietnamese') or row['name']
+        minutes = int(row.get('duration_minutes') or 30)
+        return {
+            'id': int(row['id']),
+            'name': name,
+            'duration': f"{minutes} phút",
+            'calories_burned': round(float(self.burn[i])),
+            'intensity': row.get('intensity') or 'moderate',
+            'description': row.get('description') or f"{name}, cường độ {row.get('intensity') or 'moderate'}",
+            'score': round(score, 4),
+        }
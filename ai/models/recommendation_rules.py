@@ -0,0 +1,262 @@
+"""
+Table-driven health scoring and recommendation rules.
+
+A rule set (see DEFAULT_RULES) gives every metric three thresholds
+(low, high, very_high) that split its values into four bands. Each band
+carries a score penalty, and each band except "normal" carries a message.
+A metric's optional message_thresholds let a message trigger at other
+levels than the penalty (e.g. advise more protein before penalizing).
+RuleEngine.compile turns a rule set into NumPy arrays once, and
+RuleEngine.evaluate then scores any number of nutrition vectors in a
+single call.
+
+Per-user thresholds come from active `user_goals` rows. They are compiled
+into a separate UserOverrides table and applied row by row at evaluation
+time, so changing a goal never recompiles the rule set. A goal threshold
+applies to both the score and the message.
+"""
+import copy
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ('low', 'high', 'very_high')
+BAND_LOW, BAND_NORMAL, BAND_HIGH, BAND_VERY_HIGH = range(4)
+
+# Calories per gram, for metrics such as "fat_percentage"
+CALORIES_PER_GRAM = {'protein': 4, 'carbs': 4, 'fat': 9}
+
+USER_GOALS_QUERY = (
+    "SELECT user_id, goal_type, target_value, target_unit FROM user_goals "
+    "WHERE is_active = TRUE ORDER BY user_id, updated_at"
+)
+
+DEFAULT_RULES = {
+    'base_score': 100.0,
+    'balanced_message': "Chế độ dinh dưỡng của bạn rất cân bằng! Hãy duy trì.",
+    'metrics': {
+        # Daily calories (1500-2500 for adults)
+        'calories': {
+            'thresholds': {'low': 1200, 'high': 2500, 'very_high': 3000},
+            'penalties': {'low': 20, 'high': 10, 'very_high': 15},
+            'messages': {
+                'low': "Lượng calo quá thấp. Hãy tăng khẩu phần ăn với thực phẩm lành mạnh.",
+                'high': "Lượng calo hơi cao. Hãy giảm khẩu phần và tăng hoạt động thể chất.",
+            },
+        },
+        # Daily protein in grams (50-100g for adults)
+        'protein': {
+            'thresholds': {'low': 40, 'high': 120, 'very_high': 150},
+            'message_thresholds': {'low': 50},
+            'penalties': {'low': 15, 'high': 0, 'very_high': 10},
+            'messages': {
+                'low': "Cần tăng protein. Hãy thêm thịt, cá, đậu, trứng vào bữa ăn.",
+                'high': "Lượng protein hơi cao. Hãy cân bằng với rau củ và trái cây.",
+            },
+        },
+        # Share of calories from fat (20-35%)
+        'fat_percentage': {
+            'thresholds': {'low': 15, 'high': 35, 'very_high': 40},
+            'message_thresholds': {'low': 20},
+            'penalties': {'low': 10, 'high': 0, 'very_high': 15},
+            'messages': {
+                'low': "Cần tăng chất béo lành mạnh từ dầu olive, bơ, các loại hạt.",
+                'high': "Lượng chất béo hơi cao. Hãy chọn thực phẩm ít béo hơn.",
+            },
+        },
+    },
+    # Threshold overrides applied for a user's active goal type
+    'goal_presets': {
+        'weight_loss': {'calories': {'high': 2000, 'very_high': 2500}},
+        'weight_gain': {'calories': {'low': 2000, 'high': 3000, 'very_high': 3500}},
+        'muscle_gain': {'protein': {'low': 80, 'high': 180, 'very_high': 220}},
+        'endurance': {'calories': {'high': 3000, 'very_high': 3500}},
+    },
+    # Goals with a daily nutrient target set thresholds relative to it
+    'goal_targets': {
+        'kcal': {'metric': 'calories', 'factors': {'low': 0.8, 'high': 1.1, 'very_high': 1.25}},
+        'g_protein': {'metric': 'protein', 'factors': {'low': 0.9, 'high': 1.5, 'very_high': 2.0}},
+    },
+}
+
+
+def default_rules() -> Dict[str, Any]:
+    return copy.deepcopy(DEFAULT_RULES)
+
+
+def metric_values(metric: str, totals: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Value of a metric per row: a nutrient total, or "<nutrient>_percentage"
+    for its share of calories (0 where calories are not positive)
+    """
+    if metric.endswith('_percentage'):
+        nutrient = metric[:-len('_percentage')]
+        calories = np.asarray(totals['calories'], dtype=np.float64)
+        ratio = np.divide(np.asarray(totals[nutrient], dtype=np.float64) * CALORIES_PER_GRAM[nutrient], calories,
+                          out=np.zeros_like(calories), where=calories > 0)
+        return ratio * 100
+    return np.asarray(totals[metric], dtype=np.float64)
+
+
+class UserOverrides:
+    """
+    Per-user thresholds, (users, metrics, levels) with NaN where the rule
+    set default applies
+    """
+
+    def __init__(self, user_ids: np.ndarray, thresholds: np.ndarray):
+        order = np.argsort(user_ids, kind='stable')
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)[order]
+        self.thresholds = thresholds[order]
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def thresholds_for(self, user_ids: np.ndarray, defaults: np.ndarray) -> np.ndarray:
+        """
+        Effective thresholds (len(user_ids), metrics, levels)
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        result = np.broadcast_to(defaults, (len(user_ids),) + defaults.shape).copy()
+        if not len(self.user_ids):
+            return result
+        positions = np.minimum(np.searchsorted(self.user_ids, user_ids), len(self.user_ids) - 1)
+        found = self.user_ids[positions] == user_ids
+        overrides = self.thresholds[positions[found]]
+        result[found] = np.where(np.isnan(overrides), result[found], overrides)
+        return result
+
+
+class RuleEngine:
+    """
+    Compiled rule set; see the module docstring
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.rules = rules
+        self.metrics = list(rules['metrics'])
+        self.base_score = float(rules['base_score'])
+        m = len(self.metrics)
+
+        self.thresholds = np.empty((m, len(LEVELS)), dtype=np.float64)
+        self.message_thresholds = np.empty((m, len(LEVELS)), dtype=np.float64)
+        self.penalties = np.zeros((m, 4), dtype=np.float64)
+        # Message bits: 2*i for metric i too low, 2*i + 1 for too high
+        self.message_bits = np.zeros((m, 4), dtype=np.int64)
+        self.messages: List[str] = []
+        for i, metric in enumerate(self.metrics):
+            rule = rules['metrics'][metric]
+            self.thresholds[i] = [rule['thresholds'][level] for level in LEVELS]
+            message_thresholds = {**rule['thresholds'], **rule.get('message_thresholds', {})}
+            self.message_thresholds[i] = [message_thresholds[level] for level in LEVELS]
+            penalties = rule.get('penalties', {})
+            self.penalties[i] = [penalties.get('low', 0), 0, penalties.get('high', 0), penalties.get('very_high', 0)]
+            messages = rule.get('messages', {})
+            self.messages += [messages.get('low'), messages.get('high')]
+            self.message_bits[i] = [1 << (2 * i) if messages.get('low') else 0, 0,
+                                    1 << (2 * i + 1) if messages.get('high') else 0,
+                                    1 << (2 * i + 1) if messages.get('high') else 0]
+        self.balanced_bit = 1 << (2 * m)
+        self.messages.append(rules['balanced_message'])
+        self._metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+
+    @classmethod
+    def compile(cls, rules: Optional[Dict[str, Any]] = None) -> 'RuleEngine':
+        return cls(rules if rules is not None else default_rules())
+
+    def metric_matrix(self, totals: Dict[str, np.ndarray]) -> np.ndarray:
+        return np.column_stack([metric_values(metric, totals) for metric in self.metrics])
+
+    def evaluate(self, totals: Dict[str, np.ndarray], user_ids: Optional[np.ndarray] = None,
+                 overrides: Optional[UserOverrides] = None) -> Dict[str, np.ndarray]:
+        """
+        Score rows of nutrient totals (dict of equal-length arrays). Returns
+        the metric matrix, band per metric, health_score and a
+        recommendation bitmask per row.
+        """
+        values = self.metric_matrix(totals)
+        if overrides is not None and user_ids is not None and len(overrides):
+            thresholds = overrides.thresholds_for(user_ids, self.thresholds)
+            message_thresholds = overrides.thresholds_for(user_ids, self.message_thresholds)
+        else:
+            thresholds = self.thresholds[np.newaxis]
+            message_thresholds = self.message_thresholds[np.newaxis]
+
+        bands = self._bands(values, thresholds)
+        metric_rows = np.arange(len(self.metrics))
+        scores = self.base_score - self.penalties[metric_rows, bands].sum(axis=1)
+        message_bands = self._bands(values, message_thresholds)
+        flags = np.bitwise_or.reduce(self.message_bits[metric_rows, message_bands], axis=1)
+        flags[flags == 0] = self.balanced_bit
+
+        return {
+            'metrics': values,
+            'bands': bands,
+            'health_score': np.clip(scores, 0, 100),
+            'recommendation_flags': flags,
+        }
+
+    @staticmethod
+    def _bands(values: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+        low, high, very_high = thresholds[..., 0], thresholds[..., 1], thresholds[..., 2]
+        # Same precedence as an if/elif chain: low, then very high, then high
+        return np.where(values < low, BAND_LOW,
+                        np.where(values > very_high, BAND_VERY_HIGH,
+                                 np.where(values > high, BAND_HIGH, BAND_NORMAL)))
+
+    def evaluate_one(self, totals: Dict[str, float], user_id: Optional[int] = None,
+                     overrides: Optional[UserOverrides] = None) -> Dict[str, Any]:
+        result = self.evaluate({k: np.array([v], dtype=np.float64) for k, v in totals.items()},
+                               None if user_id is None else np.array([user_id]), overrides)
+        return {
+            'health_score': float(result['health_score'][0]),
+            'recommendations': self.recommendations_for(int(result['recommendation_flags'][0])),
+        }
+
+    def recommendations_for(self, flags: int) -> List[str]:
+        return [message for bit, message in enumerate(self.messages) if flags & (1 << bit)]
+
+    def compile_overrides(self, goals: Iterable[Dict[str, Any]]) -> UserOverrides:
+        """
+        Compile user_goals rows (user_id, goal_type, target_value,
+        target_unit) into per-user thresholds. Later rows win.
+        """
+        presets = self.rules.get('goal_presets', {})
+        targets = self.rules.get('goal_targets', {})
+        per_user: Dict[int, np.ndarray] = {}
+
+        for goal in goals:
+            user_thresholds = per_user.setdefault(
+                int(goal['user_id']), np.full(self.thresholds.shape, np.nan)
+            )
+            for metric, levels in presets.get(goal.get('goal_type'), {}).items():
+                self._set_levels(user_thresholds, metric, levels)
+            target = targets.get(goal.get('target_unit'))
+            if target and goal.get('target_value'):
+                value = float(goal['target_value'])
+                self._set_levels(user_thresholds, target['metric'],
+                                 {level: value * factor for level, factor in target['factors'].items()})
+
+        user_ids = np.fromiter(per_user, dtype=np.int64, count=len(per_user))
+        thresholds = np.stack(list(per_user.values())) if per_user else np.empty((0,) + self.thresholds.shape)
+        return UserOverrides(user_ids, thresholds)
+
+    def _set_levels(self, user_thresholds: np.ndarray, metric: str, levels: Dict[str, float]):
+        i = self._metric_index.get(metric)
+        if i is None:
+            return
+        for level, value in levels.items():
+            user_thresholds[i, LEVELS.index(level)] = value
+
+    def load_overrides(self, connection) -> UserOverrides:
+        """
+        Compile the active goals of every user from a DB-API connection
+        whose cursors return dict rows
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(USER_GOALS_QUERY)
+            goals = cursor.fetchall()
+        return self.compile_overrides(goals)
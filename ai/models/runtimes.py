@@ -0,0 +1,125 @@
+import os
+from typing import Optional
+import logging
+
+import numpy as np
+
+from .shared_weights import is_shared_bundle
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('keras', 'tflite', 'onnx', 'shared')
+
+
+def detect_backend(model_path: Optional[str]) -> str:
+    """
+    Pick a runtime backend from the model path: a shared-weights bundle
+    directory, or the model file extension
+    """
+    if is_shared_bundle(model_path):
+        return 'shared'
+    extension = os.path.splitext(model_path or '')[1].lower()
+    if extension == '.tflite':
+        return 'tflite'
+    if extension == '.onnx':
+        return 'onnx'
+    return 'keras'
+
+
+class KerasRuntime:
+    """
+    Run a tf.keras model directly
+    """
+
+    name = 'keras'
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        # predict_on_batch skips the per-call data adapter setup of predict()
+        return np.asarray(self.model.predict_on_batch(images))
+
+
+class TFLiteRuntime:
+    """
+    Run a .tflite flatbuffer (float or int8-quantized) with the TFLite
+    interpreter. Prefers the standalone tflite_runtime package, which does
+    not need the full TensorFlow install. An interpreter is not thread-safe,
+    so each worker needs its own FoodRecognitionModel.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+
+    def _quantize(self, images: np.ndarray) -> np.ndarray:
+        scale, zero_point = self._input['quantization']
+        if self._input['dtype'] == np.float32 or not scale:
+            return images.astype(self._input['dtype'], copy=False)
+        return np.round(images / scale + zero_point).astype(self._input['dtype'])
+
+    def _dequantize(self, outputs: np.ndarray) -> np.ndarray:
+        scale, zero_point = self._output['quantization']
+        if self._output['dtype'] == np.float32 or not scale:
+            return outputs.astype(np.float32, copy=False)
+        return (outputs.astype(np.float32) - zero_point) * scale
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        if images.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input['index'], list(images.shape))
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = images.shape[0]
+
+        self.interpreter.set_tensor(self._input['index'], self._quantize(images))
+        self.interpreter.invoke()
+        # get_tensor returns a copy, so the result survives the next invoke()
+        return self._dequantize(self.interpreter.get_tensor(self._output['index']))
+
+
+class ONNXRuntime:
+    """
+    Run an .onnx model (float or QDQ int8) with onnxruntime on CPU
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: images.astype(np.float32, copy=False)})[0]
+
+
+def load_runtime(model_path: str, backend: str, num_threads: Optional[int] = None):
+    """
+    Open an exported model with the requested non-Keras runtime
+    """
+    if backend == 'tflite':
+        return TFLiteRuntime(model_path, num_threads)
+    if backend == 'onnx':
+        return ONNXRuntime(model_path, num_threads)
+    if backend == 'shared':
+        from .shared_weights import SharedONNXRuntime
+        return SharedONNXRuntime(model_path, num_threads)
+    raise ValueError(f"Unknown runtime backend: {backend}")
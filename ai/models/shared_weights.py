@@ -0,0 +1,201 @@
+"""
+Share model weights and nutrition tables across service processes.
+
+A shared bundle is a directory holding:
+
+    model.onnx      the ONNX graph; large initializers are stored as
+                    external data pointing into weights.snap
+    weights.snap    one read-only snapshot file of 64-byte aligned arrays
+                    (model initializers plus the NutritionStore columns)
+
+Every worker memory-maps weights.snap and hands the mapped arrays to
+onnxruntime as user-owned initializers with pre-packing disabled, so the
+weights live once in the page cache no matter how many uvicorn workers or
+pool processes run.
+
+    python -m models.shared_weights --model food_model.keras --output shared_model/
+"""
+import argparse
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'DATNSNP1'
+ALIGNMENT = 64
+GRAPH_FILENAME = 'model.onnx'
+SNAPSHOT_FILENAME = 'weights.snap'
+NUTRITION_PREFIX = 'nutrition.'
+
+# Small constants are read during graph shape inference and must stay inline
+MIN_SHARED_BYTES = 4096
+
+
+def _align(offset: int) -> int:
+    return offset + (-offset) % ALIGNMENT
+
+
+def write_snapshot(path: str, arrays: Dict[str, np.ndarray], metadata: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """
+    Write named arrays into one aligned snapshot file. Returns the absolute
+    byte offset of every array's data.
+    """
+    entries, offset = {}, 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        entries[name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str}
+        offset += array.nbytes
+
+    header = json.dumps({'arrays': entries, 'metadata': metadata or {}}).encode('utf-8')
+    data_start = _align(len(SNAPSHOT_MAGIC) + 8 + len(header))
+
+    with open(path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + entries[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        # Extend the file past the last offset, which an empty array may not reach
+        f.truncate(data_start + offset)
+
+    return {name: data_start + entry['offset'] for name, entry in entries.items()}
+
+
+class Snapshot:
+    """
+    Read-only memory map of a snapshot file; `arrays` are zero-copy views
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a weight snapshot")
+            (header_length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        data_start = _align(len(SNAPSHOT_MAGIC) + 8 + header_length)
+
+        self._map = np.memmap(path, mode='r')
+        self.metadata = header['metadata']
+        self.arrays = {
+            name: np.ndarray(tuple(entry['shape']), dtype=np.dtype(entry['dtype']),
+                             buffer=self._map, offset=data_start + entry['offset'])
+            for name, entry in header['arrays'].items()
+        }
+
+
+def create_shared_bundle(onnx_path: str, output_dir: str, nutrition_store) -> str:
+    """
+    Split an ONNX model into a graph file plus a shared snapshot holding
+    the weights and the given NutritionStore
+    """
+    import onnx
+    from onnx import numpy_helper
+
+    model = onnx.load(onnx_path)
+    shared = {}
+    for initializer in model.graph.initializer:
+        array = numpy_helper.to_array(initializer)
+        if array.nbytes >= MIN_SHARED_BYTES:
+            shared[initializer.name] = array
+
+    arrays = dict(shared)
+    arrays.update(nutrition_store.to_arrays(prefix=NUTRITION_PREFIX))
+    os.makedirs(output_dir, exist_ok=True)
+    offsets = write_snapshot(
+        os.path.join(output_dir, SNAPSHOT_FILENAME), arrays,
+        metadata={'nutrition': nutrition_store.to_metadata(), 'initializers': list(shared)}
+    )
+
+    # Point the graph's initializers at the snapshot, so the graph is still a
+    # valid ONNX model with external data even without the shared runtime
+    for initializer in model.graph.initializer:
+        if initializer.name not in shared:
+            continue
+        for field in ('raw_data', 'float_data', 'int32_data', 'int64_data', 'double_data'):
+            initializer.ClearField(field)
+        del initializer.external_data[:]
+        for key, value in (('location', SNAPSHOT_FILENAME), ('offset', str(offsets[initializer.name])),
+                           ('length', str(shared[initializer.name].nbytes))):
+            entry = initializer.external_data.add()
+            entry.key, entry.value = key, value
+        initializer.data_location = onnx.TensorProto.EXTERNAL
+
+    # onnx.save would try to rewrite the external data, so serialize directly
+    with open(os.path.join(output_dir, GRAPH_FILENAME), 'wb') as f:
+        f.write(model.SerializeToString())
+
+    size = sum(array.nbytes for array in shared.values())
+    logger.info(f"Shared bundle written to {output_dir} ({len(shared)} initializers, {size / 1e6:.1f} MB)")
+    return output_dir
+
+
+def is_shared_bundle(path: Optional[str]) -> bool:
+    return bool(path) and os.path.isfile(os.path.join(path, SNAPSHOT_FILENAME))
+
+
+class SharedONNXRuntime:
+    """
+    onnxruntime session whose weights are read straight from the mapped
+    snapshot instead of being copied into each process
+    """
+
+    name = 'shared'
+
+    def __init__(self, bundle_dir: str, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        self.snapshot = Snapshot(os.path.join(bundle_dir, SNAPSHOT_FILENAME))
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Pre-packing would copy weights into private, per-session buffers
+        options.add_session_config_entry('session.disable_prepacking', '1')
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        # OrtValues wrap the mapped memory; keep them alive with the session
+        self._initializers = []
+        for name in self.snapshot.metadata['initializers']:
+            value = ort.OrtValue.ortvalue_from_numpy(self.snapshot.arrays[name])
+            options.add_initializer(name, value)
+            self._initializers.append(value)
+
+        self.session = ort.InferenceSession(
+            os.path.join(bundle_dir, GRAPH_FILENAME), options, providers=['CPUExecutionProvider']
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: images.astype(np.float32, copy=False)})[0]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Keras model to export (a freshly built model if omitted)')
+    parser.add_argument('--onnx', help='Use an already exported (optionally int8) ONNX model instead')
+    parser.add_argument('--output', required=True, help='Bundle directory to create')
+    args = parser.parse_args(argv)
+
+    from .food_recognition import FoodRecognitionModel
+    from .model_export import export_onnx
+
+    model = FoodRecognitionModel(args.model, backend='keras', lazy=args.onnx is not None)
+    onnx_path = args.onnx
+    if onnx_path is None:
+        os.makedirs(args.output, exist_ok=True)
+        onnx_path = export_onnx(model.model, os.path.join(args.output, 'float.onnx'))
+
+    create_shared_bundle(onnx_path, args.output, model.nutrition_store)
+    if args.onnx is None:
+        os.remove(onnx_path)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
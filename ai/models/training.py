@@ -0,0 +1,346 @@
+"""
+Streaming training pipeline for FoodRecognitionModel.
+
+Photos are laid out one directory per class under the data root; a
+directory matches a class name after diacritic folding, so both
+"phở bò/" and "pho_bo/" work. The first run decodes every JPEG once, in
+parallel, into TFRecord shards of resized raw uint8 pixels under
+cache_dir. Every epoch then streams those shards:
+
+    shuffled shard files -> parallel interleave -> shuffle buffer
+    -> parallel augment + normalize -> batch -> prefetch
+
+so JPEG decoding is paid once per dataset, not once per epoch, and
+memory stays bounded by the shuffle buffer. Training checkpoints to
+checkpoint_dir (every checkpoint_steps batches, or every epoch) and an
+interrupted run resumes from the last checkpoint.
+
+    python -m models.training data/photos --cache-dir cache/ --checkpoint-dir ckpt/ --output food_model.keras
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from .architectures import ARCHITECTURES
+from .food_search import fold
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+SHARD_SIZE = 2048
+SHUFFLE_BUFFER = 4096
+MANIFEST = 'manifest.json'
+
+
+def list_images(data_path: str, class_names: List[str]) -> Tuple[List[str], List[int], List[str]]:
+    """
+    Image paths and class indices under data_path/<class>/; directories
+    that match no class are returned as the third element
+    """
+    classes = {fold(name).replace(' ', '_'): i for i, name in enumerate(class_names)}
+    paths, labels, unknown = [], [], []
+    for entry in sorted(os.scandir(data_path), key=lambda entry: entry.name):
+        if not entry.is_dir():
+            continue
+        label = classes.get(fold(entry.name).replace(' ', '_'))
+        if label is None:
+            unknown.append(entry.name)
+            continue
+        for root, _, files in os.walk(entry.path):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+                    labels.append(label)
+    return paths, labels, unknown
+
+
+def split_validation(paths: List[str], labels: List[int], fraction: float) -> Tuple[Tuple[list, list], Tuple[list, list]]:
+    """
+    Deterministic split by path hash, stable as images are added
+    """
+    train, validation = ([], []), ([], [])
+    for path, label in zip(paths, labels):
+        bucket = int(hashlib.md5(path.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+        target = validation if bucket < fraction else train
+        target[0].append(path)
+        target[1].append(label)
+    return train, validation
+
+
+def source_fingerprint(paths: List[str], labels: List[int], image_size: Tuple[int, int]) -> str:
+    digest = hashlib.sha1(repr(image_size).encode('utf-8'))
+    for path, label in zip(paths, labels):
+        stat = os.stat(path)
+        digest.update(f"{path}\0{label}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ShardCache:
+    """
+    Decoded, resized images as TFRecord shards of raw uint8 pixels, reused
+    while the source images (paths, sizes, mtimes) and size are unchanged
+    """
+
+    def __init__(self, directory: str, image_size: Tuple[int, int], shard_size: int = SHARD_SIZE):
+        self.directory = directory
+        self.image_size = image_size
+        self.shard_size = shard_size
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST)
+
+    def manifest(self) -> Optional[Dict]:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @property
+    def shard_paths(self) -> List[str]:
+        manifest = self.manifest() or {}
+        return [os.path.join(self.directory, name) for name in manifest.get('shards', [])]
+
+    def ensure(self, paths: List[str], labels: List[int]) -> Dict:
+        """
+        Build the shards unless a cache for exactly these images exists
+        """
+        fingerprint = source_fingerprint(paths, labels, self.image_size)
+        manifest = self.manifest()
+        if manifest and manifest.get('fingerprint') == fingerprint and \
+                all(os.path.exists(path) for path in self.shard_paths):
+            logger.info(f"Using cached shards in {self.directory} ({manifest['count']} images)")
+            return manifest
+        return self.build(paths, labels, fingerprint)
+
+    def build(self, paths: List[str], labels: List[int], fingerprint: str) -> Dict:
+        import tensorflow as tf
+
+        os.makedirs(self.directory, exist_ok=True)
+        width, height = self.image_size
+
+        def decode(path, label):
+            image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+            image = tf.image.resize(image, (height, width), method='bicubic', antialias=True)
+            image = tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+            return tf.io.serialize_tensor(image), label
+
+        # Decode in parallel; order does not matter because training shuffles
+        dataset = tf.data.Dataset.from_tensor_slices((paths, labels)) \
+            .map(decode, num_parallel_calls=tf.data.AUTOTUNE, deterministic=False) \
+            .ignore_errors() \
+            .prefetch(tf.data.AUTOTUNE)
+
+        started = time.perf_counter()
+        shards, count, writer = [], 0, None
+        try:
+            for image, label in dataset.as_numpy_iterator():
+                if count % self.shard_size == 0:
+                    if writer is not None:
+                        writer.close()
+                    shards.append(f"shard-{len(shards):05d}.tfrecord")
+                    writer = tf.io.TFRecordWriter(os.path.join(self.directory, shards[-1] + '.tmp'))
+                example = tf.train.Example(features=tf.train.Features(feature={
+                    'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[image])),
+                    'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+                }))
+                writer.write(example.SerializeToString())
+                count += 1
+        finally:
+            if writer is not None:
+                writer.close()
+        for name in shards:
+            os.replace(os.path.join(self.directory, name + '.tmp'), os.path.join(self.directory, name))
+
+        elapsed = time.perf_counter() - started
+        manifest = {
+            'fingerprint': fingerprint, 'count': count, 'skipped': len(paths) - count,
+            'image_size': list(self.image_size), 'shards': shards,
+        }
+        with open(self.manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+        logger.info(f"Cached {count} images into {len(shards)} shards in {elapsed:.1f}s "
+                    f"({count / elapsed if elapsed else 0:.0f} images/s, {len(paths) - count} unreadable)")
+        return manifest
+
+    def dataset(self, num_classes: int, batch_size: int, training: bool, seed: Optional[int] = None):
+        """
+        Batches of (float32 images in [0, 1], one-hot labels)
+        """
+        import tensorflow as tf
+
+        width, height = self.image_size
+        features = {
+            'image': tf.io.FixedLenFeature([], tf.string),
+            'label': tf.io.FixedLenFeature([], tf.int64),
+        }
+
+        def parse(record):
+            example = tf.io.parse_single_example(record, features)
+            image = tf.ensure_shape(tf.io.parse_tensor(example['image'], tf.uint8), (height, width, 3))
+            return image, example['label']
+
+        def prepare(image, label):
+            image = tf.image.convert_image_dtype(image, tf.float32)
+            if training:
+                image = augment(image, height, width)
+            return image, tf.one_hot(label, num_classes)
+
+        files = tf.data.Dataset.from_tensor_slices(self.shard_paths)
+        if training:
+            files = files.shuffle(len(self.shard_paths), seed=seed, reshuffle_each_iteration=True)
+        dataset = files.interleave(
+            tf.data.TFRecordDataset, cycle_length=min(4, max(len(self.shard_paths), 1)),
+            num_parallel_calls=tf.data.AUTOTUNE, deterministic=not training
+        ).map(parse, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not training)
+        if training:
+            dataset = dataset.shuffle(SHUFFLE_BUFFER, seed=seed, reshuffle_each_iteration=True)
+        return dataset \
+            .map(prepare, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not training) \
+            .batch(batch_size) \
+            .prefetch(tf.data.AUTOTUNE)
+
+
+def augment(image, height: int, width: int):
+    """
+    Random flip, zoom-in crop and brightness/contrast jitter
+    """
+    import tensorflow as tf
+
+    image = tf.image.random_flip_left_right(image)
+    scale = tf.random.uniform([], 0.8, 1.0)
+    crop = (tf.cast(scale * height, tf.int32), tf.cast(scale * width, tf.int32))
+    image = tf.image.random_crop(image, (crop[0], crop[1], 3))
+    image = tf.image.resize(image, (height, width))
+    image = tf.image.random_brightness(image, 0.1)
+    image = tf.image.random_contrast(image, 0.9, 1.1)
+    return tf.clip_by_value(image, 0.0, 1.0)
+
+
+def _throughput_callback(batch_size: int, images_per_epoch: int, log_every: int, report: Dict):
+    import tensorflow as tf
+
+    class Throughput(tf.keras.callbacks.Callback):
+        """
+        Images/sec per epoch, and every log_every batches
+        """
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.epoch_started = self.window_started = time.perf_counter()
+            self.images = self.window_images = 0
+
+        def on_train_batch_end(self, batch, logs=None):
+            self.images += batch_size
+            self.window_images += batch_size
+            if log_every and (batch + 1) % log_every == 0:
+                now = time.perf_counter()
+                logger.info(f"Batch {batch + 1}: {self.window_images / (now - self.window_started):.1f} images/s")
+                self.window_started, self.window_images = now, 0
+
+        def on_epoch_end(self, epoch, logs=None):
+            elapsed = time.perf_counter() - self.epoch_started
+            # The last batch of an epoch is usually short
+            self.images = min(self.images, images_per_epoch)
+            rate = self.images / elapsed if elapsed else 0.0
+            entry = {'epoch': epoch + 1, 'images': self.images, 'seconds': elapsed, 'images_per_s': rate}
+            entry.update({key: float(value) for key, value in (logs or {}).items()})
+            report['epochs'].append(entry)
+            logger.info(f"Epoch {epoch + 1}: {rate:.1f} images/s ({elapsed:.1f}s)")
+
+    return Throughput()
+
+
+def train_model(model, train_data_path: str, epochs: int = 50, batch_size: int = 32,
+                cache_dir: Optional[str] = None, checkpoint_dir: Optional[str] = None,
+                checkpoint_steps: Optional[int] = None, validation_split: float = 0.1,
+                log_every: int = 100, seed: Optional[int] = None) -> Dict:
+    """
+    Train a FoodRecognitionModel's Keras model; see the module docstring.
+    Returns a report with per-epoch images/sec and metrics.
+    """
+    import tensorflow as tf
+
+    paths, labels, unknown = list_images(train_data_path, model.class_names)
+    if unknown:
+        logger.warning(f"Ignoring directories that match no class: {', '.join(unknown)}")
+    if not paths:
+        raise ValueError(f"No training images found under {train_data_path}")
+
+    model.ensure_loaded()
+    if model.backend != 'keras':
+        raise ValueError("Training needs the Keras backend")
+
+    cache_dir = cache_dir or os.path.join(train_data_path, '.cache')
+    image_size = model.preprocessor.target_size
+    size_tag = f"{image_size[0]}x{image_size[1]}"
+    (train_paths, train_labels), (val_paths, val_labels) = split_validation(paths, labels, validation_split)
+    train_cache = ShardCache(os.path.join(cache_dir, f"train-{size_tag}"), image_size)
+    train_manifest = train_cache.ensure(train_paths, train_labels)
+    num_classes = len(model.class_names)
+    train_dataset = train_cache.dataset(num_classes, batch_size, training=True, seed=seed)
+    validation_dataset = None
+    if val_paths:
+        val_cache = ShardCache(os.path.join(cache_dir, f"validation-{size_tag}"), image_size)
+        val_cache.ensure(val_paths, val_labels)
+        validation_dataset = val_cache.dataset(num_classes, batch_size, training=False)
+
+    report = {'train_images': len(train_paths), 'validation_images': len(val_paths), 'epochs': []}
+    callbacks = [_throughput_callback(batch_size, train_manifest['count'], log_every, report)]
+    if checkpoint_dir:
+        # Restores weights, optimizer state and epoch of an interrupted run
+        callbacks.append(tf.keras.callbacks.BackupAndRestore(
+            os.path.join(checkpoint_dir, 'backup'), save_freq=checkpoint_steps or 'epoch'
+        ))
+
+    started = time.perf_counter()
+    model.model.fit(train_dataset, validation_data=validation_dataset, epochs=epochs, callbacks=callbacks,
+                    verbose=0)
+    elapsed = time.perf_counter() - started
+    images = sum(entry['images'] for entry in report['epochs'])
+    report['seconds'] = elapsed
+    report['images_per_s'] = images / elapsed if elapsed else 0.0
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('data_path', help='Directory with one subdirectory of photos per class')
+    parser.add_argument('--output', required=True, help='Where to save the trained model (.keras)')
+    parser.add_argument('--model', help='Continue from this saved model')
+    parser.add_argument('--architecture', choices=sorted(ARCHITECTURES), help='Backbone for a new model')
+    parser.add_argument('--input-size', type=int, help='Input resolution for a new model')
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--cache-dir', help='Shard cache directory (default: <data_path>/.cache)')
+    parser.add_argument('--checkpoint-dir', help='Checkpoint here and resume an interrupted run')
+    parser.add_argument('--checkpoint-steps', type=int, help='Checkpoint every N batches instead of every epoch')
+    parser.add_argument('--validation-split', type=float, default=0.1)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--report', help='Write the JSON training report to this file')
+    args = parser.parse_args(argv)
+
+    from .food_recognition import FoodRecognitionModel
+
+    model = FoodRecognitionModel(args.model, backend='keras', architecture=args.architecture,
+                                 input_size=args.input_size)
+    report = model.train(
+        args.data_path, epochs=args.epochs, batch_size=args.batch_size, cache_dir=args.cache_dir,
+        checkpoint_dir=args.checkpoint_dir, checkpoint_steps=args.checkpoint_steps,
+        validation_split=args.validation_split, seed=args.seed
+    )
+    model.save_model(args.output)
+    print(f"Trained on {report['train_images']} images at {report['images_per_s']:.1f} images/s")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
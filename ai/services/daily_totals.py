@@ -0,0 +1,301 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOTAL_FIELDS = ('calories', 'protein', 'carbs', 'fat')
+
+Key = Tuple[int, str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_totals (
+    user_id INTEGER NOT NULL,
+    meal_date TEXT NOT NULL,
+    calories REAL NOT NULL,
+    protein REAL NOT NULL,
+    carbs REAL NOT NULL,
+    fat REAL NOT NULL,
+    meal_count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, meal_date)
+);
+CREATE TABLE IF NOT EXISTS meal_entries (
+    meal_id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    meal_date TEXT NOT NULL,
+    calories REAL NOT NULL,
+    protein REAL NOT NULL,
+    carbs REAL NOT NULL,
+    fat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS totals_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    meal_date TEXT NOT NULL,
+    meal_id INTEGER NOT NULL
+);
+"""
+
+
+def normalize_date(value) -> str:
+    """
+    ISO date string for a date, datetime or 'YYYY-MM-DD...' string
+    """
+    if isinstance(value, date):
+        return value.isoformat()[:10]
+    return date.fromisoformat(str(value)[:10]).isoformat()
+
+
+class DailyTotalsStore:
+    """
+    Running nutrition totals per (user_id, meal_date), mirroring the
+    meals table's idx_user_date index
+
+    Meal adds, updates and deletes are applied as O(1) deltas to the
+    in-memory totals and written through to SQLite in the same call, so a
+    restart (or an evicted key) reloads exactly what was acknowledged.
+    Only the most recently used max_entries days and meals stay in memory.
+
+    Several processes (uvicorn workers) may share one database file. Every
+    write appends the days and meal it touched to the totals_changes log in
+    the same transaction. Each call compares SQLite's data_version, which
+    moves when another connection commits, and if it did, drops only the
+    days and meals logged since this store last looked. A store that fell
+    more than change_log_size changes behind drops all of its state.
+    Writes hold the database write lock (BEGIN IMMEDIATE) from reading the
+    old totals to committing the new ones, so concurrent workers never
+    apply deltas to stale totals.
+    """
+
+    def __init__(self, path: str = 'daily_totals.db', max_entries: int = 100000,
+                 change_log_size: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.change_log_size = change_log_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._totals: 'OrderedDict[Key, list]' = OrderedDict()
+        self._meals: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._change_seq = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.invalidations = 0
+        self.resyncs = 0
+
+    def open(self):
+        if self._conn is not None:
+            return
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._data_version = self._read_data_version()
+        self._change_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM totals_changes").fetchone()[0]
+        logger.info(f"Daily totals store opened at {self.path}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._totals.clear()
+            self._meals.clear()
+
+    # -- in-memory state ----------------------------------------------------
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _sync(self):
+        # Another process committed since we last looked; drop what it changed
+        data_version = self._read_data_version()
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        changes = self._conn.execute(
+            "SELECT seq, user_id, meal_date, meal_id FROM totals_changes WHERE seq > ? ORDER BY seq",
+            (self._change_seq,)
+        ).fetchall()
+        if not changes:
+            return
+        if changes[0][0] != self._change_seq + 1:
+            # Pruned past our position: we cannot tell what changed
+            self._totals.clear()
+            self._meals.clear()
+            self.resyncs += 1
+        else:
+            for _, user_id, meal_date, meal_id in changes:
+                self._totals.pop((user_id, meal_date), None)
+                self._meals.pop(meal_id, None)
+            self.invalidations += len(changes)
+        self._change_seq = changes[-1][0]
+
+    def _log_changes(self, keys, meal_id: int) -> int:
+        """
+        Record the days a write touched, inside its transaction; returns the
+        last sequence number written
+        """
+        seq = self._change_seq
+        for key in keys:
+            seq = self._conn.execute(
+                "INSERT INTO totals_changes (user_id, meal_date, meal_id) VALUES (?, ?, ?)", key + (meal_id,)
+            ).lastrowid
+        # Keep the log bounded; a primary key range, so this stays cheap
+        self._conn.execute("DELETE FROM totals_changes WHERE seq <= ?", (seq - self.change_log_size,))
+        return seq
+
+    def _remember(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def _load_totals(self, key: Key) -> list:
+        totals = self._totals.get(key)
+        if totals is not None:
+            self._totals.move_to_end(key)
+            self.hits += 1
+            return totals
+        self.misses += 1
+        row = self._conn.execute(
+            "SELECT calories, protein, carbs, fat, meal_count FROM daily_totals WHERE user_id = ? AND meal_date = ?",
+            key
+        ).fetchone()
+        totals = list(row) if row else [0.0, 0.0, 0.0, 0.0, 0]
+        self._remember(self._totals, key, totals)
+        return totals
+
+    def _load_meal(self, meal_id: int) -> Optional[tuple]:
+        meal = self._meals.get(meal_id)
+        if meal is not None:
+            self._meals.move_to_end(meal_id)
+            return meal
+        row = self._conn.execute(
+            "SELECT user_id, meal_date, calories, protein, carbs, fat FROM meal_entries WHERE meal_id = ?",
+            (meal_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        meal = ((row[0], row[1]), tuple(row[2:]))
+        self._remember(self._meals, meal_id, meal)
+        return meal
+
+    def _apply(self, key: Key, values: tuple, sign: int) -> list:
+        totals = self._load_totals(key)
+        for i, value in enumerate(values):
+            totals[i] += sign * value
+        totals[4] += sign
+        if totals[4] <= 0:
+            # Reset exactly, so add/remove round trips leave no float residue
+            totals[:] = [0.0, 0.0, 0.0, 0.0, 0]
+        return totals
+
+    def _write_totals(self, key: Key, totals: list):
+        if totals[4] == 0:
+            self._conn.execute("DELETE FROM daily_totals WHERE user_id = ? AND meal_date = ?", key)
+        else:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO daily_totals (user_id, meal_date, calories, protein, carbs, fat, meal_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", key + tuple(totals)
+            )
+
+    # -- public API ---------------------------------------------------------
+
+    def upsert_meal(self, meal_id: int, user_id: int, meal_date, nutrients: Dict[str, float]) -> Dict:
+        """
+        Add a meal, or replace a previously recorded one (possibly moving it
+        to another day). Returns the new totals for the meal's day.
+        """
+        key = (int(user_id), normalize_date(meal_date))
+        values = tuple(float(nutrients.get(field) or 0) for field in TOTAL_FIELDS)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            touched = {}
+            try:
+                self._sync()
+                previous = self._load_meal(meal_id)
+                if previous is not None:
+                    touched[previous[0]] = self._apply(previous[0], previous[1], -1)
+                touched[key] = self._apply(key, values, 1)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meal_entries (meal_id, user_id, meal_date, calories, protein, carbs, fat) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", (meal_id,) + key + values
+                )
+                for touched_key, totals in touched.items():
+                    self._write_totals(touched_key, totals)
+                seq = self._log_changes(touched, meal_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                self._discard(set(touched) | {key}, meal_id)
+                raise
+            # Our own changes are already applied in memory
+            self._change_seq = seq
+            self._remember(self._meals, meal_id, (key, values))
+            self.writes += 1
+            return self._as_dict(key, touched[key])
+
+    def delete_meal(self, meal_id: int) -> Optional[Dict]:
+        """
+        Remove a meal. Returns the new totals for its day, or None if the
+        meal was never recorded.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            key = None
+            try:
+                self._sync()
+                previous = self._load_meal(meal_id)
+                if previous is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                key, values = previous
+                totals = self._apply(key, values, -1)
+                self._conn.execute("DELETE FROM meal_entries WHERE meal_id = ?", (meal_id,))
+                self._write_totals(key, totals)
+                seq = self._log_changes([key], meal_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                self._discard({key} if key else set(), meal_id)
+                raise
+            self._change_seq = seq
+            self._meals.pop(meal_id, None)
+            self.writes += 1
+            return self._as_dict(key, totals)
+
+    def _discard(self, keys, meal_id: int):
+        # Drop in-memory state that may no longer match the database
+        for key in keys:
+            self._totals.pop(key, None)
+        self._meals.pop(meal_id, None)
+
+    def get(self, user_id: int, meal_date) -> Dict:
+        """
+        Current totals for one user-day (zeros if nothing was logged)
+        """
+        key = (int(user_id), normalize_date(meal_date))
+        with self._lock:
+            self._sync()
+            return self._as_dict(key, self._load_totals(key))
+
+    def _as_dict(self, key: Key, totals: list) -> Dict:
+        result = {'user_id': key[0], 'meal_date': key[1], 'meal_count': totals[4]}
+        result.update({field: totals[i] for i, field in enumerate(TOTAL_FIELDS)})
+        return result
+
+    def get_stats(self) -> Dict:
+        return {
+            'cached_days': len(self._totals),
+            'cached_meals': len(self._meals),
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'invalidations': self.invalidations,
+            'resyncs': self.resyncs,
+        }
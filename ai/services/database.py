@@ -0,0 +1,381 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+from models.nutrition_store import FOODS_QUERY
+from models.recommendation_rules import USER_GOALS_QUERY
+
+logger = logging.getLogger(__name__)
+
+# Queries use pymysql's %s placeholders; `{values}` expands to one
+# placeholder per value of an IN list (see Database.fetch_in)
+MEALS_FOR_USERS_QUERY = (
+    "SELECT user_id, meal_date, calories, protein, carbs, fat FROM meals "
+    "WHERE user_id IN ({values}) AND meal_date >= %s AND meal_date <= %s ORDER BY user_id, meal_date"
+)
+USER_GOALS_FOR_USERS_QUERY = (
+    "SELECT user_id, goal_type, target_value, target_unit FROM user_goals "
+    "WHERE user_id IN ({values}) AND is_active = TRUE ORDER BY user_id, updated_at"
+)
+
+LATENCY_SAMPLES = 1024
+
+# SQLite version of the meals, user_goals and foods tables (plus seed foods)
+SQLITE_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'database', 'schema_sqlite.sql')
+
+
+class DatabaseBusyError(Exception):
+    """
+    No pooled connection became free within the acquire timeout
+    """
+
+
+def mysql_connector(host: str = 'localhost', port: int = 3306, user: str = 'root', password: str = '',
+                    database: str = 'health_tracker', connect_timeout: float = 10.0) -> Callable[[], Any]:
+    """
+    Connection factory for the MySQL schema (pymysql, dict rows)
+    """
+    import pymysql
+
+    def connect():
+        return pymysql.connect(
+            host=host, port=port, user=user, password=password, database=database,
+            charset='utf8mb4', cursorclass=pymysql.cursors.DictCursor,
+            connect_timeout=connect_timeout, autocommit=True
+        )
+    return connect
+
+
+def sqlite_connector(path: str) -> Callable[[], sqlite3.Connection]:
+    """
+    Connection factory for a local SQLite stand-in of the schema (dict rows)
+    """
+    def connect():
+        connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        connection.row_factory = lambda cursor, row: {column[0]: value for column, value in zip(cursor.description, row)}
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+    return connect
+
+
+def create_sqlite_schema(path: str, schema_path: str = SQLITE_SCHEMA_PATH):
+    """
+    Create the SQLite stand-in tables at path (idempotent), e.g. for local
+    development or a test database
+    """
+    with open(schema_path, encoding='utf-8') as f:
+        schema = f.read()
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(schema)
+    finally:
+        connection.close()
+
+
+def _row_count(result) -> int:
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict):
+        return len(next(iter(result.values()), ()))
+    return len(result)
+
+
+class QueryStats:
+    """
+    Call count, errors, rows and latency of one named query
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, elapsed_ms: float, rows: int, failed: bool):
+        self.count += 1
+        self.errors += failed
+        self.rows += rows
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.recent.append(elapsed_ms)
+
+    def as_dict(self) -> Dict:
+        recent = np.array(self.recent) if self.recent else np.zeros(1)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'rows': self.rows,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': float(np.percentile(recent, 50)),
+            'p95_ms': float(np.percentile(recent, 95)),
+            'max_ms': self.max_ms,
+        }
+
+
+class Database:
+    """
+    Async access to a DB-API database through a bounded connection pool
+
+    Drivers such as pymysql block, so every query runs on a dedicated
+    thread pool with one thread per connection; the event loop only waits
+    on futures. At most max_size connections are open, created on first
+    use and reused LIFO. A request that cannot get a connection within
+    acquire_timeout seconds gets DatabaseBusyError instead of queueing
+    without bound. Every query is timed under its name (see get_stats).
+    """
+
+    def __init__(self, connect: Callable[[], Any], max_size: int = 10, acquire_timeout: float = 5.0,
+                 placeholder: str = '%s'):
+        self.connect = connect
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.placeholder = placeholder
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._idle: List[Any] = []
+        self._size = 0
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, QueryStats] = {}
+        self.acquire_timeouts = 0
+        self.acquire_wait_ms = 0.0
+
+    @classmethod
+    def sqlite(cls, path: str, max_size: int = 4, acquire_timeout: float = 5.0) -> 'Database':
+        return cls(sqlite_connector(path), max_size, acquire_timeout, placeholder='?')
+
+    @property
+    def is_open(self) -> bool:
+        return self._executor is not None
+
+    async def open(self):
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(self.max_size, thread_name_prefix='db')
+        self._semaphore = asyncio.Semaphore(self.max_size)
+        # Fail fast on bad configuration rather than on the first request
+        connection = await self._acquire()
+        self._release(connection, healthy=True)
+        logger.info(f"Database pool opened (max_size={self.max_size})")
+
+    async def close(self):
+        if self._executor is None:
+            return
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection in idle:
+            self._close_connection(connection)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        logger.info("Database pool closed")
+
+    # -- pool ---------------------------------------------------------------
+
+    async def _acquire(self):
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise DatabaseBusyError(f"No database connection free within {self.acquire_timeout}s")
+        finally:
+            self._waiting -= 1
+            self.acquire_wait_ms += (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                self._size += 1
+        if connection is not None:
+            return connection
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self.connect)
+        except BaseException:
+            with self._lock:
+                self._size -= 1
+            self._semaphore.release()
+            raise
+
+    def _release(self, connection, healthy: bool):
+        with self._lock:
+            if healthy and self._executor is not None:
+                self._idle.append(connection)
+                connection = None
+            else:
+                self._size -= 1
+        if connection is not None:
+            self._close_connection(connection)
+        self._semaphore.release()
+
+    @staticmethod
+    def _close_connection(connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.error(f"Error closing database connection: {str(e)}")
+
+    # -- queries ------------------------------------------------------------
+
+    def _sql(self, sql: str) -> str:
+        return sql if self.placeholder == '%s' else sql.replace('%s', self.placeholder)
+
+    async def _run(self, name: str, work: Callable[[Any], Any]):
+        connection = await self._acquire()
+        healthy, rows, started = False, 0, time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, work, connection)
+            healthy = True
+            rows = _row_count(result)
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._stats.setdefault(name, QueryStats()).record(elapsed_ms, rows, not healthy)
+            # A connection whose query failed may be mid-transaction or broken
+            self._release(connection, healthy)
+
+    async def fetch_all(self, sql: str, params: Sequence = (), name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Rows as dicts
+        """
+        sql = self._sql(sql)
+
+        def work(connection):
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql, tuple(params))
+                return list(cursor.fetchall())
+            finally:
+                cursor.close()
+        return await self._run(name or sql, work)
+
+    async def fetch_one(self, sql: str, params: Sequence = (), name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        rows = await self.fetch_all(sql, params, name)
+        return rows[0] if rows else None
+
+    async def fetch_columns(self, sql: str, params: Sequence = (), name: Optional[str] = None) -> Dict[str, list]:
+        """
+        Result as {column: [values]}, ready for the vectorized analysis in
+        models/nutrition_analysis.py without building a dict per row
+        """
+        sql = self._sql(sql)
+
+        def work(connection):
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql, tuple(params))
+                names = [column[0] for column in cursor.description]
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+            if rows and isinstance(rows[0], dict):
+                return {column: [row[column] for row in rows] for column in names}
+            return {column: [row[i] for row in rows] for i, column in enumerate(names)}
+        return await self._run(name or sql, work)
+
+    async def fetch_in(self, sql: str, values: Iterable, params: Sequence = (), name: Optional[str] = None,
+                       chunk_size: int = 1000, columns: bool = False):
+        """
+        Run a query with an `IN ({values})` list, e.g. all meals of many
+        users in one round trip. The list's placeholders come first, then
+        params. Very long lists are split into chunk_size queries whose
+        results are concatenated (row order is per chunk).
+        """
+        values = list(dict.fromkeys(values))
+        fetch = self.fetch_columns if columns else self.fetch_all
+        result = {} if columns else []
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start:start + chunk_size]
+            chunk_sql = sql.replace('{values}', ', '.join(['%s'] * len(chunk)))
+            part = await fetch(chunk_sql, tuple(chunk) + tuple(params), name or sql)
+            if columns:
+                for column, column_values in part.items():
+                    result.setdefault(column, []).extend(column_values)
+            else:
+                result.extend(part)
+        return result
+
+    async def execute(self, sql: str, params: Sequence = (), name: Optional[str] = None) -> int:
+        """
+        Run one statement; returns the affected row count
+        """
+        sql = self._sql(sql)
+
+        def work(connection):
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql, tuple(params))
+                return cursor.rowcount
+            finally:
+                cursor.close()
+        return await self._run(name or sql, work)
+
+    async def execute_many(self, sql: str, rows: Sequence[Sequence], name: Optional[str] = None) -> int:
+        """
+        Run a statement for many parameter rows in one transaction
+        (pymysql turns INSERT ... VALUES into multi-row inserts)
+        """
+        sql = self._sql(sql)
+
+        def work(connection):
+            cursor = connection.cursor()
+            try:
+                cursor.execute("BEGIN")
+                try:
+                    cursor.executemany(sql, [tuple(row) for row in rows])
+                    connection.commit()
+                except BaseException:
+                    connection.rollback()
+                    raise
+                return len(rows)
+            finally:
+                cursor.close()
+        return await self._run(name or sql, work)
+
+    def get_stats(self) -> Dict:
+        return {
+            'pool': {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'acquire_timeouts': self.acquire_timeouts,
+                'acquire_wait_ms': self.acquire_wait_ms,
+            },
+            'queries': {name: stats.as_dict() for name, stats in self._stats.items()},
+        }
+
+
+async def fetch_foods(db: Database) -> List[Dict[str, Any]]:
+    """
+    The foods table, in the shape NutritionStore.from_rows expects
+    """
+    return await db.fetch_all(FOODS_QUERY, name='foods')
+
+
+async def fetch_meals(db: Database, user_ids: Iterable[int], start_date: str, end_date: str) -> Dict[str, list]:
+    """
+    Columnar meals of many users over a date range, in one query
+    """
+    return await db.fetch_in(MEALS_FOR_USERS_QUERY, user_ids, (start_date, end_date), name='meals_for_users',
+                             columns=True)
+
+
+async def fetch_active_goals(db: Database, user_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Active user_goals rows, for the given users or for everyone
+    """
+    if user_ids is None:
+        return await db.fetch_all(USER_GOALS_QUERY, name='user_goals')
+    return await db.fetch_in(USER_GOALS_FOR_USERS_QUERY, user_ids, name='user_goals_for_users')
@@ -0,0 +1,407 @@
+"""
+Bulk import of partner meal logs and food catalog updates.
+
+Rows stream from CSV or JSONL files (optionally gzipped) through a
+generator pipeline: read -> fixed-size chunks -> columnar validation ->
+batched write. Only one chunk is parsed while the previous one is being
+written, so memory stays bounded at any file size. Meal macros missing
+from a row are computed from its quantity and the food's per-100g values
+in one vectorized step per chunk.
+
+    python -m services.ingest meals meals.csv.gz --sqlite dev.db
+    python -m services.ingest foods foods.jsonl --rejects rejected.jsonl
+
+Without --sqlite the MySQL database from the DB_* environment variables
+is used.
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import date
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from models.nutrition_store import NUTRIENT_FIELDS, NutritionStore, _parse_tags
+from services.database import Database, fetch_foods, mysql_connector
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+
+MEAL_TYPES = ('breakfast', 'lunch', 'dinner', 'snack')
+MACRO_FIELDS = ('calories', 'protein', 'carbs', 'fat')
+# Grams per unit; serving-based units use the food's serving_size
+UNIT_GRAMS = {'g': 1.0, 'gram': 1.0, 'ml': 1.0, 'kg': 1000.0, 'l': 1000.0}
+SERVING_UNITS = ('serving', 'piece', 'portion', 'bowl', 'phần', 'suất', 'tô', 'bát', 'cái')
+
+MEAL_COLUMNS = ('user_id', 'food_id', 'meal_type', 'quantity', 'unit', 'calories', 'protein', 'carbs', 'fat',
+                'meal_date', 'meal_time', 'notes')
+FOOD_COLUMNS = ('name', 'name_vietnamese', 'description', 'category', 'calories', 'protein', 'carbs', 'fat',
+                'fiber', 'sugar', 'sodium', 'serving_size', 'serving_unit', 'is_vietnamese', 'is_verified',
+                'source', 'tags')
+FOOD_DEFAULTS = {'protein': 0.0, 'carbs': 0.0, 'fat': 0.0, 'fiber': 0.0, 'sugar': 0.0, 'sodium': 0.0,
+                 'serving_size': 100.0}
+# VARCHAR limits from database/schema.sql
+FOOD_LENGTHS = {'name': 255, 'name_vietnamese': 255, 'category': 100, 'serving_unit': 50, 'source': 255}
+
+INSERT_MEAL = f"INSERT INTO meals ({', '.join(MEAL_COLUMNS)}) VALUES ({', '.join(['%s'] * len(MEAL_COLUMNS))})"
+INSERT_FOOD = f"INSERT INTO foods ({', '.join(FOOD_COLUMNS)}) VALUES ({', '.join(['%s'] * len(FOOD_COLUMNS))})"
+UPDATE_FOOD = f"UPDATE foods SET {', '.join(f'{column} = %s' for column in FOOD_COLUMNS)} WHERE id = %s"
+KNOWN_USERS_QUERY = "SELECT id FROM users WHERE id IN ({values})"
+
+Chunk = List[Dict[str, Any]]
+Rejects = List[Tuple[Dict[str, Any], str]]
+
+
+# -- reading ------------------------------------------------------------------
+
+def _open_text(path: str) -> io.TextIOBase:
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield rows of a .csv or .jsonl file (optionally .gz) one at a time
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    with _open_text(path) as f:
+        if name.endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def chunked(records: Iterable[Dict[str, Any]], size: int = CHUNK_SIZE) -> Iterator[Chunk]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# -- columnar conversion --------------------------------------------------------
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def float_column(chunk: Chunk, field: str, default: float = np.nan) -> np.ndarray:
+    """
+    A field as float64, with blanks as default and unparseable values as NaN
+    """
+    values = [default if _blank(row.get(field)) else row.get(field) for row in chunk]
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        column = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                column[i] = np.nan
+        return column
+
+
+def date_column(chunk: Chunk, field: str) -> np.ndarray:
+    """
+    A field as datetime64[D]; blank or invalid dates are NaT
+    """
+    values = [str(row.get(field) or '')[:10] for row in chunk]
+    try:
+        return np.array(values, dtype='datetime64[D]')
+    except ValueError:
+        column = np.empty(len(values), dtype='datetime64[D]')
+        for i, value in enumerate(values):
+            try:
+                column[i] = np.datetime64(date.fromisoformat(value))
+            except ValueError:
+                column[i] = np.datetime64('NaT')
+        return column
+
+
+def text_column(chunk: Chunk, field: str) -> np.ndarray:
+    return np.array([str(row.get(field) or '').strip() for row in chunk], dtype=object)
+
+
+def _bool(value, default: bool) -> bool:
+    if _blank(value):
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 't', 'y')
+    return bool(value)
+
+
+def _reject(chunk: Chunk, invalid: np.ndarray, reason: str, rejects: Rejects, valid: np.ndarray):
+    """
+    Record rows that fail a check for the first time, then clear them from valid
+    """
+    newly = valid & invalid
+    rejects.extend((chunk[i], reason) for i in np.flatnonzero(newly))
+    valid &= ~invalid
+
+
+# -- validation -------------------------------------------------------------------
+
+def validate_meals(chunk: Chunk, store: NutritionStore, known_users: Optional[set] = None) -> Tuple[List[tuple], Rejects]:
+    """
+    Check a chunk against the meals schema and fill in missing macros from
+    quantity and the foods' per-100g values. Returns insert parameter rows
+    and the rejected rows with a reason.
+    """
+    rejects: Rejects = []
+    valid = np.ones(len(chunk), dtype=bool)
+    user_ids = float_column(chunk, 'user_id')
+    food_ids = float_column(chunk, 'food_id')
+    quantity = float_column(chunk, 'quantity')
+    meal_dates = date_column(chunk, 'meal_date')
+    meal_types = np.char.lower(text_column(chunk, 'meal_type').astype(str))
+    units = np.char.lower(np.array([str(row.get('unit') or 'g').strip() for row in chunk]))
+
+    _reject(chunk, ~(user_ids > 0) | (user_ids != np.floor(user_ids)), 'invalid user_id', rejects, valid)
+    if known_users is not None:
+        _reject(chunk, ~np.isin(user_ids, list(known_users)), 'unknown user_id', rejects, valid)
+    _reject(chunk, ~(food_ids > 0) | (food_ids != np.floor(food_ids)), 'invalid food_id', rejects, valid)
+    food_rows = store.rows_for_food_ids(np.where(valid, food_ids, 0).astype(np.int64))
+    _reject(chunk, food_rows == store.default_row, 'unknown food_id', rejects, valid)
+    _reject(chunk, ~np.isin(meal_types, MEAL_TYPES), 'invalid meal_type', rejects, valid)
+    _reject(chunk, ~(quantity > 0), 'invalid quantity', rejects, valid)
+    _reject(chunk, np.isnat(meal_dates), 'invalid meal_date', rejects, valid)
+
+    # Grams eaten: weight units scale directly, serving units by serving_size
+    serving_size = store.values[food_rows, NUTRIENT_FIELDS.index('serving_size')]
+    unit_grams = np.array([UNIT_GRAMS.get(unit, np.nan) for unit in units])
+    is_serving = np.isin(units, SERVING_UNITS)
+    grams = np.where(is_serving, quantity * serving_size, quantity * unit_grams)
+    _reject(chunk, np.isnan(grams), 'unknown unit', rejects, valid)
+
+    per_100g = store.values[food_rows][:, [NUTRIENT_FIELDS.index(field) for field in MACRO_FIELDS]]
+    computed = per_100g * (grams / 100.0)[:, None]
+    given = np.stack([float_column(chunk, field) for field in MACRO_FIELDS], axis=1)
+    macros = np.where(np.isnan(given), computed, given)
+    _reject(chunk, (macros < 0).any(axis=1), 'negative nutrient', rejects, valid)
+
+    params = []
+    for i in np.flatnonzero(valid):
+        row = chunk[i]
+        params.append((
+            int(user_ids[i]), int(food_ids[i]), str(meal_types[i]), float(quantity[i]), str(units[i]),
+            *(round(float(value), 2) for value in macros[i]),
+            str(meal_dates[i]), row.get('meal_time') or None, row.get('notes') or None,
+        ))
+    return params, rejects
+
+
+def validate_foods(chunk: Chunk) -> Tuple[List[tuple], List[tuple], Rejects]:
+    """
+    Check a chunk against the foods schema. Returns insert parameter rows
+    (new foods), update parameter rows (rows with an id) and rejects.
+    """
+    rejects: Rejects = []
+    valid = np.ones(len(chunk), dtype=bool)
+    names = text_column(chunk, 'name')
+    _reject(chunk, names == '', 'missing name', rejects, valid)
+    for field, limit in FOOD_LENGTHS.items():
+        lengths = np.array([len(str(row.get(field) or '')) for row in chunk])
+        _reject(chunk, lengths > limit, f"{field} longer than {limit}", rejects, valid)
+
+    numbers = {'calories': float_column(chunk, 'calories')}
+    numbers.update({field: float_column(chunk, field, default) for field, default in FOOD_DEFAULTS.items()})
+    for field, column in numbers.items():
+        _reject(chunk, ~(column >= 0), f"invalid {field}", rejects, valid)
+    _reject(chunk, numbers['serving_size'] == 0, 'invalid serving_size', rejects, valid)
+    ids = float_column(chunk, 'id')
+    _reject(chunk, ~np.isnan(ids) & ~(ids > 0), 'invalid id', rejects, valid)
+
+    inserts, updates = [], []
+    for i in np.flatnonzero(valid):
+        row = chunk[i]
+        params = (
+            str(names[i]), row.get('name_vietnamese') or None, row.get('description') or None,
+            row.get('category') or None,
+            *(float(numbers[field][i]) for field in ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar',
+                                                      'sodium', 'serving_size')),
+            row.get('serving_unit') or 'g', _bool(row.get('is_vietnamese'), True),
+            _bool(row.get('is_verified'), False), row.get('source') or None,
+            json.dumps(_parse_tags(row.get('tags')), ensure_ascii=False),
+        )
+        if np.isnan(ids[i]):
+            inserts.append(params)
+        else:
+            updates.append(params + (int(ids[i]),))
+    return inserts, updates, rejects
+
+
+# -- pipeline -----------------------------------------------------------------------
+
+class IngestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.read = 0
+        self.written = 0
+        self.rejected = 0
+        self.reasons: Dict[str, int] = {}
+
+    def get_stats(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            'rows_read': self.read,
+            'rows_written': self.written,
+            'rows_rejected': self.rejected,
+            'reject_reasons': self.reasons,
+            'elapsed_s': elapsed,
+            'rows_per_s': self.read / elapsed if elapsed else 0.0,
+        }
+
+
+class Ingestor:
+    """
+    Stream one file into the meals or foods table
+    """
+
+    def __init__(self, db: Database, chunk_size: int = CHUNK_SIZE, rejects_path: Optional[str] = None,
+                 check_users: bool = True):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.rejects_path = rejects_path
+        self.check_users = check_users
+        self.stats = IngestStats()
+        self._known_users: set = set()
+        self._rejects_file = None
+
+    def _record_rejects(self, rejects: Rejects):
+        self.stats.rejected += len(rejects)
+        for row, reason in rejects:
+            self.stats.reasons[reason] = self.stats.reasons.get(reason, 0) + 1
+            if self._rejects_file is not None:
+                self._rejects_file.write(json.dumps({'reason': reason, 'row': row}, ensure_ascii=False, default=str))
+                self._rejects_file.write('\n')
+
+    async def _known_user_ids(self, chunk: Chunk) -> set:
+        user_ids = {row.get('user_id') for row in chunk}
+        wanted = []
+        for value in user_ids:
+            try:
+                user_id = int(value)
+            except (TypeError, ValueError):
+                continue
+            if user_id not in self._known_users:
+                wanted.append(user_id)
+        if wanted:
+            rows = await self.db.fetch_in(KNOWN_USERS_QUERY, wanted, name='known_users')
+            self._known_users.update(row['id'] for row in rows)
+        return self._known_users
+
+    async def _write(self, sql: str, params: List[tuple], name: str):
+        if params:
+            await self.db.execute_many(sql, params, name=name)
+            self.stats.written += len(params)
+
+    async def _run(self, chunks: Iterator[Chunk], handle) -> Dict:
+        if self.rejects_path:
+            self._rejects_file = open(self.rejects_path, 'w', encoding='utf-8')
+        pending: Optional[asyncio.Task] = None
+        try:
+            for chunk in chunks:
+                self.stats.read += len(chunk)
+                writes = await handle(chunk)
+                # Validate the next chunk while this one is being written
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(asyncio.gather(*writes))
+                if self.stats.read % (self.chunk_size * 20) < self.chunk_size:
+                    logger.info(f"Ingest progress: {self.stats.get_stats()}")
+            if pending is not None:
+                await pending
+                pending = None
+        finally:
+            if pending is not None:
+                pending.cancel()
+            if self._rejects_file is not None:
+                self._rejects_file.close()
+        return self.stats.get_stats()
+
+    async def ingest_meals(self, records: Iterable[Dict[str, Any]]) -> Dict:
+        store = NutritionStore.from_rows(await fetch_foods(self.db), class_names=[])
+
+        async def handle(chunk):
+            known_users = await self._known_user_ids(chunk) if self.check_users else None
+            params, rejects = validate_meals(chunk, store, known_users)
+            self._record_rejects(rejects)
+            return [self._write(INSERT_MEAL, params, 'ingest_meals')]
+        return await self._run(chunked(records, self.chunk_size), handle)
+
+    async def ingest_foods(self, records: Iterable[Dict[str, Any]]) -> Dict:
+        async def handle(chunk):
+            inserts, updates, rejects = validate_foods(chunk)
+            self._record_rejects(rejects)
+            return [self._write(INSERT_FOOD, inserts, 'ingest_foods'),
+                    self._write(UPDATE_FOOD, updates, 'update_foods')]
+        return await self._run(chunked(records, self.chunk_size), handle)
+
+
+def create_database(sqlite_path: Optional[str]) -> Database:
+    if sqlite_path:
+        return Database.sqlite(sqlite_path, max_size=2)
+    return Database(mysql_connector(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', '3306')),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        database=os.getenv('DB_NAME', 'health_tracker')
+    ), max_size=2)
+
+
+async def run(args) -> Dict:
+    db = create_database(args.sqlite)
+    await db.open()
+    try:
+        ingestor = Ingestor(db, args.chunk_size, args.rejects, check_users=not args.no_user_check)
+        records = read_records(args.path)
+        if args.table == 'meals':
+            report = await ingestor.ingest_meals(records)
+        else:
+            report = await ingestor.ingest_foods(records)
+        report['queries'] = db.get_stats()['queries']
+        return report
+    finally:
+        await db.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('table', choices=['meals', 'foods'])
+    parser.add_argument('path', help='.csv or .jsonl file, optionally gzipped')
+    parser.add_argument('--sqlite', help='Write to this SQLite database instead of MySQL')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--rejects', help='Write rejected rows with their reason to this JSONL file')
+    parser.add_argument('--no-user-check', action='store_true', help='Skip checking that meal user_ids exist')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print(f"{report['rows_read']} rows read, {report['rows_written']} written, {report['rows_rejected']} rejected "
+          f"in {report['elapsed_s']:.1f}s ({report['rows_per_s']:.0f} rows/s)")
+    for reason, count in sorted(report['reject_reasons'].items(), key=lambda item: -item[1]):
+        print(f"  {reason}: {count}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,365 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, priority DESC, run_after, created_at);
+"""
+
+# Next job to run: highest priority first, then oldest; running jobs whose
+# lease expired belong to a worker that died and are taken over
+CLAIM_QUERY = """
+UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, started_at = ?
+WHERE id = (
+    SELECT id FROM jobs
+    WHERE (status = 'queued' AND run_after <= ?) OR (status = 'running' AND lease_until < ?)
+    ORDER BY priority DESC, run_after, created_at
+    LIMIT 1
+)
+RETURNING id, kind, payload, priority, attempts, max_attempts
+"""
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class PermanentJobError(Exception):
+    """
+    A job failure that retrying cannot fix (e.g. invalid input)
+    """
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job['payload'] = json.loads(job['payload'])
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+
+class JobStore:
+    """
+    Jobs persisted in SQLite, so queued and finished work survives a
+    restart. Every call is one short statement under a lock; claims are a
+    single UPDATE ... RETURNING, so several processes can share the file.
+    """
+
+    def __init__(self, path: str = 'jobs.db'):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        if self._conn is not None:
+            return
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        logger.info(f"Job store opened at {self.path}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def submit(self, kind: str, payload: Dict[str, Any], priority: int = 0, max_attempts: int = 3,
+               run_after: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, priority, status, max_attempts, run_after, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), priority, max_attempts, max(now, run_after or now), now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def claim(self, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Mark the next runnable job running and return it, or None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(CLAIM_QUERY, (now + lease_seconds, now, now, now)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def extend_lease(self, job_id: str, lease_seconds: float):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                               (time.time() + lease_seconds, job_id))
+
+    def complete(self, job_id: str, result: Any):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, lease_until = NULL, "
+                "finished_at = ? WHERE id = ? AND status = 'running'",
+                (json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id: str, error: str, retry_at: Optional[float] = None):
+        """
+        Record a failed attempt: requeue the job for retry_at, or fail it
+        for good when retry_at is None
+        """
+        with self._lock:
+            if retry_at is None:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, finished_at = ? "
+                    "WHERE id = ? AND status = 'running'", (error, time.time(), job_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, lease_until = NULL, run_after = ? "
+                    "WHERE id = ? AND status = 'running'", (error, retry_at, job_id)
+                )
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job that has not started; running jobs are left alone
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+        return cursor.rowcount > 0
+
+    def next_run_after(self) -> Optional[float]:
+        """
+        When the earliest queued job becomes runnable
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(run_after) FROM jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def purge(self, older_than: float) -> int:
+        """
+        Delete finished jobs older than `older_than` (epoch seconds)
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') AND finished_at < ?",
+                (older_than,)
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+class JobQueue:
+    """
+    Background job processing for work too slow to hold a request open
+
+    Submitting stores a job and returns its id at once; `workers` asyncio
+    tasks claim jobs by priority and run the handler registered for their
+    kind. Handlers are coroutines and should push blocking work to the
+    inference pool or a thread, as the request handlers do. A failed
+    attempt is retried with exponential backoff up to max_attempts, unless
+    the handler raised PermanentJobError. A running job holds a lease that
+    is renewed while it runs; if the process dies, another worker takes
+    the job over once the lease expires. Clients poll get(), or wait() for
+    a job to finish (long polling).
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, lease_seconds: float = 60.0,
+                 retry_backoff: float = 2.0, max_retry_delay: float = 300.0, poll_interval: float = 1.0,
+                 retention_seconds: float = 86400.0):
+        self.store = store
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.retry_backoff = retry_backoff
+        self.max_retry_delay = max_retry_delay
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Optional[asyncio.Condition] = None
+        self._last_purge = 0.0
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    async def _store_call(self, method: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def start(self):
+        if self._tasks:
+            return
+        await self._store_call(self.store.open)
+        self._wakeup = asyncio.Event()
+        self._finished = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._work(i)) for i in range(self.workers)]
+        logger.info(f"Job queue started (workers={self.workers})")
+
+    async def stop(self):
+        """
+        Stop the workers. Jobs they were running stay marked running and
+        are picked up again after their lease expires.
+        """
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.store.close()
+        logger.info("Job queue stopped")
+
+    async def submit(self, kind: str, payload: Dict[str, Any], priority: int = 0, max_attempts: int = 3,
+                     run_after: Optional[float] = None) -> Dict[str, Any]:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = await self._store_call(self.store.submit, kind, payload, priority, max_attempts, run_after)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._store_call(self.store.get, job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        return await self._store_call(self.store.cancel, job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        The job once it has finished, or as it stands after timeout seconds
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in FINISHED or remaining <= 0:
+                return job
+            async with self._finished:
+                try:
+                    # Re-check at least every poll_interval: another process may finish it
+                    await asyncio.wait_for(self._finished.wait(), min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _notify_finished(self):
+        async with self._finished:
+            self._finished.notify_all()
+
+    async def _work(self, worker: int):
+        while True:
+            try:
+                job = await self._store_call(self.store.claim, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Job worker {worker} could not claim a job: {str(e)}")
+                job = None
+            if job is None:
+                await self._idle()
+                continue
+            await self._run(job)
+
+    async def _idle(self):
+        """
+        Sleep until a submit, the next delayed job or poll_interval
+        """
+        now = time.time()
+        if now - self._last_purge > min(self.retention_seconds, 3600.0):
+            self._last_purge = now
+            purged = await self._store_call(self.store.purge, now - self.retention_seconds)
+            if purged:
+                logger.info(f"Purged {purged} finished jobs")
+        self._wakeup.clear()
+        next_run = await self._store_call(self.store.next_run_after)
+        delay = self.poll_interval if next_run is None else min(self.poll_interval, max(0.0, next_run - now))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _renew_lease(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self._store_call(self.store.extend_lease, job_id, self.lease_seconds)
+
+    async def _run(self, job: Dict[str, Any]):
+        handler = self.handlers.get(job['kind'])
+        renewal = asyncio.create_task(self._renew_lease(job['id']))
+        self.running += 1
+        try:
+            if handler is None:
+                raise PermanentJobError(f"No handler for job kind {job['kind']}")
+            if job['attempts'] > job['max_attempts']:
+                # Taken over after its lease expired with no attempts left
+                raise PermanentJobError("Worker lost while running the job")
+            result = await handler(job['payload'])
+            await self._store_call(self.store.complete, job['id'], result)
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if isinstance(e, PermanentJobError) or job['attempts'] >= job['max_attempts']:
+                logger.error(f"Job {job['id']} ({job['kind']}) failed: {error}")
+                await self._store_call(self.store.fail, job['id'], error, None)
+                self.failed += 1
+            else:
+                delay = min(self.max_retry_delay, self.retry_backoff * 2 ** (job['attempts'] - 1))
+                logger.error(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed, "
+                             f"retrying in {delay:.1f}s: {error}")
+                await self._store_call(self.store.fail, job['id'], error, time.time() + delay)
+                self.retried += 1
+        finally:
+            self.running -= 1
+            renewal.cancel()
+        await self._notify_finished()
+
+    async def get_stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'running': self.running,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'retried': self.retried,
+            'jobs': await self._store_call(self.store.counts),
+        }
@@ -0,0 +1,336 @@
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from models.instrumentation import track_stages
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers cache hits (sub-millisecond) up to slow uploads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# (labels, value) pairs of one metric family
+Samples = List[Tuple[Dict[str, str], float]]
+# A collector yields (name, type, help, samples) families at scrape time.
+# Histogram families give (buckets, [(labels, counts, sum)]) as samples,
+# in the form render_histogram takes.
+Collector = Callable[[], Iterable[Tuple[str, str, str, Any]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _labels(self, values: tuple) -> Dict[str, str]:
+        return dict(zip(self.label_names, values))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Monotonic total, one per combination of label values
+    """
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    """
+    Value that goes up and down (e.g. requests in flight)
+    """
+    kind = 'gauge'
+
+    def dec(self, *label_values, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    """
+    Bucketed distribution with fixed upper bounds. observe() costs one
+    bisect and two additions, so it can stay on every request.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self) -> Dict[tuple, Tuple[List[int], float]]:
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+
+    def _render_samples(self) -> List[str]:
+        return render_histogram(self.name, self.buckets,
+                                [(self._labels(key), counts, total) for key, (counts, total) in self.snapshot().items()])
+
+
+def render_histogram(name: str, buckets: Sequence[float],
+                     series: Iterable[Tuple[Dict[str, str], List[int], float]]) -> List[str]:
+    """
+    Exposition lines of histogram series given as per-bucket (not yet
+    cumulative) counts with the +Inf bucket last
+    """
+    lines = []
+    for labels, counts, total in series:
+        cumulative = 0
+        for bound, count in zip(tuple(buckets) + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics in the Prometheus text exposition format
+
+    Counters, gauges and histograms are updated on the hot path; values
+    that components already track (queue depths, cache hit counts) are
+    read by collectors only when /metrics is scraped.
+    """
+
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def _add(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(self.prefix + name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(self.prefix + name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(self.prefix + name, documentation, label_names, buckets))
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                name = self.prefix + name
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == 'histogram':
+                    lines.extend(render_histogram(name, *samples))
+                else:
+                    lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+class ServiceMetrics:
+    """
+    Request, stage and model metrics of the AI service
+
+    - http_requests_total / http_request_duration_seconds per route
+      template, so path parameters do not multiply series
+    - http_requests_in_flight
+    - stage_duration_seconds per stage: handler stages (upload, cache,
+      engine, analysis, ...), model stages reported through
+      models/instrumentation.py (decode, inference, postprocess) and
+      'framework', the rest of each request (validation, serialization)
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        self.requests = self.registry.counter(
+            'http_requests_total', 'HTTP requests by route and status', ('method', 'route', 'status'))
+        self.latency = self.registry.histogram(
+            'http_request_duration_seconds', 'Time to the first response byte', ('method', 'route'))
+        self.in_flight = self.registry.gauge('http_requests_in_flight', 'Requests being handled')
+        self.stages = self.registry.histogram(
+            'stage_duration_seconds', 'Time spent per processing stage', ('stage',))
+
+    def observe_stage(self, name: str, seconds: float):
+        """
+        Stage observer for models.instrumentation.add_stage_observer
+        """
+        self.stages.observe(seconds, name)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+def engine_collector(engine) -> Collector:
+    """
+    Batch-size, queue and latency figures of a BatchInferenceEngine
+    """
+    def collect():
+        stats = engine.get_stats()
+        counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        total = 0
+        for size, batches in stats['batch_size_histogram'].items():
+            counts[bisect.bisect_left(BATCH_SIZE_BUCKETS, size)] += batches
+            total += size * batches
+        yield 'inference_queue_depth', 'gauge', 'Images waiting for a batch', [({}, stats['queue_depth'])]
+        yield 'inference_batches_total', 'counter', 'Model batches run', [({}, stats['total_batches'])]
+        yield 'inference_images_total', 'counter', 'Images predicted in batches', [({}, stats['total_images'])]
+        yield ('inference_batch_seconds_total', 'counter', 'Time spent in model batches',
+               [({}, engine.total_inference_seconds)])
+        yield ('inference_batch_size', 'histogram', 'Images per model batch',
+               (BATCH_SIZE_BUCKETS, [({}, counts, total)]))
+    return collect
+
+
+def pool_collector(pool) -> Collector:
+    """
+    Pending and finished tasks of an InferencePool
+    """
+    def collect():
+        stats = pool.get_stats()
+        yield 'inference_pool_pending', 'gauge', 'Tasks queued or running on workers', [({}, stats['pending'])]
+        yield 'inference_pool_tasks_total', 'counter', 'Worker tasks by outcome', [
+            ({'outcome': outcome}, stats[outcome]) for outcome in ('completed', 'failed', 'rejected')
+        ]
+        yield 'inference_pool_ready', 'gauge', 'Whether the model is warmed up', [({}, int(pool.ready))]
+    return collect
+
+
+def cache_collector(cache) -> Collector:
+    """
+    Lookups and size of a PredictionCache
+    """
+    def collect():
+        stats = cache.get_stats()
+        yield 'prediction_cache_lookups_total', 'counter', 'Cache lookups by result', [
+            ({'result': result}, stats[key]) for result, key in
+            (('hit', 'hits'), ('near_hit', 'near_hits'), ('miss', 'misses'))
+        ]
+        yield 'prediction_cache_entries', 'gauge', 'Cached predictions', [({}, stats['entries'])]
+        yield 'prediction_cache_bytes', 'gauge', 'Approximate cache size', [({}, stats['approx_bytes'])]
+    return collect
+
+
+def job_collector(queue) -> Collector:
+    """
+    Persistent job counts by status and this process's job outcomes
+    """
+    def collect():
+        yield 'jobs', 'gauge', 'Jobs in the store by status', [
+            ({'status': status}, count) for status, count in queue.store.counts().items()
+        ]
+        yield 'job_attempts_total', 'counter', 'Job attempts run by this process by outcome', [
+            ({'outcome': outcome}, getattr(queue, outcome)) for outcome in ('succeeded', 'failed', 'retried')
+        ]
+    return collect
+
+
+class MetricsMiddleware:
+    """
+    Count and time every HTTP request and open the per-request stage
+    total (see models.instrumentation.track_stages). Latency is measured
+    to the start of the response; streamed bodies are not included.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: ServiceMetrics, exclude: Sequence[str] = ('/metrics',)):
+        self.app = app
+        self.metrics = metrics
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        method = scope['method']
+        started = time.perf_counter()
+        state = {'status': 500, 'elapsed': None}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+                state['elapsed'] = time.perf_counter() - started
+            await send(message)
+
+        metrics.in_flight.inc()
+        try:
+            with track_stages() as stage_seconds:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight.dec()
+            elapsed = state['elapsed'] if state['elapsed'] is not None else time.perf_counter() - started
+            # FastAPI stores the matched route in the scope; unmatched paths
+            # share one label so scanners cannot create new series
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            metrics.requests.inc(method, route, str(state['status']))
+            metrics.latency.observe(elapsed, method, route)
+            metrics.stages.observe(max(0.0, elapsed - stage_seconds[0]), 'framework')
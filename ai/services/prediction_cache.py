@@ -0,0 +1,158 @@
+import io
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Union
+import logging
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def perceptual_hash(source: Union[str, bytes], hash_size: int = 8) -> int:
+    """
+    64-bit difference hash (dHash) of an image file or image bytes, robust
+    to re-encoding and small resizes. JPEG draft mode keeps the decode cheap.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        image.draft('L', (hash_size * 8, hash_size * 8))
+        image = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+        pixels = np.asarray(image)
+
+    value = 0
+    for bit in (pixels[:, :-1] > pixels[:, 1:]).ravel():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _estimate_size(value: Any) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(v) for v in value)
+    return size
+
+
+class PredictionCache:
+    """
+    Content-addressed LRU/TTL cache of food predictions
+
+    Entries are keyed by the SHA-256 of the image bytes, so a hit skips both
+    decoding and inference. When max_distance > 0, entries also carry a
+    perceptual hash and an exact miss falls back to the closest stored image
+    within that Hamming distance. Memory is bounded by both entry count and
+    an estimate of the stored bytes.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 ttl_seconds: float = 3600.0, max_distance: int = 0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._phashes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def perceptual_enabled(self) -> bool:
+        return self.max_distance > 0
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._phashes.pop(key, None)
+        self._bytes -= size
+
+    def _lookup(self, key: str, now: float) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at < now:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _nearest(self, phash: int) -> Optional[str]:
+        best_key, best_distance = None, self.max_distance + 1
+        for key, stored in self._phashes.items():
+            distance = (phash ^ stored).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def get(self, content_hash: str, phash: Optional[int] = None, record_miss: bool = True) -> Optional[Any]:
+        """
+        Return the cached prediction for these bytes (or a near-duplicate).
+        Pass record_miss=False for an exact probe that will be retried with
+        a perceptual hash, so one lookup is not counted as two misses.
+        """
+        now = time.monotonic()
+        with self._lock:
+            value = self._lookup(content_hash, now)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            if phash is not None and self.perceptual_enabled:
+                near_key = self._nearest(phash)
+                value = self._lookup(near_key, now) if near_key else None
+                if value is not None:
+                    self.near_hits += 1
+                    return value
+
+            if record_miss:
+                self.misses += 1
+            return None
+
+    def put(self, content_hash: str, value: Any, phash: Optional[int] = None):
+        size = _estimate_size(content_hash) + _estimate_size(value)
+        with self._lock:
+            if content_hash in self._entries:
+                self._remove(content_hash)
+            self._entries[content_hash] = (value, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+            if phash is not None and self.perceptual_enabled:
+                self._phashes[content_hash] = phash
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._phashes.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'approx_bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'perceptual_max_distance': self.max_distance,
+            'hits': self.hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.near_hits) / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
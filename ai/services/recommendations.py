@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from models.nutrition_store import NutritionStore
+from models.ranking import (
+    DEFAULT_EXERCISES, FIT_NUTRIENTS, SESSION_BURN, ExerciseRanker, FoodRanker, daily_targets
+)
+
+logger = logging.getLogger(__name__)
+
+GOALS = ('lose_weight', 'gain_weight', 'maintain_weight')
+ACTIVITY_LEVELS = ('sedentary', 'lightly_active', 'moderately_active', 'very_active', 'extremely_active')
+
+RecommendationKey = Tuple[str, str, Tuple[str, ...]]
+
+HEALTH_TIPS = [
+    "Uống đủ 2-3 lít nước mỗi ngày",
+    "Ăn 5-6 bữa nhỏ thay vì 3 bữa lớn",
+    "Ngủ đủ 7-8 tiếng mỗi đêm",
+    "Hạn chế thức ăn nhanh và đồ ngọt"
+]
+
+
+def recommendation_key(current_goals: str, activity_level: str,
+                       dietary_preferences: Optional[List[str]] = None) -> RecommendationKey:
+    """
+    Canonical cache key; preference order and duplicates do not matter
+    """
+    return current_goals, activity_level, tuple(sorted(set(dietary_preferences or [])))
+
+
+def split_preferences(dietary_preferences: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Split preferences into required tags and excluded tags ("no_<tag>")
+    """
+    required, excluded = [], []
+    for preference in dietary_preferences:
+        if preference.startswith('no_'):
+            excluded.append(preference[3:])
+        else:
+            required.append(preference)
+    return required, excluded
+
+
+class RecommendationEngine:
+    """
+    Meal and exercise suggestions ranked over the foods and exercises
+    catalogs (see models/ranking.py)
+    """
+
+    def __init__(self, store_provider: Callable[[], NutritionStore], exercises_path: Optional[str] = None,
+                 meals_per_day: int = 3, food_k: int = 5, exercise_k: int = 3, check_interval: float = 5.0):
+        self.store_provider = store_provider
+        self.exercises_path = exercises_path
+        self.check_interval = check_interval
+        self.meals_per_day = meals_per_day
+        self.food_k = food_k
+        self.exercise_k = exercise_k
+        self._store = None
+        self._foods: Optional[FoodRanker] = None
+        self._exercises_mtime = None
+        self._exercises = ExerciseRanker(DEFAULT_EXERCISES)
+        self._next_exercises_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def foods(self) -> FoodRanker:
+        store = self.store_provider()
+        if store is not self._store:
+            # The nutrition snapshot was reloaded; rebuild the feature matrix
+            with self._lock:
+                if store is not self._store:
+                    self._foods = FoodRanker(store)
+                    self._store = store
+        return self._foods
+
+    @property
+    def exercises(self) -> ExerciseRanker:
+        """
+        Exercises from the JSON export at exercises_path (reloaded when it
+        changes, checked at most every check_interval seconds), or the
+        schema's seed rows
+        """
+        now = time.monotonic()
+        if self.exercises_path and now >= self._next_exercises_check:
+            self._next_exercises_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.exercises_path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != self._exercises_mtime:
+                with self._lock:
+                    self._exercises = ExerciseRanker.from_json(self.exercises_path)
+                    self._exercises_mtime = mtime
+        return self._exercises
+
+    def sources(self) -> Tuple[NutritionStore, ExerciseRanker]:
+        """
+        The data rankings are currently built from; a reload of either
+        shows up as a different object
+        """
+        return self.store_provider(), self.exercises
+
+    def recommend(self, key: RecommendationKey, remaining: Optional[Dict[str, float]] = None,
+                  meals_left: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Rank suggestions for a parameter combination. Without `remaining`
+        the budget is the goal's full-day target spread over meals_per_day;
+        with it (nutrients still available today) it is spread over
+        meals_left, default 1.
+        """
+        current_goals, activity_level, dietary_preferences = key
+        if remaining is None:
+            budget = daily_targets(current_goals, activity_level)
+            meals_left = meals_left or self.meals_per_day
+        else:
+            budget = {name: max(float(value), 0.0) for name, value in remaining.items() if name in FIT_NUTRIENTS}
+            meals_left = meals_left or 1
+        meal_targets = {name: value / meals_left for name, value in budget.items()}
+
+        foods = self.foods
+        required, excluded = split_preferences(dietary_preferences)
+        unsupported = self.unsupported_preferences(required, excluded)
+        if unsupported:
+            # A preference the catalog cannot check must not be dropped
+            # silently: suggest no meals rather than ones that may violate it
+            meal_suggestions = []
+        else:
+            meal_suggestions = foods.rank(meal_targets, current_goals, self.food_k,
+                                          require_tags=required, exclude_tags=excluded)
+
+        target_burn = SESSION_BURN.get(current_goals, SESSION_BURN['maintain_weight'])
+        if remaining is not None and remaining.get('calories', 0) < 0:
+            # Already over budget today: suggest burning at least the excess
+            target_burn = max(target_burn, -float(remaining['calories']))
+        exercise_recommendations = self.exercises.rank(
+            target_burn, activity_level, self.exercise_k, exclude_tags=[f"equipment:{tag}" for tag in excluded]
+        )
+
+        return {
+            "meal_suggestions": meal_suggestions,
+            "exercise_recommendations": exercise_recommendations,
+            "health_tips": HEALTH_TIPS,
+            "unsupported_preferences": unsupported,
+        }
+
+    def unsupported_preferences(self, required: List[str], excluded: List[str]) -> List[str]:
+        """
+        Preferences neither catalog has a tag for. An exclusion is
+        supported if foods or exercises (as equipment) are tagged with it.
+        """
+        food_tags = set(self.foods.ranker.tags)
+        exercise_tags = set(self.exercises.ranker.tags)
+        unsupported = [tag for tag in required if tag not in food_tags]
+        unsupported += [f"no_{tag}" for tag in excluded
+                        if tag not in food_tags and f"equipment:{tag}" not in exercise_tags]
+        return unsupported
+
+
+class RecommendationCache:
+    """
+    Pre-serialized recommendation responses per parameter combination
+
+    `render(key)` builds and serializes one response to JSON bytes; a hit
+    returns those bytes as-is, skipping model construction and
+    serialization. Everything is dropped when the recommendation data
+    changes: either invalidate() is called (e.g. by the backend after
+    editing foods or exercises) or `sources()` returns different objects
+    than before. Keying on the very objects render() reads (such as
+    RecommendationEngine.sources) means the cache can never invalidate
+    ahead of the reload and re-render stale data.
+    """
+
+    def __init__(self, render: Callable[[RecommendationKey], bytes], max_entries: int = 1024,
+                 sources: Optional[Callable[[], Tuple[Any, ...]]] = None):
+        self.render = render
+        self.max_entries = max_entries
+        self.sources = sources
+        self._entries: 'OrderedDict[RecommendationKey, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._sources = sources() if sources else ()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_sources(self):
+        if self.sources is None:
+            return
+        sources = self.sources()
+        if len(sources) == len(self._sources) and all(a is b for a, b in zip(sources, self._sources)):
+            return
+        # Threads racing here may each invalidate once; that is harmless
+        self._sources = sources
+        self.invalidate(reason='source data reloaded')
+
+    def invalidate(self, reason: str = 'requested'):
+        with self._lock:
+            self._entries.clear()
+            self.version += 1
+            self.invalidations += 1
+        logger.info(f"Recommendation cache invalidated ({reason}), version {self.version}")
+
+    def get(self, key: RecommendationKey) -> bytes:
+        self._check_sources()
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+            version = self.version
+
+        body = self.render(key)
+        with self._lock:
+            # Don't store a response rendered from data invalidated meanwhile
+            if version == self.version:
+                self._entries[key] = body
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return body
+
+    def warm(self, keys: Iterable[RecommendationKey]) -> int:
+        """
+        Precompute responses, e.g. every goal x activity level at startup
+        """
+        count = 0
+        for key in keys:
+            self.get(key)
+            count += 1
+        return count
+
+    def get_stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+        }
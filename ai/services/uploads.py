@@ -0,0 +1,196 @@
+import hashlib
+import ipaddress
+import os
+import socket
+import tempfile
+from typing import AsyncIterator, Collection, Optional
+from urllib.parse import urljoin, urlsplit
+import logging
+
+import requests
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Extensions we keep when naming stored uploads; anything else is dropped
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.heic'}
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+FETCH_SCHEMES = {'http', 'https'}
+MAX_FETCH_REDIRECTS = 3
+
+
+class UploadTooLargeError(Exception):
+    """
+    Raised while streaming once an upload exceeds its size limit
+    """
+
+
+class UnsafeURLError(ValueError):
+    """
+    Raised for image URLs the service must not fetch: other schemes,
+    hosts off the allowlist, or non-public addresses
+    """
+
+
+class StoredUpload:
+    """
+    An upload written to disk under its content hash
+    """
+
+    def __init__(self, path: str, digest: str, size: int, duplicate: bool):
+        self.path = path
+        self.digest = digest
+        self.size = size
+        self.duplicate = duplicate
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def upload_path(upload_dir: str, digest: str, filename: Optional[str]) -> str:
+    """
+    Content-addressed path for an upload: identical bytes map to one file
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+        extension = ''
+    return os.path.join(upload_dir, f"{digest}{extension}")
+
+
+async def iter_upload_file(file: UploadFile, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Read a multipart UploadFile in fixed-size chunks instead of all at once
+    """
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def stream_upload(chunks: AsyncIterator[bytes], upload_dir: str, filename: Optional[str],
+                        max_bytes: int) -> StoredUpload:
+    """
+    Write an upload to disk chunk by chunk, hashing as it streams.
+
+    Memory stays at one chunk per request regardless of the upload size.
+    The size limit is enforced as soon as it is crossed, and the file is
+    only moved to its content-addressed name once complete, so identical
+    uploads are stored once and a failed upload never leaves a partial file.
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as buffer:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+                hasher.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+
+        digest = hasher.hexdigest()
+        file_path = upload_path(upload_dir, digest, filename)
+        duplicate = os.path.exists(file_path)
+        if duplicate:
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, file_path)
+        return StoredUpload(file_path, digest, size, duplicate)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def check_fetch_url(url: str, allowed_hosts: Optional[Collection[str]] = None):
+    """
+    Refuse to fetch anything but http(s) URLs of public hosts, so a
+    client-supplied URL cannot reach loopback, private or link-local
+    (cloud metadata) addresses behind the service
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in FETCH_SCHEMES:
+        raise UnsafeURLError("Only http and https image URLs are supported")
+    host = (parts.hostname or '').lower()
+    if not host:
+        raise UnsafeURLError("Image URL has no host")
+    if allowed_hosts and host not in allowed_hosts:
+        raise UnsafeURLError(f"Host {host} is not allowed")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 0, proto=socket.IPPROTO_TCP)}
+    except socket.gaierror:
+        raise UnsafeURLError(f"Cannot resolve host {host}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global or ip.is_multicast:
+            raise UnsafeURLError(f"Host {host} resolves to a non-public address")
+
+
+def fetch_image(url: str, max_bytes: int, timeout: float, allowed_hosts: Optional[Collection[str]] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> bytes:
+    """
+    Download an image from a client-supplied URL with bounded memory.
+
+    Every hop of a redirect chain is checked by check_fetch_url, and the
+    body is streamed in chunks and abandoned as soon as it exceeds
+    `max_bytes`, whatever Content-Length claims.
+    """
+    for _ in range(MAX_FETCH_REDIRECTS + 1):
+        check_fetch_url(url, allowed_hosts)
+        with requests.get(url, timeout=timeout, stream=True, allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers['location'])
+                continue
+            response.raise_for_status()
+            if not response.headers.get('content-type', '').startswith('image/'):
+                raise ValueError("URL does not point to an image")
+            declared = response.headers.get('content-length', '')
+            if declared.isdigit() and int(declared) > max_bytes:
+                raise UploadTooLargeError(f"Image exceeds {max_bytes} bytes")
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Image exceeds {max_bytes} bytes")
+                chunks.append(chunk)
+            return b''.join(chunks)
+    raise ValueError("Too many redirects")
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Reject requests whose declared Content-Length exceeds the limit for
+    their path with 413, before any of the body is read or parsed.
+    Bodies without a Content-Length are bounded by stream_upload instead.
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] == 'http' and scope['path'] in self.limits:
+            limit = self.limits[scope['path']]
+            for name, value in scope['headers']:
+                if name == b'content-length' and value.isdigit() and int(value) > limit:
+                    await self._reject(send, limit)
+                    return
+        await self.app(scope, receive, send)
+
+    async def _reject(self, send: Send, limit: int):
+        body = f'{{"detail":"Request body exceeds {limit} bytes"}}'.encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,157 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Each worker (thread or process) holds its own model instance
+_worker_state = threading.local()
+_factory_lock = threading.Lock()
+
+
+class PoolSaturatedError(Exception):
+    """
+    Raised when the worker pool already has max_pending tasks queued
+    """
+
+
+def _init_worker(model_factory: Callable[[], Any]):
+    # Keras model construction is not guaranteed to be thread-safe
+    with _factory_lock:
+        _worker_state.model = model_factory()
+    logger.info(f"Inference worker ready (pid={os.getpid()}, thread={threading.current_thread().name})")
+
+
+def _call_model(method: str, args: tuple, kwargs: dict) -> Any:
+    return getattr(_worker_state.model, method)(*args, **kwargs)
+
+
+class InferencePool:
+    """
+    Run blocking model work (TensorFlow inference, PIL decoding) off the
+    asyncio event loop on a bounded pool of workers
+
+    mode="thread" shares one process and relies on TensorFlow and PIL
+    releasing the GIL; mode="process" gives every worker its own interpreter
+    and is the option for pure-Python bottlenecks. In both modes each worker
+    builds its own model via model_factory, which must be picklable for
+    process mode (e.g. functools.partial(FoodRecognitionModel, path)).
+    """
+
+    def __init__(self, model_factory: Callable[[], Any], mode: str = 'thread',
+                 workers: Optional[int] = None, max_pending: int = 64):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown pool mode: {mode}")
+        self.model_factory = model_factory
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self.status = 'stopped'
+        self.warm_up_seconds: Optional[float] = None
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """
+        Create the executor. Workers are spawned, and build their model,
+        when they receive their first task (see warm_up)
+        """
+        if self._executor is not None:
+            return
+        if self.mode == 'process':
+            # fork() after TensorFlow has started threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.model_factory,)
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix='inference',
+                initializer=_init_worker,
+                initargs=(self.model_factory,)
+            )
+        self.status = 'started'
+        logger.info(f"Inference pool started (mode={self.mode}, workers={self.workers}, max_pending={self.max_pending})")
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._executor = None
+        self.status = 'stopped'
+        logger.info("Inference pool stopped")
+
+    @property
+    def ready(self) -> bool:
+        return self.status == 'ready'
+
+    async def warm_up(self):
+        """
+        Load the model and run a dummy batch on every worker, then mark the
+        pool ready. Meant to run as a background task after startup.
+        """
+        self.status = 'warming_up'
+        started = time.perf_counter()
+        try:
+            # Concurrent submissions make the executor spin up all workers
+            await asyncio.gather(*[
+                self.submit('warm_up') for _ in range(min(self.workers, self.max_pending))
+            ])
+        except Exception as e:
+            self.status = 'failed'
+            logger.error(f"Inference pool warm-up failed: {str(e)}")
+            return
+        self.warm_up_seconds = time.perf_counter() - started
+        self.status = 'ready'
+        logger.info(f"Inference pool ready after {self.warm_up_seconds:.2f}s")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def submit(self, method: str, *args, **kwargs) -> Any:
+        """
+        Call `method` on a worker's model instance and await the result.
+        Raises PoolSaturatedError instead of queueing beyond max_pending.
+        """
+        if self._executor is None:
+            raise RuntimeError("Inference pool is not running")
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolSaturatedError(f"Inference pool is saturated ({self._pending} pending)")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, _call_model, method, args, kwargs)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._pending -= 1
+
+    def get_stats(self) -> Dict:
+        return {
+            'status': self.status,
+            'warm_up_seconds': self.warm_up_seconds,
+            'mode': self.mode,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self._pending,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,8 @@
+"""
+Tests run from the ai/ directory (python -m pytest -q); put it on the path
+so the service's top-level packages import the same way main.py does.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
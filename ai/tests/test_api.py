@@ -0,0 +1,226 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+
+@pytest.fixture(scope='module')
+def app_main(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('app')
+    # main.py reads its environment at import time
+    os.environ.update({
+        'INFERENCE_WARMUP': '0',
+        'DAILY_TOTALS_DB': str(tmp / 'daily_totals.db'),
+        'JOBS_DB': str(tmp / 'jobs.db'),
+        'UPLOAD_DIR': str(tmp / 'uploads'),
+    })
+    import main
+    return main
+
+
+@pytest.fixture(scope='module')
+def client(app_main):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app_main.app) as client:
+        yield client
+
+
+def jpeg(seed: int) -> bytes:
+    pixels = (np.random.default_rng(seed).random((64, 64, 3)) * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def test_recognize_food_from_image_url(app_main, client, monkeypatch):
+    fetched = []
+    image = jpeg(0)
+
+    def fetch(url):
+        fetched.append(url)
+        return image
+    monkeypatch.setattr(app_main, '_fetch_image_bytes', fetch)
+
+    response = client.post('/recognize-food', json={'image_url': 'http://images.example/pho.jpg'})
+    assert response.status_code == 200
+    body = response.json()
+    assert fetched == ['http://images.example/pho.jpg']
+    assert body['food_name'] == body['candidates'][0]['food_name']
+    assert body['confidence'] == body['candidates'][0]['probability']
+    # Values for the recognized serving, not per 100 g
+    best = body['candidates'][0]['nutritional_info']
+    assert body['estimated_calories'] == best['calories']
+    assert body['nutritional_info'] == {k: v for k, v in best.items() if k != 'calories'}
+
+    # Same bytes again: answered from the prediction cache, same result
+    hits = app_main.prediction_cache.get_stats()['hits']
+    assert client.post('/recognize-food', json={'image_url': 'http://images.example/pho.jpg'}).json() == body
+    assert app_main.prediction_cache.get_stats()['hits'] == hits + 1
+
+
+def test_recognize_food_bad_image_url(app_main, client, monkeypatch):
+    def fetch(url):
+        raise ValueError("URL does not point to an image")
+    monkeypatch.setattr(app_main, '_fetch_image_bytes', fetch)
+
+    response = client.post('/recognize-food', json={'image_url': 'http://images.example/page.html'})
+    assert response.status_code == 400
+
+
+def test_recognize_food_requires_input(client):
+    assert client.post('/recognize-food', json={}).status_code == 400
+
+
+def test_cached_recognition_follows_nutrition_reload(app_main, client, monkeypatch):
+    from models.nutrition_store import NutritionStore
+
+    image = jpeg(1)
+    monkeypatch.setattr(app_main, '_fetch_image_bytes', lambda url: image)
+    first = client.post('/recognize-food', json={'image_url': 'http://images.example/a.jpg'}).json()
+
+    # Reload the catalog with every food at 1000 kcal per 100 g and 200 g servings
+    catalog = app_main.nutrition_catalog
+    rows = [{'id': i + 1, 'name_vietnamese': name, 'calories': 1000, 'serving_size': 200}
+            for i, name in enumerate(catalog.class_names)]
+    monkeypatch.setattr(catalog, '_nutrition_store', NutritionStore.from_rows(rows, catalog.class_names))
+
+    hits = app_main.prediction_cache.get_stats()['hits']
+    second = client.post('/recognize-food', json={'image_url': 'http://images.example/a.jpg'}).json()
+    assert app_main.prediction_cache.get_stats()['hits'] == hits + 1
+    assert second['food_name'] == first['food_name']
+    assert second['estimated_calories'] == 2000
+    assert [c['portion_grams'] for c in second['candidates']] == [200] * len(first['candidates'])
+    assert all(c['nutritional_info']['calories'] == 2000 for c in second['candidates'])
+
+
+def test_batch_reports_nutrition_for_portion_eaten(app_main, client):
+    files = [('files', (f'{seed}.jpg', jpeg(seed), 'image/jpeg')) for seed in (10, 11)]
+    response = client.post('/recognize-food/batch', files=files, data={'portion_grams': ['250', '0']})
+    assert response.status_code == 200
+    first, second = response.json()['results']
+    assert first['success'] and second['success']
+
+    assert [c['portion_grams'] for c in first['candidates']] == [250] * len(first['candidates'])
+    for item in (first, second):
+        best = item['candidates'][0]['nutritional_info']
+        assert item['estimated_calories'] == best['calories']
+        assert item['nutritional_info'] == {k: v for k, v in best.items() if k != 'calories'}
+
+
+@pytest.mark.parametrize('portion_grams', [300, None])
+def test_upload_reports_nutrition_for_portion(client, portion_grams):
+    data = {'portion_grams': str(portion_grams)} if portion_grams else {}
+    response = client.post('/upload-food-image', files={'file': ('meal.jpg', jpeg(20), 'image/jpeg')}, data=data)
+    assert response.status_code == 200
+    body = response.json()
+    best = body['candidates'][0]
+    assert body['food_name'] == best['food_name']
+    assert body['nutritional_info'] == best['nutritional_info']
+    assert body['portion_grams'] == best['portion_grams']
+    if portion_grams:
+        assert best['portion_grams'] == portion_grams
+
+
+def test_batch_streams_uploads_with_size_limit(app_main, client, monkeypatch):
+    small, large = jpeg(30), jpeg(31) + b'\0' * 4096
+    monkeypatch.setattr(app_main, 'MAX_UPLOAD_BYTES', len(small))
+    files = [('files', ('small.jpg', small, 'image/jpeg')), ('files', ('large.jpg', large, 'image/jpeg'))]
+    response = client.post('/recognize-food/batch', files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body['succeeded'], body['failed']) == (1, 1)
+    assert body['results'][1]['error'] == f"Upload exceeds {len(small)} bytes"
+
+    # The accepted upload is stored under its hash; the rejected one leaves nothing
+    stored = os.listdir(app_main.UPLOAD_DIR)
+    assert f"{app_main.content_hash(small)}.jpg" in stored
+    assert not any(name.endswith('.part') for name in stored)
+
+
+def test_analyze_nutrition_input_errors(client):
+    meals = [{'food_name': 'phở bò', 'calories': 450, 'protein': '20.5', 'carbs': 60, 'fat': 10}]
+    response = client.post('/analyze-nutrition', json={'user_id': 1, 'date': '2024-01-01', 'meals': meals})
+    assert response.status_code == 200
+    assert response.json()['total_protein'] == 20.5
+
+    bad_meal = [{'calories': 'lots'}]
+    response = client.post('/analyze-nutrition', json={'user_id': 1, 'date': '2024-01-01', 'meals': bad_meal})
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'][-1] == 'calories'
+
+    response = client.post('/analyze-nutrition', json={'user_id': 1, 'date': 'yesterday'})
+    assert response.status_code == 400
+    assert response.json()['detail'] == "Invalid date, expected YYYY-MM-DD"
+
+    goals = [{'user_id': 1, 'goal_type': 'muscle_gain', 'target_value': 'a lot', 'target_unit': 'kcal'}]
+    response = client.post('/analyze-nutrition', json={'user_id': 1, 'date': '2024-01-01', 'meals': meals,
+                                                       'goals': goals})
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith("Invalid goals")
+
+
+def test_repeated_upload_is_stored_once_and_served_from_cache(app_main, client):
+    image = jpeg(40)
+    first = client.post('/upload-food-image', files={'file': ('a.jpg', image, 'image/jpeg')}).json()
+    hits = app_main.prediction_cache.get_stats()['hits']
+    batches = app_main.inference_engine.get_stats()['total_batches']
+
+    second = client.post('/upload-food-image', files={'file': ('b.jpg', image, 'image/jpeg')}).json()
+    assert second['file_path'] == first['file_path']
+    assert os.path.basename(first['file_path']) == f"{app_main.content_hash(image)}.jpg"
+    assert second['candidates'] == first['candidates']
+    # Answered from the cache without another forward pass
+    assert app_main.prediction_cache.get_stats()['hits'] == hits + 1
+    assert app_main.inference_engine.get_stats()['total_batches'] == batches
+
+
+def test_oversized_uploads_get_413(app_main, client, monkeypatch):
+    image = jpeg(50)
+    # The middleware's limit, fixed when the app was built
+    declared_limit = app_main.MAX_UPLOAD_BYTES
+    monkeypatch.setattr(app_main, 'MAX_UPLOAD_BYTES', len(image) - 1)
+    response = client.post('/upload-food-image', files={'file': ('a.jpg', image, 'image/jpeg')})
+    assert response.status_code == 413
+    response = client.post('/upload-food-image/stream', content=image, headers={'content-type': 'image/jpeg'})
+    assert response.status_code == 413
+    assert not any(name.endswith('.part') for name in os.listdir(app_main.UPLOAD_DIR))
+
+    # Declared Content-Length over the route's limit is refused before parsing
+    response = client.post('/upload-food-image/stream', content=b'\0' * (declared_limit + 1),
+                           headers={'content-type': 'image/jpeg'})
+    assert response.status_code == 413
+    assert response.json()['detail'] == f"Request body exceeds {declared_limit} bytes"
+
+
+def test_ready_waits_for_warm_up(app_main, client, monkeypatch):
+    # Warm-up is off in these tests, so the started pool counts as ready
+    assert client.get('/ready').status_code == 200
+    assert client.get('/health').json()['ready'] is True
+
+    monkeypatch.setattr(app_main, 'INFERENCE_WARMUP', True)
+    monkeypatch.setattr(app_main.inference_pool, 'status', 'warming_up')
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.json()['detail'] == "Model warming_up"
+    health = client.get('/health')
+    assert health.status_code == 200
+    assert (health.json()['ready'], health.json()['model_status']) == (False, 'warming_up')
+
+    monkeypatch.setattr(app_main.inference_pool, 'status', 'ready')
+    monkeypatch.setattr(app_main.inference_pool, 'warm_up_seconds', 1.5)
+    assert client.get('/ready').json() == {'ready': True, 'warm_up_seconds': 1.5}
+
+
+def test_metrics_endpoint_and_profiler_toggle(client):
+    client.get('/health')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in response.text
+    assert 'inference_pool_ready' in response.text and 'prediction_cache_entries' in response.text
+    # The profiler is opt-in
+    assert client.post('/debug/profiler/start').status_code == 404
+    assert client.get('/debug/profiler').status_code == 404
@@ -0,0 +1,50 @@
+import pytest
+
+from models.architectures import build_model, count_flops
+
+tf = pytest.importorskip('tensorflow')
+
+
+def test_unknown_architecture():
+    with pytest.raises(ValueError):
+        build_model('resnet', 20)
+
+
+@pytest.mark.parametrize('architecture', ['cnn', 'mobilenet'])
+def test_models_output_class_probabilities(architecture):
+    model = build_model(architecture, 20, input_size=96)
+    assert model.input_shape == (None, 96, 96, 3)
+    assert model.output_shape == (None, 20)
+    assert model.optimizer is not None
+
+
+def test_backbone_sizes_at_224():
+    # The figures quoted in the module docstring
+    cnn = build_model('cnn', 20)
+    mobilenet = build_model('mobilenet', 20)
+    assert cnn.count_params() == pytest.approx(9.7e6, rel=0.02)
+    assert mobilenet.count_params() == pytest.approx(0.7e6, rel=0.05)
+    assert count_flops(cnn) == pytest.approx(555e6, rel=0.01)
+    assert count_flops(mobilenet) == pytest.approx(122e6, rel=0.01)
+
+
+def test_mobilenet_size_does_not_depend_on_resolution():
+    small, large = build_model('mobilenet', 20, input_size=96), build_model('mobilenet', 20, input_size=160)
+    assert small.count_params() == large.count_params()
+    assert count_flops(small) < count_flops(large)
+    assert build_model('cnn', 20, input_size=96).count_params() < build_model('cnn', 20, input_size=160).count_params()
+
+
+def test_count_flops_by_hand():
+    layers = tf.keras.layers
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(8, 8, 3)),
+        layers.Conv2D(4, 3),
+        layers.DepthwiseConv2D(3, padding='same'),
+        layers.Flatten(),
+        layers.Dense(2),
+    ])
+    conv = 6 * 6 * 4 * 3 * 3 * 3
+    depthwise = 6 * 6 * 4 * 3 * 3
+    dense = 6 * 6 * 4 * 2
+    assert count_flops(model) == conv + depthwise + dense
@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.compare_reports import compare
+from benchmarks.workloads import summarize, synthetic_jpeg, synthetic_meals, typed_description
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+
+
+def test_synthetic_inputs_are_seeded():
+    image = synthetic_jpeg(64, 48, seed=1)
+    assert Image.open(io.BytesIO(image)).size == (64, 48)
+    assert synthetic_jpeg(64, 48, seed=1) == image != synthetic_jpeg(64, 48, seed=2)
+
+    meals = synthetic_meals(np.random.default_rng(0), 5)
+    assert meals == synthetic_meals(np.random.default_rng(0), 5)
+    assert all(set(meal) == {'calories', 'protein', 'carbs', 'fat'} for meal in meals)
+
+
+def test_typed_descriptions_drop_accents_and_letters():
+    typed = {typed_description('Bún bò Huế', np.random.default_rng(seed)) for seed in range(50)}
+    assert 'bun bo hue' in typed and 'bún bò huế' in typed
+    assert all(len(name) >= len('bun bo hue') - 1 for name in typed)
+
+
+def test_summarize():
+    latencies = np.random.default_rng(0).exponential(0.01, 1000)
+    summary = summarize(latencies, wall_s=2.0, errors=10)
+    for percentile in (50, 95, 99):
+        assert summary[f"p{percentile}_ms"] == pytest.approx(np.percentile(latencies, percentile) * 1000)
+    assert summary['max_ms'] == pytest.approx(latencies.max() * 1000)
+    # Failed calls do not count towards throughput
+    assert summary['throughput_per_s'] == 495.0
+    assert summarize([], wall_s=0.0) == {'count': 0, 'errors': 0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0,
+                                          'mean_ms': 0.0, 'max_ms': 0.0, 'throughput_per_s': 0.0}
+
+
+def result(name, p50=10.0, p95=20.0, p99=30.0, throughput=100.0, errors=0):
+    return {'name': name, 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'throughput_per_s': throughput,
+            'errors': errors}
+
+
+def test_compare_flags_changes_beyond_the_threshold():
+    baseline = {'results': [result('a'), result('b'), result('c', p50=0.0), result('gone')]}
+    candidate = {'results': [
+        result('a', p50=10.9, p95=25.0, throughput=80.0),
+        result('b', p99=20.0, throughput=130.0, errors=2),
+        result('c', p50=5.0),
+        result('new', p50=1000.0),
+    ]}
+    rows = compare(baseline, candidate, threshold=10.0, fields=['p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s'])
+    statuses = {(row['name'], row['metric']): row['status'] for row in rows}
+    assert statuses == {
+        ('a', 'p50_ms'): 'same', ('a', 'p95_ms'): 'regressed', ('a', 'p99_ms'): 'same',
+        ('a', 'throughput_per_s'): 'regressed',
+        ('b', 'p50_ms'): 'same', ('b', 'p95_ms'): 'same', ('b', 'p99_ms'): 'improved',
+        ('b', 'throughput_per_s'): 'improved', ('b', 'errors'): 'regressed',
+        # A zero baseline has no percentage change
+        ('c', 'p95_ms'): 'same', ('c', 'p99_ms'): 'same', ('c', 'throughput_per_s'): 'same',
+    }
+    assert next(row for row in rows if row['metric'] == 'p95_ms')['change_pct'] == pytest.approx(25.0)
+
+    only_p50 = compare(baseline, candidate, threshold=5.0, fields=['p50_ms'])
+    assert [(row['name'], row['status']) for row in only_p50] == [('a', 'regressed'), ('b', 'same'),
+                                                                  ('b', 'regressed')]
+
+
+def run_script(*args):
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True)
+
+
+def test_micro_benchmark_report_gates_on_regressions(tmp_path):
+    baseline = str(tmp_path / 'baseline.json')
+    completed = run_script(os.path.join(BENCHMARKS_DIR, 'micro_benchmark.py'), '--skip-model', '--iterations', '3',
+                           '--batch-users', '10', '--output', baseline)
+    assert completed.returncode == 0, completed.stderr
+    with open(baseline) as f:
+        report = json.load(f)
+    assert report['meta']['kind'] == 'micro'
+    assert report['meta']['settings']['iterations'] == 3
+    assert report['results'] and all('p95_ms' in entry for entry in report['results'])
+
+    compare_script = os.path.join(BENCHMARKS_DIR, 'compare_reports.py')
+    same = run_script(compare_script, baseline, baseline)
+    assert same.returncode == 0 and "0 regression(s)" in same.stdout
+
+    for entry in report['results']:
+        entry['p95_ms'] *= 2
+    slower = str(tmp_path / 'slower.json')
+    with open(slower, 'w') as f:
+        json.dump(report, f)
+    regressed = run_script(compare_script, baseline, slower, '--threshold', '50', '--output',
+                           str(tmp_path / 'comparison.json'))
+    assert regressed.returncode == 1
+    assert f"{len(report['results'])} regression(s) beyond 50%" in regressed.stdout
+    with open(tmp_path / 'comparison.json') as f:
+        assert json.load(f)['threshold_pct'] == 50
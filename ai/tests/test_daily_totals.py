@@ -0,0 +1,111 @@
+import pytest
+
+from services.daily_totals import DailyTotalsStore
+
+MEAL = {'calories': 500, 'protein': 20, 'carbs': 60, 'fat': 15}
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """
+    Two stores on one database file, as two uvicorn workers would have
+    """
+    path = str(tmp_path / 'daily_totals.db')
+    stores = [DailyTotalsStore(path), DailyTotalsStore(path)]
+    for store in stores:
+        store.open()
+    yield stores
+    for store in stores:
+        store.close()
+
+
+def test_upsert_and_delete_round_trip(workers):
+    store = workers[0]
+    store.upsert_meal(1, 7, '2024-01-01', MEAL)
+    totals = store.upsert_meal(2, 7, '2024-01-01T12:30:00', MEAL)
+    assert totals['meal_count'] == 2
+    assert totals['calories'] == 1000
+    store.delete_meal(1)
+    totals = store.delete_meal(2)
+    assert totals['meal_count'] == 0
+    assert totals['calories'] == 0
+    assert store.delete_meal(2) is None
+
+
+def test_read_sees_other_workers_write(workers):
+    first, second = workers
+    assert second.get(7, '2024-01-01')['calories'] == 0
+    first.upsert_meal(1, 7, '2024-01-01', MEAL)
+    assert second.get(7, '2024-01-01')['calories'] == 500
+    # Unchanged data is served from memory
+    second.get(7, '2024-01-01')
+    assert second.get_stats()['hits'] >= 1
+
+
+def test_writes_from_two_workers_accumulate(workers):
+    first, second = workers
+    # Both workers have the day cached before either writes
+    first.get(7, '2024-01-01')
+    second.get(7, '2024-01-01')
+    first.upsert_meal(1, 7, '2024-01-01', MEAL)
+    totals = second.upsert_meal(2, 7, '2024-01-01', MEAL)
+    assert totals['meal_count'] == 2
+    assert totals['calories'] == 1000
+    assert first.get(7, '2024-01-01')['calories'] == 1000
+
+
+def test_meal_moved_by_other_worker(workers):
+    first, second = workers
+    first.upsert_meal(1, 7, '2024-01-01', MEAL)
+    second.get(7, '2024-01-01')
+    first.upsert_meal(1, 7, '2024-01-02', MEAL)
+    # second must not subtract the meal from the day it no longer belongs to
+    second.delete_meal(1)
+    assert first.get(7, '2024-01-01')['meal_count'] == 0
+    assert first.get(7, '2024-01-02')['meal_count'] == 0
+
+
+def test_other_workers_write_invalidates_only_its_days(workers):
+    first, second = workers
+    for day in ('2024-01-01', '2024-01-02'):
+        first.upsert_meal(int(day[-1]), 7, day, MEAL)
+        second.get(7, day)
+    second.get(8, '2024-01-01')
+
+    first.upsert_meal(3, 7, '2024-01-02', MEAL)
+    misses = second.get_stats()['misses']
+    assert second.get(7, '2024-01-02')['meal_count'] == 2
+    assert second.get(7, '2024-01-01')['meal_count'] == 1
+    assert second.get(8, '2024-01-01')['meal_count'] == 0
+    stats = second.get_stats()
+    # Only the changed day was reloaded
+    assert stats['misses'] == misses + 1
+    assert stats['resyncs'] == 0
+
+    # A store's own writes do not invalidate its cache
+    misses = first.get_stats()['misses']
+    first.get(7, '2024-01-01')
+    assert first.get_stats()['misses'] == misses
+
+
+def test_store_behind_a_pruned_log_drops_everything(tmp_path):
+    path = str(tmp_path / 'daily_totals.db')
+    first, second = DailyTotalsStore(path, change_log_size=2), DailyTotalsStore(path, change_log_size=2)
+    first.open()
+    second.open()
+    try:
+        second.get(7, '2024-01-01')
+        second.get(9, '2024-01-01')
+        for meal_id in range(1, 5):
+            first.upsert_meal(meal_id, 8, '2024-01-01', MEAL)
+        assert second.get(8, '2024-01-01')['meal_count'] == 4
+        assert second.get_stats()['resyncs'] == 1
+        assert second.get_stats()['cached_days'] == 1
+        # Caught up: later changes are applied selectively again
+        first.upsert_meal(5, 8, '2024-01-01', MEAL)
+        second.get(7, '2024-01-01')
+        assert second.get_stats()['resyncs'] == 1
+        assert second.get(8, '2024-01-01')['meal_count'] == 5
+    finally:
+        first.close()
+        second.close()
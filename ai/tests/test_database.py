@@ -0,0 +1,143 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from models.nutrition_store import NutritionStore
+from services.database import (
+    MEALS_FOR_USERS_QUERY, Database, DatabaseBusyError, create_sqlite_schema, fetch_active_goals, fetch_foods,
+    fetch_meals
+)
+
+INSERT_USER = "INSERT INTO users (id, email, full_name) VALUES (%s, %s, %s)"
+INSERT_MEAL = (
+    "INSERT INTO meals (user_id, food_id, meal_type, quantity, calories, protein, carbs, fat, meal_date) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"
+)
+INSERT_GOAL = "INSERT INTO user_goals (user_id, goal_type, target_value, target_unit, is_active) VALUES (%s, %s, %s, %s, %s)"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'health_tracker.db')
+    create_sqlite_schema(path)
+    return path
+
+
+def run_with_db(db_path, test, **kwargs):
+    """
+    Run `await test(db)` against an open pool on the test database
+    """
+    async def main():
+        db = Database.sqlite(db_path, **kwargs)
+        await db.open()
+        try:
+            return await test(db)
+        finally:
+            await db.close()
+    return asyncio.run(main())
+
+
+def meal_row(user_id, day, meal_type='lunch'):
+    return (user_id, 1, meal_type, 150, 195.0, 4.0, 42.0, 0.5, f"2024-01-{day:02d}")
+
+
+async def add_users(db, user_ids):
+    await db.execute_many(INSERT_USER, [(i, f"user{i}@example.com", f"User {i}") for i in user_ids])
+
+
+def test_schema_is_idempotent(db_path):
+    create_sqlite_schema(db_path)
+    connection = sqlite3.connect(db_path)
+    assert connection.execute("SELECT COUNT(*) FROM foods").fetchone()[0] == 10
+    connection.close()
+
+
+def test_foods_load_into_store(db_path):
+    rows = run_with_db(db_path, fetch_foods)
+    assert [row['id'] for row in rows] == list(range(1, 11))
+    store = NutritionStore.from_rows(rows, class_names=['Phở bò'])
+    assert store.values[store.rows_for_classes([0])[0], store.field_index('calories')] == 350
+
+
+def test_fetch_in_chunks_and_dedupes(db_path):
+    async def test(db):
+        await add_users(db, range(1, 26))
+        await db.execute_many(INSERT_MEAL, [meal_row(i, day) for i in range(1, 26) for day in (1, 2, 3)])
+        user_ids = list(range(1, 26)) + [3, 5]
+        columns = await db.fetch_in(MEALS_FOR_USERS_QUERY, user_ids, ('2024-01-02', '2024-01-03'),
+                                    name='meals', chunk_size=7, columns=True)
+        return columns, db.get_stats()['queries']['meals']['count']
+
+    columns, queries = run_with_db(db_path, test)
+    # 25 distinct users in chunks of 7
+    assert queries == 4
+    assert sorted(columns['user_id']) == sorted(list(range(1, 26)) * 2)
+    assert set(columns['meal_date']) == {'2024-01-02', '2024-01-03'}
+
+
+def test_fetch_meals_and_goals(db_path):
+    async def test(db):
+        await add_users(db, [1, 2])
+        await db.execute_many(INSERT_MEAL, [meal_row(1, 1), meal_row(2, 1, 'dinner')])
+        await db.execute_many(INSERT_GOAL, [(1, 'weight_loss', 60, 'kg', 1), (2, 'muscle_gain', 70, 'kg', 0)])
+        return await fetch_meals(db, [1, 2], '2024-01-01', '2024-01-31'), await fetch_active_goals(db, [1, 2])
+
+    meals, goals = run_with_db(db_path, test)
+    assert meals['user_id'] == [1, 2]
+    assert [goal['goal_type'] for goal in goals] == ['weight_loss']
+
+
+def test_execute_many_rolls_back_on_error(db_path):
+    async def test(db):
+        await add_users(db, [1])
+        # The last row violates the meal_type CHECK constraint
+        with pytest.raises(sqlite3.IntegrityError):
+            await db.execute_many(INSERT_MEAL, [meal_row(1, 1), meal_row(1, 2), meal_row(1, 3, 'brunch')])
+        count = await db.fetch_one("SELECT COUNT(*) AS n FROM meals")
+        return count['n'], db.get_stats()
+
+    count, stats = run_with_db(db_path, test)
+    assert count == 0
+    assert stats['queries'][INSERT_MEAL.replace('%s', '?')]['errors'] == 1
+
+
+def test_failed_connection_is_not_reused(db_path):
+    async def test(db):
+        with pytest.raises(sqlite3.OperationalError):
+            await db.execute("SELECT * FROM missing_table")
+        return db.get_stats()['pool']
+
+    pool = run_with_db(db_path, test)
+    # The connection used for the failed query was closed, not returned
+    assert pool['size'] == 0
+    assert pool['idle'] == 0
+
+
+def test_pool_reuses_connections(db_path):
+    async def test(db):
+        for _ in range(5):
+            await db.fetch_all("SELECT id FROM foods")
+        await asyncio.gather(*[db.fetch_all("SELECT id FROM foods") for _ in range(8)])
+        return db.get_stats()['pool']
+
+    pool = run_with_db(db_path, test, max_size=2)
+    assert pool['size'] <= 2
+    assert pool['idle'] == pool['size']
+
+
+def test_pool_acquire_timeout(db_path):
+    async def test(db):
+        held = [await db._acquire(), await db._acquire()]
+        with pytest.raises(DatabaseBusyError):
+            await db.fetch_all("SELECT id FROM foods")
+        for connection in held:
+            db._release(connection, healthy=True)
+        # Released connections serve the next query
+        rows = await db.fetch_all("SELECT id FROM foods")
+        return rows, db.get_stats()['pool']
+
+    rows, pool = run_with_db(db_path, test, max_size=2, acquire_timeout=0.05)
+    assert len(rows) == 10
+    assert pool['acquire_timeouts'] == 1
+    assert pool['size'] == 2
@@ -0,0 +1,106 @@
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from models.food_recognition import FoodRecognitionModel
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_does_not_load_tensorflow(tmp_path):
+    env = dict(os.environ, INFERENCE_WARMUP='0', DAILY_TOTALS_DB=str(tmp_path / 'daily_totals.db'),
+               JOBS_DB=str(tmp_path / 'jobs.db'), UPLOAD_DIR=str(tmp_path / 'uploads'))
+    output = subprocess.run([sys.executable, '-c', "import sys, main; print('tensorflow' in sys.modules)"],
+                            cwd=AI_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == 'False'
+
+
+def test_lazy_model_loads_on_warm_up():
+    pytest.importorskip('tensorflow')
+    model = FoodRecognitionModel(lazy=True, input_size=64)
+    assert not model.is_loaded
+    # Nutrition lookups do not need the network
+    assert model.get_nutritional_info('phở bò')['calories'] > 0
+    assert not model.is_loaded
+
+    assert model.warm_up(batch_size=2) > 0
+    assert model.is_loaded
+    runtime = model.runtime
+    model.ensure_loaded()
+    assert model.runtime is runtime
+
+
+def test_lazy_model_loads_on_first_prediction():
+    pytest.importorskip('tensorflow')
+    model = FoodRecognitionModel(lazy=True, input_size=64)
+    results = model.predict_batch(np.zeros((1, 64, 64, 3), dtype=np.float32))
+    assert model.is_loaded
+    assert results[0][0] in model.class_names
+
+
+class FixedRuntime:
+    """
+    Returns the given probabilities, one row per image in order
+    """
+
+    def __init__(self, probabilities):
+        self.probabilities = np.asarray(probabilities, dtype=np.float32)
+
+    def predict(self, images):
+        return self.probabilities[:len(images)]
+
+
+def model_with(probabilities):
+    model = FoodRecognitionModel(lazy=True, input_size=8)
+    model.runtime = FixedRuntime(probabilities)
+    return model
+
+
+@pytest.mark.parametrize('top_k', [1, 3, 7, 50])
+def test_top_k_matches_a_full_sort(top_k):
+    probabilities = np.random.default_rng(top_k).dirichlet(np.ones(20), size=16)
+    model = model_with(probabilities)
+    top = model.predict_top_k(np.zeros((16, 8, 8, 3), dtype=np.float32), top_k=top_k)
+
+    expected = np.argsort(-probabilities.astype(np.float32), axis=1, kind='stable')[:, :min(top_k, 20)]
+    np.testing.assert_array_equal(top['class_indices'], expected)
+    np.testing.assert_array_equal(top['probabilities'], np.take_along_axis(probabilities.astype(np.float32),
+                                                                           expected, axis=1))
+
+
+def test_candidates_are_scaled_to_the_portion():
+    probabilities = np.zeros((2, 20))
+    probabilities[:, [1, 0, 8]] = [0.6, 0.3, 0.1]
+    model = model_with(probabilities)
+    store = model.nutrition_store
+    predictions = model.predict_batch(np.zeros((2, 8, 8, 3), dtype=np.float32), portions=[None, 250.0])
+
+    for (food_name, confidence, per_100g, candidates), portion in zip(predictions, [None, 250.0]):
+        assert (food_name, confidence) == ('phở bò', pytest.approx(0.6))
+        assert [c['food_name'] for c in candidates] == ['phở bò', 'cơm trắng', 'cơm tấm']
+        assert per_100g == model.get_nutritional_info('phở bò')
+        for candidate in candidates:
+            row = store.values[store.row_for_name(candidate['food_name'])]
+            grams = float(row[store.field_index('serving_size')]) if portion is None else portion
+            assert candidate['portion_grams'] == grams
+            assert candidate['nutritional_info']['calories'] == \
+                pytest.approx(row[store.field_index('calories')] * grams / 100)
+
+
+def test_predict_images_keys_results_by_position():
+    probabilities = np.eye(20)[[3, 5]]
+    model = model_with(probabilities)
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), (128, 128, 128)).save(buffer, 'PNG')
+
+    predictions, errors = model.predict_images([buffer.getvalue(), b'not an image', buffer.getvalue()],
+                                               portions=[100.0, 200.0, 300.0])
+    assert sorted(predictions) == [0, 2] and list(errors) == [1]
+    assert [predictions[i][0] for i in (0, 2)] == [model.class_names[3], model.class_names[5]]
+    # Portions follow their image, not their position in the decoded batch
+    assert [predictions[i][3][0]['portion_grams'] for i in (0, 2)] == [100.0, 300.0]
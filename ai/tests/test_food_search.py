@@ -0,0 +1,33 @@
+import pytest
+
+from models.food_search import FoodSearch
+from models.nutrition_store import NutritionStore
+
+FOODS = [
+    {'id': 1, 'name': 'Beef noodle soup', 'name_vietnamese': 'Phở bò', 'calories': 110, 'protein': 7,
+     'carbs': 12, 'fat': 3, 'fiber': 0.5, 'serving_size': 500},
+    {'id': 2, 'name': 'Steamed rice', 'name_vietnamese': 'Cơm trắng', 'calories': 130, 'protein': 2.7,
+     'carbs': 28, 'fat': 0.3, 'fiber': 0.4, 'serving_size': 150},
+]
+
+
+@pytest.fixture
+def search():
+    store = NutritionStore.from_rows(FOODS, class_names=[])
+    return FoodSearch(lambda: store)
+
+
+def test_search_scales_nutrition_to_serving(search):
+    match = search.search('pho bo', k=1)[0]
+    assert match['food_name'] == 'Phở bò'
+    assert match['serving_size'] == 500
+    assert match['nutrition']['calories'] == pytest.approx(550.0)
+    assert match['nutrition']['protein'] == pytest.approx(35.0)
+    assert match['nutrition']['fiber'] == pytest.approx(2.5)
+
+
+def test_search_uses_each_rows_serving_size(search):
+    match = search.search('com trang', k=1)[0]
+    assert match['food_name'] == 'Cơm trắng'
+    assert match['nutrition']['calories'] == pytest.approx(195.0)
+    assert match['nutrition']['carbs'] == pytest.approx(42.0)
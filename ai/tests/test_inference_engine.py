@@ -0,0 +1,226 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from models.inference_engine import BatchInferenceEngine
+from models.preprocessing import ImagePreprocessor
+
+
+class SlowRunner:
+    """
+    Stand-in for the worker pool: echoes each image's first pixel after
+    `delay` seconds and records how many batches overlapped. Images
+    given as None fail to decode.
+    """
+
+    def __init__(self, delay: float = 0.05, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.active = 0
+        self.peak = 0
+        self.batch_sizes = []
+
+    async def __call__(self, images, portions):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.batch_sizes.append(len(images))
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("model crashed")
+            predictions = {i: (float(image[0, 0, 0]), portion)
+                           for i, (image, portion) in enumerate(zip(images, portions)) if image is not None}
+            errors = {i: "cannot identify image file" for i, image in enumerate(images) if image is None}
+            return predictions, errors
+        finally:
+            self.active -= 1
+
+
+def image(value):
+    return np.full((2, 2, 3), value, dtype=np.float32)
+
+
+def run_engine(runner, requests, **kwargs):
+    async def main():
+        engine = BatchInferenceEngine(runner=runner, **kwargs)
+        await engine.start()
+        try:
+            return await asyncio.gather(*[engine.predict(image(i), portion) for i, portion in requests],
+                                        return_exceptions=True), engine.get_stats()
+        finally:
+            await engine.stop()
+    return asyncio.run(main())
+
+
+def test_results_match_callers():
+    runner = SlowRunner(delay=0.01)
+    results, stats = run_engine(runner, [(i, i * 10.0 or None) for i in range(20)], max_batch_size=4,
+                                max_concurrent_batches=2)
+    assert results == [(float(i), i * 10.0 or None) for i in range(20)]
+    assert stats['total_images'] == 20
+    assert max(runner.batch_sizes) <= 4
+
+
+def test_batches_run_concurrently_up_to_limit():
+    runner = SlowRunner(delay=0.05)
+    _, stats = run_engine(runner, [(i, None) for i in range(32)], max_batch_size=2, max_wait_ms=1,
+                          max_concurrent_batches=3)
+    assert runner.peak == 3
+    assert stats['max_concurrent_batches'] == 3
+    assert stats['batches_in_flight'] == 0
+
+
+def test_single_slot_runs_batches_serially():
+    runner = SlowRunner(delay=0.02)
+    run_engine(runner, [(i, None) for i in range(8)], max_batch_size=2, max_wait_ms=1)
+    assert runner.peak == 1
+
+
+def test_busy_runners_let_the_next_batch_grow():
+    runner = SlowRunner(delay=0.05)
+
+    async def main():
+        engine = BatchInferenceEngine(runner=runner, max_batch_size=16, max_wait_ms=1, max_concurrent_batches=1)
+        await engine.start()
+        try:
+            first = asyncio.ensure_future(engine.predict(image(0)))
+            await asyncio.sleep(0.01)
+            # Arrive while the only runner is busy; they form one batch after it
+            rest = [asyncio.ensure_future(engine.predict(image(i))) for i in range(1, 9)]
+            await asyncio.gather(first, *rest)
+        finally:
+            await engine.stop()
+
+    asyncio.run(main())
+    assert runner.batch_sizes == [1, 8]
+
+
+def test_runner_failure_fails_its_batch_only():
+    runner = SlowRunner(delay=0.01, fail=True)
+    results, stats = run_engine(runner, [(i, None) for i in range(4)], max_batch_size=2,
+                                max_concurrent_batches=2)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert stats['total_batches'] == 0
+
+
+def test_stop_waits_for_dispatched_batches():
+    runner = SlowRunner(delay=0.05)
+
+    async def main():
+        engine = BatchInferenceEngine(runner=runner, max_batch_size=4, max_wait_ms=1, max_concurrent_batches=2)
+        await engine.start()
+        pending = [asyncio.ensure_future(engine.predict(image(i))) for i in range(4)]
+        await asyncio.sleep(0.02)
+        await engine.stop()
+        return await asyncio.gather(*pending, return_exceptions=True)
+
+    assert asyncio.run(main()) == [(float(i), None) for i in range(4)]
+
+
+def test_predict_requires_running_engine():
+    engine = BatchInferenceEngine(runner=SlowRunner())
+    with pytest.raises(RuntimeError):
+        asyncio.run(engine.predict(image(0)))
+
+
+def test_stop_fails_requests_of_a_batch_being_collected():
+    runner = SlowRunner(delay=0.01)
+
+    async def main():
+        # A long max_wait keeps the first requests in a batch still being formed
+        engine = BatchInferenceEngine(runner=runner, max_batch_size=8, max_wait_ms=10_000)
+        await engine.start()
+        pending = [asyncio.ensure_future(engine.predict(image(i))) for i in range(3)]
+        await asyncio.sleep(0.02)
+        assert engine.queue_depth == 0
+        await engine.stop()
+        return await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), 1)
+
+    results = asyncio.run(main())
+    assert [str(result) for result in results] == ["Inference engine stopped"] * 3
+    assert runner.batch_sizes == []
+
+
+def test_stop_fails_queued_requests():
+    runner = SlowRunner(delay=0.2)
+
+    async def main():
+        engine = BatchInferenceEngine(runner=runner, max_batch_size=1, max_wait_ms=1)
+        await engine.start()
+        pending = [asyncio.ensure_future(engine.predict(image(i))) for i in range(3)]
+        await asyncio.sleep(0.02)
+        await engine.stop()
+        return await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), 1)
+
+    # The running batch finishes; the ones behind it are failed, not dropped
+    first, *rest = asyncio.run(main())
+    assert first == (0.0, None)
+    assert [str(result) for result in rest] == ["Inference engine stopped"] * 2
+
+
+def test_decode_error_fails_only_its_request():
+    runner = SlowRunner(delay=0.01)
+
+    async def main():
+        engine = BatchInferenceEngine(runner=runner, max_batch_size=4, max_wait_ms=20)
+        await engine.start()
+        try:
+            return await asyncio.gather(engine.predict(image(1)), engine.predict(None), engine.predict(image(3)),
+                                        return_exceptions=True), engine.get_stats()
+        finally:
+            await engine.stop()
+
+    (first, failed, third), stats = asyncio.run(main())
+    assert (first, third) == ((1.0, None), (3.0, None))
+    assert isinstance(failed, ValueError) and str(failed) == "cannot identify image file"
+    assert runner.batch_sizes == [3]
+    assert stats['total_images'] == 2
+
+
+class BufferedModel:
+    """
+    Decodes batches with ImagePreprocessor like FoodRecognitionModel.predict_images,
+    recording which buffer each batch was decoded into
+    """
+
+    def __init__(self):
+        self.preprocessor = ImagePreprocessor(target_size=(8, 8), max_batch_size=4)
+        self.buffers = []
+
+    def predict_images(self, sources, portions):
+        with self.preprocessor.preprocess_batch(sources) as batch:
+            self.buffers.append(batch.images.base)
+            predictions = {index: (round(float(pixels.mean()), 2), portions[index])
+                           for index, pixels in zip(batch.indices, batch.images)}
+            return predictions, batch.errors
+
+
+def png(value):
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), (value, value, value)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_default_runner_decodes_into_pooled_buffer():
+    model = BufferedModel()
+
+    async def main():
+        engine = BatchInferenceEngine(model=model, max_batch_size=4, max_wait_ms=20)
+        await engine.start()
+        try:
+            first = await asyncio.gather(engine.predict(png(255), 100.0), engine.predict(png(0)))
+            second = await asyncio.gather(engine.predict(b'not an image'), engine.predict(png(51)),
+                                          return_exceptions=True)
+            return first, second
+        finally:
+            await engine.stop()
+
+    first, second = asyncio.run(main())
+    assert first == [(1.0, 100.0), (0.0, None)]
+    assert isinstance(second[0], ValueError)
+    assert second[1] == (0.2, None)
+    # Both batches were decoded into the same pooled buffer
+    assert len(model.buffers) == 2 and model.buffers[0] is model.buffers[1]
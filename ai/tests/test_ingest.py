@@ -0,0 +1,122 @@
+import asyncio
+import csv
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+from models.nutrition_store import NutritionStore
+from services.database import Database, create_sqlite_schema
+from services.ingest import Ingestor, chunked, read_records, validate_foods, validate_meals
+
+FOODS = [
+    {'id': 1, 'name': 'White Rice', 'calories': 130, 'protein': 2.7, 'carbs': 28, 'fat': 0.3, 'serving_size': 150},
+    {'id': 2, 'name': 'Pho Bo', 'calories': 350, 'protein': 15, 'carbs': 45, 'fat': 8, 'serving_size': 500},
+]
+
+
+def meal(**fields):
+    row = {'user_id': '1', 'food_id': '2', 'meal_type': 'lunch', 'quantity': '200', 'unit': 'g',
+           'meal_date': '2024-01-01'}
+    row.update(fields)
+    return row
+
+
+@pytest.fixture
+def store():
+    return NutritionStore.from_rows(FOODS, class_names=[])
+
+
+def test_missing_macros_are_computed_from_quantity(store):
+    chunk = [meal(), meal(food_id='1', quantity='2', unit='bowl'), meal(calories='999')]
+    params, rejects = validate_meals(chunk, store)
+    assert rejects == []
+    # 200 g of pho, two 150 g servings of rice, and a given calorie value kept as is
+    assert [row[5:9] for row in params] == [(700.0, 30.0, 90.0, 16.0), (390.0, 8.1, 84.0, 0.9),
+                                            (999.0, 30.0, 90.0, 16.0)]
+
+
+def test_meal_rejects_keep_the_first_failing_reason(store):
+    chunk = [
+        meal(user_id='0'),
+        meal(user_id='x', food_id='99'),
+        meal(user_id='7'),
+        meal(food_id='99'),
+        meal(meal_type='brunch'),
+        meal(quantity='-1'),
+        meal(meal_date='2024-02-30'),
+        meal(unit='cup'),
+        meal(protein='-5'),
+        meal(),
+    ]
+    params, rejects = validate_meals(chunk, store, known_users={1})
+    assert [reason for _, reason in rejects] == [
+        'invalid user_id', 'invalid user_id', 'unknown user_id', 'unknown food_id', 'invalid meal_type',
+        'invalid quantity', 'invalid meal_date', 'unknown unit', 'negative nutrient',
+    ]
+    assert [row for row, _ in rejects] == chunk[:-1]
+    assert len(params) == 1
+
+
+def test_food_rejects_and_updates():
+    chunk = [
+        {'name': 'Bun Cha', 'calories': '300'},
+        {'id': '4', 'name': 'Banh Mi', 'calories': '250', 'tags': 'street food'},
+        {'name': '', 'calories': '100'},
+        {'name': 'x' * 256, 'calories': '100'},
+        {'name': 'Soup', 'calories': 'lots'},
+        {'name': 'Soup', 'calories': '50', 'serving_size': '0'},
+        {'id': '-2', 'name': 'Soup', 'calories': '50'},
+    ]
+    inserts, updates, rejects = validate_foods(chunk)
+    assert [row[0] for row in inserts] == ['Bun Cha']
+    assert [(row[0], row[-1]) for row in updates] == [('Banh Mi', 4)]
+    assert [reason for _, reason in rejects] == [
+        'missing name', 'name longer than 255', 'invalid calories', 'invalid serving_size', 'invalid id',
+    ]
+
+
+def test_read_records_and_chunks(tmp_path):
+    path = tmp_path / 'meals.jsonl.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write('\n'.join(json.dumps(meal(quantity=str(i))) for i in range(7)) + '\n\n')
+    chunks = list(chunked(read_records(str(path)), size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert chunks[2][0]['quantity'] == '6'
+
+
+def test_ingest_counts_rejected_rows_by_reason(tmp_path):
+    db_path = str(tmp_path / 'health_tracker.db')
+    create_sqlite_schema(db_path)
+    path = str(tmp_path / 'meals.csv.gz')
+    rows = [meal(user_id=str(1 + i % 2), quantity=str(100 + i)) for i in range(10)]
+    rows += [meal(user_id='3'), meal(meal_type='brunch'), meal(meal_type='brunch'), meal(food_id='999')]
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    rejects_path = str(tmp_path / 'rejected.jsonl')
+
+    async def main():
+        db = Database.sqlite(db_path)
+        await db.open()
+        try:
+            await db.execute_many("INSERT INTO users (id, email, full_name) VALUES (%s, %s, %s)",
+                                  [(i, f"user{i}@example.com", f"User {i}") for i in (1, 2)])
+            ingestor = Ingestor(db, chunk_size=4, rejects_path=rejects_path)
+            return await ingestor.ingest_meals(read_records(path))
+        finally:
+            await db.close()
+
+    report = asyncio.run(main())
+    assert (report['rows_read'], report['rows_written'], report['rows_rejected']) == (14, 10, 4)
+    assert report['reject_reasons'] == {'unknown user_id': 1, 'invalid meal_type': 2, 'unknown food_id': 1}
+
+    with open(rejects_path, encoding='utf-8') as f:
+        rejected = [json.loads(line) for line in f]
+    assert sorted(entry['reason'] for entry in rejected) == ['invalid meal_type', 'invalid meal_type',
+                                                             'unknown food_id', 'unknown user_id']
+    connection = sqlite3.connect(db_path)
+    assert connection.execute("SELECT COUNT(*), SUM(quantity) FROM meals").fetchone() == (10, 1045.0)
+    connection.close()
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobStore, PermanentJobError
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.db')
+
+
+@pytest.fixture
+def store(db_path):
+    store = JobStore(db_path)
+    store.open()
+    yield store
+    store.close()
+
+
+def make_ready(store):
+    # Skip the backoff delay instead of sleeping through it
+    store._conn.execute("UPDATE jobs SET run_after = 0 WHERE status = 'queued'")
+
+
+def run_queue(store, test, **kwargs):
+    """
+    Run `await test(queue)` with a started queue; workers=0 leaves claiming
+    and running to the test
+    """
+    async def main():
+        queue = JobQueue(store, **kwargs)
+        queue.register('echo', echo)
+        queue.register('flaky', flaky)
+        queue.register('invalid', invalid)
+        await queue.start()
+        try:
+            return await test(queue)
+        finally:
+            await queue.stop()
+    return asyncio.run(main())
+
+
+async def echo(payload):
+    return payload
+
+
+async def flaky(payload):
+    raise RuntimeError("backend unavailable")
+
+
+async def invalid(payload):
+    raise PermanentJobError("bad input")
+
+
+def test_claim_is_exclusive_across_stores(store, db_path):
+    # Several stores on one file, as several worker processes would have
+    others = [JobStore(db_path) for _ in range(3)]
+    for other in others:
+        other.open()
+    submitted = {store.submit('echo', {'n': i})['id'] for i in range(60)}
+    claimed, lock = [], threading.Lock()
+
+    def claim_all(job_store):
+        while True:
+            job = job_store.claim(lease_seconds=60)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job['id'])
+
+    threads = [threading.Thread(target=claim_all, args=(s,)) for s in [store] + others for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for other in others:
+        other.close()
+
+    assert sorted(claimed) == sorted(submitted)
+    assert store.counts()[RUNNING] == 60
+
+
+def test_claim_order_and_delay(store):
+    low = store.submit('echo', {}, priority=0)
+    high = store.submit('echo', {}, priority=5)
+    later = store.submit('echo', {}, priority=9, run_after=time.time() + 60)
+    assert store.claim(60)['id'] == high['id']
+    assert store.claim(60)['id'] == low['id']
+    # Not runnable before run_after
+    assert store.claim(60) is None
+    assert store.next_run_after() == pytest.approx(later['run_after'])
+
+
+def test_expired_lease_is_reclaimed(store):
+    job = store.submit('echo', {})
+    first = store.claim(lease_seconds=60)
+    assert first['attempts'] == 1
+    # A live lease keeps the job with its worker
+    assert store.claim(lease_seconds=60) is None
+
+    store._conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job['id']))
+    second = store.claim(lease_seconds=60)
+    assert second['id'] == job['id']
+    assert second['attempts'] == 2
+    # The first worker's late result is still accepted for the running job
+    store.complete(job['id'], {'ok': True})
+    assert store.get(job['id'])['status'] == SUCCEEDED
+
+
+def test_retry_backoff_schedule(store):
+    async def test(queue):
+        job = await queue.submit('flaky', {}, max_attempts=5)
+        delays = []
+        for _ in range(4):
+            make_ready(store)
+            claimed = store.claim(queue.lease_seconds)
+            started = time.time()
+            await queue._run(claimed)
+            current = await queue.get(job['id'])
+            assert current['status'] == QUEUED
+            assert current['error'] == "backend unavailable"
+            delays.append(current['run_after'] - started)
+        return delays, queue.retried
+
+    delays, retried = run_queue(store, test, workers=0, retry_backoff=10.0, max_retry_delay=25.0)
+    # 10, 20, 40 and 80 seconds, capped at max_retry_delay
+    assert delays == pytest.approx([10.0, 20.0, 25.0, 25.0], abs=0.5)
+    assert retried == 4
+
+
+def test_fails_after_max_attempts(store):
+    async def test(queue):
+        job = await queue.submit('flaky', {}, max_attempts=3)
+        statuses = []
+        for _ in range(3):
+            make_ready(store)
+            await queue._run(store.claim(queue.lease_seconds))
+            statuses.append((await queue.get(job['id']))['status'])
+        make_ready(store)
+        return statuses, store.claim(queue.lease_seconds), await queue.get(job['id']), queue.failed
+
+    statuses, claimed, job, failed = run_queue(store, test, workers=0)
+    assert statuses == [QUEUED, QUEUED, FAILED]
+    assert claimed is None
+    assert job['attempts'] == 3
+    assert job['error'] == "backend unavailable"
+    assert job['finished_at'] is not None
+    assert failed == 1
+
+
+def test_permanent_error_is_not_retried(store):
+    async def test(queue):
+        job = await queue.submit('invalid', {}, max_attempts=3)
+        await queue._run(store.claim(queue.lease_seconds))
+        return await queue.get(job['id'])
+
+    job = run_queue(store, test, workers=0)
+    assert job['status'] == FAILED
+    assert job['attempts'] == 1
+    assert job['error'] == "bad input"
+
+
+def test_lost_job_fails_without_attempts_left(store):
+    calls = []
+
+    async def test(queue):
+        async def record(payload):
+            calls.append(payload)
+        queue.register('record', record)
+        job = await queue.submit('record', {}, max_attempts=1)
+        # The worker holding attempt 1 died; its lease expired
+        store.claim(lease_seconds=-1)
+        await queue._run(store.claim(queue.lease_seconds))
+        return await queue.get(job['id'])
+
+    job = run_queue(store, test, workers=0)
+    assert calls == []
+    assert job['status'] == FAILED
+    assert job['error'] == "Worker lost while running the job"
+
+
+def test_workers_run_jobs_and_wait_returns_result(store):
+    async def test(queue):
+        jobs = [await queue.submit('echo', {'n': i}) for i in range(5)]
+        return [await queue.wait(job['id'], timeout=5) for job in jobs], await queue.get_stats()
+
+    jobs, stats = run_queue(store, test, workers=2, poll_interval=0.05)
+    assert [job['status'] for job in jobs] == [SUCCEEDED] * 5
+    assert [job['result'] for job in jobs] == [{'n': i} for i in range(5)]
+    assert stats['succeeded'] == 5
+    assert stats['jobs'][SUCCEEDED] == 5
+
+
+def test_wait_times_out_on_unfinished_job(store):
+    async def test(queue):
+        job = await queue.submit('echo', {})
+        started = time.monotonic()
+        current = await queue.wait(job['id'], timeout=0.1)
+        return current, time.monotonic() - started
+
+    job, waited = run_queue(store, test, workers=0, poll_interval=0.05)
+    assert job['status'] == QUEUED
+    assert 0.1 <= waited < 1.0
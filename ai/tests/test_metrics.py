@@ -0,0 +1,138 @@
+import pytest
+
+from models.instrumentation import add_stage_observer, remove_stage_observer, stage, track_stages
+from services.metrics import MetricsMiddleware, MetricsRegistry, ServiceMetrics, engine_collector
+
+
+def samples(text, name):
+    """
+    {label string: value} of one metric's sample lines
+    """
+    values = {}
+    for line in text.splitlines():
+        if line.startswith(name) and not line.startswith('#'):
+            key, value = line.rsplit(' ', 1)
+            values[key[len(name):]] = float(value)
+    return values
+
+
+def test_exposition_format():
+    registry = MetricsRegistry(prefix='app_')
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    requests.inc('/a')
+    requests.inc('/a')
+    requests.inc('say "hi"\n', amount=0.5)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    assert registry.render().splitlines() == [
+        '# HELP app_requests_total Requests',
+        '# TYPE app_requests_total counter',
+        'app_requests_total{route="/a"} 2',
+        'app_requests_total{route="say \\"hi\\"\\n"} 0.5',
+        '# HELP app_latency_seconds Latency',
+        '# TYPE app_latency_seconds histogram',
+        # Cumulative counts; a value equal to a bound falls in that bucket
+        'app_latency_seconds_bucket{le="0.1"} 2',
+        'app_latency_seconds_bucket{le="1"} 3',
+        'app_latency_seconds_bucket{le="+Inf"} 4',
+        'app_latency_seconds_sum 3.65',
+        'app_latency_seconds_count 4',
+    ]
+
+
+def test_collectors_render_at_scrape_time():
+    class Engine:
+        total_inference_seconds = 1.5
+
+        def get_stats(self):
+            return {'queue_depth': 3, 'total_batches': 4, 'total_images': 13,
+                    'batch_size_histogram': {1: 1, 4: 2, 100: 1}}
+
+    def broken():
+        raise RuntimeError("stats unavailable")
+        yield
+
+    registry = MetricsRegistry()
+    registry.add_collector(broken)
+    registry.add_collector(engine_collector(Engine()))
+    text = registry.render()
+    assert samples(text, 'inference_queue_depth') == {'': 3}
+    assert samples(text, 'inference_batch_seconds_total') == {'': 1.5}
+    batch_sizes = samples(text, 'inference_batch_size')
+    assert batch_sizes['_bucket{le="1"}'] == 1
+    assert batch_sizes['_bucket{le="4"}'] == 3
+    assert batch_sizes['_bucket{le="64"}'] == 3
+    assert batch_sizes['_bucket{le="+Inf"}'] == 4
+    assert batch_sizes['_sum'] == 109
+
+
+def test_stages_reach_observers_and_request_totals():
+    observed = []
+
+    def observer(name, seconds):
+        observed.append(name)
+
+    def broken(name, seconds):
+        raise RuntimeError("observer failed")
+
+    # Unobserved stages are not timed at all
+    with stage('decode'):
+        pass
+    assert observed == []
+
+    add_stage_observer(broken)
+    add_stage_observer(observer)
+    try:
+        with track_stages() as total:
+            with stage('decode'):
+                pass
+            with pytest.raises(ValueError):
+                with stage('inference'):
+                    raise ValueError("bad batch")
+        with stage('postprocess'):
+            pass
+    finally:
+        remove_stage_observer(broken)
+        remove_stage_observer(observer)
+    assert observed == ['decode', 'inference', 'postprocess']
+    assert total[0] > 0
+
+
+def test_middleware_labels_routes_and_times_the_framework():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.get('/foods/{food_id}')
+    async def get_food(food_id: int):
+        with stage('lookup'):
+            return {'id': food_id}
+
+    metrics = ServiceMetrics()
+    add_stage_observer(metrics.observe_stage)
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+    try:
+        with TestClient(app) as client:
+            for food_id in (1, 2, 3):
+                assert client.get(f'/foods/{food_id}').status_code == 200
+            assert client.get('/foods/x').status_code == 422
+            assert client.get('/admin.php').status_code == 404
+            assert client.get('/metrics').status_code == 404
+    finally:
+        remove_stage_observer(metrics.observe_stage)
+
+    text = metrics.render()
+    # Path parameters share their route's series; unknown paths share one.
+    # Scrapes of /metrics itself are not counted.
+    assert samples(text, 'http_requests_total') == {
+        '{method="GET",route="/foods/{food_id}",status="200"}': 3,
+        '{method="GET",route="/foods/{food_id}",status="422"}': 1,
+        '{method="GET",route="unmatched",status="404"}': 1,
+    }
+    assert samples(text, 'http_requests_in_flight') == {'': 0}
+    stages = samples(text, 'stage_duration_seconds')
+    assert stages['_count{stage="lookup"}'] == 3
+    assert stages['_count{stage="framework"}'] == 5
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from models.food_recognition import NutritionAnalyzer
+from models.nutrition_analysis import analyze_meal_records, analyze_table, group_keys, iter_results
+from models.recommendation_rules import RuleEngine
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return RuleEngine.compile()
+
+
+def test_groups_are_sorted_by_user_then_date():
+    users, dates, inverse = group_keys(np.array([7, 3, 7, 3, 7]),
+                                       np.array(['2024-01-02', '2024-01-02', '2024-01-01', '2024-01-02', '2024-01-02']))
+    assert users.tolist() == [3, 7, 7]
+    assert dates.tolist() == ['2024-01-02', '2024-01-01', '2024-01-02']
+    assert inverse.tolist() == [2, 0, 1, 0, 2]
+
+
+def test_dataframe_totals_match_groupby(engine):
+    pd = pytest.importorskip('pandas')
+    rng = np.random.default_rng(0)
+    meals = pd.DataFrame({
+        'user_id': rng.integers(1, 6, 200),
+        'meal_date': rng.choice(['2024-01-01', '2024-01-02', '2024-01-03'], 200),
+        'calories': rng.uniform(100, 900, 200),
+        'protein': rng.uniform(0, 40, 200),
+        'carbs': rng.uniform(0, 100, 200),
+        'fat': rng.uniform(0, 30, 200),
+    })
+    result = analyze_table(engine, meals)
+
+    expected = meals.groupby(['user_id', 'meal_date']).sum().reset_index()
+    assert result['user_id'].tolist() == expected['user_id'].tolist()
+    assert result['meal_date'].tolist() == expected['meal_date'].tolist()
+    for name in ('calories', 'protein', 'carbs', 'fat'):
+        np.testing.assert_allclose(result[f"total_{name}"], expected[name])
+
+
+def test_missing_columns_and_nan_count_as_zero(engine):
+    columns = {'user_id': [1, 1, 2], 'meal_date': ['d', 'd', 'd'], 'calories': [500.0, np.nan, 300.0]}
+    result = analyze_table(engine, columns)
+    assert result['total_calories'].tolist() == [500.0, 300.0]
+    assert result['total_protein'].tolist() == [0.0, 0.0]
+    assert result['fat_percentage'].tolist() == [0.0, 0.0]
+
+
+def test_records_match_analyze_daily_nutrition():
+    analyzer = NutritionAnalyzer()
+    meals = [
+        {'user_id': 1, 'calories': 600, 'protein': 30, 'carbs': 70, 'fat': 20},
+        {'calories': 900, 'protein': 25, 'carbs': 110, 'fat': 35},
+        {'user_id': 2, 'calories': 400, 'protein': 10},
+    ]
+    result = analyze_meal_records(analyzer.rules, meals, user_id=1, meal_date='2024-01-01')
+    rows = list(iter_results(result, analyzer.rules))
+    assert [(row['user_id'], row['meal_date']) for row in rows] == [(1, '2024-01-01'), (2, '2024-01-01')]
+    assert all(type(row['user_id']) is int for row in rows)
+
+    for row in rows:
+        own = [meal for meal in meals if meal.get('user_id', 1) == row['user_id']]
+        daily = analyzer.analyze_daily_nutrition(own, row['user_id'])
+        assert {key: row[key] for key in daily} == pytest.approx(daily)
@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pytest
+
+from models.food_recognition import FoodRecognitionModel, refresh_nutrition
+from models.nutrition_store import DEFAULT_NUTRITION, NutritionStore
+from models.shared_weights import NUTRITION_PREFIX, SNAPSHOT_FILENAME, write_snapshot
+
+FOODS = [
+    {'id': 2_000_000_000, 'name': 'Pho Bo', 'name_vietnamese': 'Phở bò', 'calories': 350, 'protein': 15,
+     'carbs': 45, 'fat': 8, 'fiber': 2, 'serving_size': 500},
+    {'id': 7, 'name': 'White Rice', 'name_vietnamese': 'Cơm trắng', 'calories': 130, 'protein': 2.7,
+     'carbs': 28, 'fat': 0.3, 'fiber': 0.4, 'serving_size': 150},
+    {'id': 42, 'name': 'Banh Mi', 'name_vietnamese': 'Bánh mì', 'calories': 250, 'protein': 8,
+     'carbs': 45, 'fat': 3, 'fiber': 2},
+]
+CLASSES = ['cơm trắng', 'phở bò', 'bún chả']
+
+
+@pytest.fixture
+def store():
+    return NutritionStore.from_rows(FOODS, CLASSES)
+
+
+def calories(store, rows):
+    return store.values[rows, store.field_index('calories')].tolist()
+
+
+def test_sparse_ids_do_not_size_the_index(store):
+    # One entry per food, however large the ids
+    assert store.sorted_food_ids.nbytes + store.sorted_rows.nbytes < 64
+
+
+def test_lookup_by_food_id(store):
+    rows = store.rows_for_food_ids([7, 2_000_000_000, 42, 42])
+    assert calories(store, rows) == [130, 350, 250, 250]
+
+
+def test_unknown_food_ids_get_default_row(store):
+    rows = store.rows_for_food_ids([0, -1, 8, 41, 43, 3_000_000_000])
+    assert rows.tolist() == [store.default_row] * 6
+    assert store.lookup_food_ids([8])[0, store.field_index('calories')] == DEFAULT_NUTRITION['calories']
+
+
+def test_empty_store(tmp_path):
+    store = NutritionStore.from_rows([], CLASSES)
+    assert store.rows_for_food_ids([1, 2]).tolist() == [store.default_row] * 2
+
+    path = str(tmp_path / 'empty.snap')
+    store.save(path)
+    assert NutritionStore.load(path).rows_for_food_ids([1]).tolist() == [store.default_row]
+
+
+def test_lookup_by_class(store):
+    rows = store.rows_for_classes([0, 1, 2])
+    assert calories(store, rows) == [130, 350, DEFAULT_NUTRITION['calories']]
+
+
+def test_snapshot_round_trip(store, tmp_path):
+    path = str(tmp_path / 'nutrition.snap')
+    store.save(path)
+    loaded = NutritionStore.load(path)
+    assert calories(loaded, loaded.rows_for_food_ids([42, 7, 2_000_000_000, 5])) == \
+        [250, 130, 350, DEFAULT_NUTRITION['calories']]
+    assert loaded.version == store.version
+
+
+def test_loads_snapshot_without_sorted_index(store, tmp_path):
+    path = str(tmp_path / 'old.snap')
+    arrays = {name: array for name, array in store.to_arrays().items()
+              if name not in ('sorted_food_ids', 'sorted_rows')}
+    write_snapshot(path, arrays, {'nutrition': store.to_metadata()})
+    loaded = NutritionStore.load(path)
+    assert calories(loaded, loaded.rows_for_food_ids([7, 2_000_000_000])) == [130, 350]
+
+
+def test_refresh_nutrition_uses_the_given_store(store):
+    prediction = ('phở bò', 0.9, {'calories': 1.0}, [
+        {'food_name': 'phở bò', 'probability': 0.9, 'portion_grams': 100.0, 'nutritional_info': {'calories': 1.0}},
+        {'food_name': 'bún chả', 'probability': 0.1, 'portion_grams': 100.0, 'nutritional_info': {'calories': 1.0}},
+    ])
+    food_name, confidence, per_100g, candidates = refresh_nutrition(prediction, store)
+    assert (food_name, confidence) == ('phở bò', 0.9)
+    assert per_100g['calories'] == 350
+    # Estimated portions follow the store's serving sizes
+    assert [c['portion_grams'] for c in candidates] == [500, DEFAULT_NUTRITION['serving_size']]
+    assert candidates[0]['nutritional_info']['calories'] == pytest.approx(1750)
+    assert candidates[1]['nutritional_info']['calories'] == DEFAULT_NUTRITION['calories']
+
+    _, _, _, candidates = refresh_nutrition(prediction, store, portion_grams=200)
+    assert candidates[0]['portion_grams'] == 200
+    assert candidates[0]['nutritional_info']['protein'] == pytest.approx(30)
+    assert candidates[1]['probability'] == 0.1
+
+
+def test_lazy_model_uses_shared_bundle_nutrition(tmp_path):
+    # A bundle's tables, as create_shared_bundle writes them (weights omitted)
+    catalog = FoodRecognitionModel(lazy=True)
+    rows = [{'id': i + 1, 'name_vietnamese': name, 'calories': 1000 + i} for i, name in enumerate(catalog.class_names)]
+    bundled = NutritionStore.from_rows(rows, catalog.class_names)
+    write_snapshot(str(tmp_path / SNAPSHOT_FILENAME), bundled.to_arrays(prefix=NUTRITION_PREFIX),
+                   {'nutrition': bundled.to_metadata(), 'initializers': []})
+
+    model = FoodRecognitionModel(str(tmp_path), lazy=True)
+    assert model.backend == 'shared' and not model.is_loaded
+    assert model.get_nutritional_info('phở bò')['calories'] == 1001
+
+    # A separate nutrition snapshot still takes precedence, as it does in the workers
+    snapshot = str(tmp_path / 'nutrition.snap')
+    NutritionStore.from_rows([], catalog.class_names).save(snapshot)
+    model = FoodRecognitionModel(str(tmp_path), lazy=True, nutrition_snapshot=snapshot)
+    assert model.get_nutritional_info('phở bò')['calories'] == DEFAULT_NUTRITION['calories']
@@ -0,0 +1,105 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from services import prediction_cache as cache_module
+from services.prediction_cache import PredictionCache, perceptual_hash
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    return clock
+
+
+def prediction(name):
+    return (name, 0.9, {'calories': 100.0}, [])
+
+
+def photo(seed=0, size=(96, 128), quality=90):
+    rng = np.random.default_rng(seed)
+    # Smooth content, so re-encoding keeps its structure
+    pixels = np.kron(rng.random((6, 8, 3)), np.ones((16, 16, 1)))[:size[0], :size[1]] * 255
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.astype(np.uint8)).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def test_hit_and_miss_counters(clock):
+    cache = PredictionCache()
+    assert cache.get('a') is None
+    cache.put('a', prediction('phở bò'))
+    assert cache.get('a') == prediction('phở bò')
+    # An exact probe that will be retried with a perceptual hash is not a miss
+    assert cache.get('b', record_miss=False) is None
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = PredictionCache(max_entries=2)
+    cache.put('a', prediction('a'))
+    cache.put('b', prediction('b'))
+    cache.get('a')
+    cache.put('c', prediction('c'))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_memory_bound(clock):
+    cache = PredictionCache(max_entries=100, max_bytes=5000)
+    for i in range(50):
+        cache.put(str(i), prediction(f"food {i}"))
+    stats = cache.get_stats()
+    assert 0 < stats['approx_bytes'] <= 5000
+    assert stats['entries'] + stats['evictions'] == 50
+    # Newest entries are the ones kept
+    assert cache.get('49') is not None and cache.get('0') is None
+
+
+def test_entries_expire(clock):
+    cache = PredictionCache(ttl_seconds=60)
+    cache.put('a', prediction('a'))
+    clock.now += 59
+    assert cache.get('a') is not None
+    clock.now += 2
+    assert cache.get('a') is None
+    stats = cache.get_stats()
+    assert (stats['expirations'], stats['entries'], stats['approx_bytes']) == (1, 0, 0)
+
+
+def test_near_duplicate_hits_by_perceptual_hash(clock):
+    original, reencoded, other = photo(0), photo(0, quality=60), photo(1)
+    assert original != reencoded
+    cache = PredictionCache(max_distance=6)
+    cache.put('original', prediction('bánh mì'), perceptual_hash(original))
+
+    assert cache.get('reencoded', perceptual_hash(reencoded)) == prediction('bánh mì')
+    assert cache.get('other', perceptual_hash(other)) is None
+    stats = cache.get_stats()
+    assert (stats['near_hits'], stats['misses']) == (1, 1)
+
+    # Without a distance the perceptual hash is ignored
+    exact = PredictionCache()
+    exact.put('original', prediction('bánh mì'), perceptual_hash(original))
+    assert exact.get('reencoded', perceptual_hash(reencoded)) is None
+
+
+def test_perceptual_hash_accepts_bytes_and_paths(tmp_path):
+    content = photo(2)
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(content)
+    assert perceptual_hash(content) == perceptual_hash(str(path))
+    assert 0 <= perceptual_hash(content) < 2 ** 64
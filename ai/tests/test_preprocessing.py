@@ -0,0 +1,82 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from models.preprocessing import ImagePreprocessor
+
+
+def encode(pixels: np.ndarray, format: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format)
+    return buffer.getvalue()
+
+
+def gradient(height: int, width: int) -> np.ndarray:
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([x * 255 // width, y * 255 // height, (x + y) % 256], axis=-1).astype(np.uint8)
+
+
+@pytest.fixture
+def preprocessor():
+    return ImagePreprocessor(target_size=(32, 24), max_batch_size=4)
+
+
+def test_matches_reference_decoding(preprocessor, tmp_path):
+    pixels = gradient(48, 64)
+    content = encode(pixels, 'PNG')
+    # What preprocess_image used to do: PIL resize, then divide in float64
+    expected = np.array(Image.fromarray(pixels).resize((32, 24))) / 255.0
+
+    path = tmp_path / 'meal.png'
+    path.write_bytes(content)
+    for source in (content, str(path), io.BytesIO(content)):
+        image = preprocessor.preprocess(source)
+        assert image.shape == (1, 24, 32, 3)
+        assert image.dtype == np.float32
+        np.testing.assert_allclose(image[0], expected, atol=1e-6)
+
+
+def test_large_jpeg_is_decoded_at_reduced_size(preprocessor):
+    content = encode(gradient(1200, 1600), 'JPEG')
+    with Image.open(io.BytesIO(content)) as image:
+        image.draft('RGB', (32, 24))
+        # libjpeg scaled by 1/8 while decoding
+        assert image.size == (200, 150)
+    image = preprocessor.preprocess(content)
+    assert image.shape == (1, 24, 32, 3)
+    assert 0.0 <= image.min() and image.max() <= 1.0
+
+
+def test_batch_packs_decoded_images_and_reports_errors(preprocessor):
+    sources = [encode(np.full((8, 8, 3), value, dtype=np.uint8), 'PNG') for value in (0, 255)]
+    sources.insert(1, b'not an image')
+    with preprocessor.preprocess_batch(sources) as batch:
+        assert batch.indices == [0, 2]
+        assert list(batch.errors) == [1]
+        assert batch.images.shape == (2, 24, 32, 3)
+        assert batch.images[0].max() == 0.0 and batch.images[1].min() == 1.0
+
+
+def test_batch_buffer_is_reused(preprocessor):
+    source = encode(gradient(8, 8), 'PNG')
+    with preprocessor.preprocess_batch([source] * 3) as batch:
+        first = batch.images.base
+    with preprocessor.preprocess_batch([source]) as batch:
+        assert batch.images.base is first
+        assert first.shape == (4, 24, 32, 3)
+
+    # Batches larger than max_batch_size get a one-off buffer that is not pooled
+    with preprocessor.preprocess_batch([source] * 5) as batch:
+        oversized = batch.images.base
+        assert oversized.shape[0] == 5
+    with preprocessor.preprocess_batch([source]) as batch:
+        assert batch.images.base is first
+
+
+def test_concurrent_batches_get_separate_buffers(preprocessor):
+    source = encode(gradient(8, 8), 'PNG')
+    with preprocessor.preprocess_batch([source]) as outer:
+        with preprocessor.preprocess_batch([source]) as inner:
+            assert inner.images.base is not outer.images.base
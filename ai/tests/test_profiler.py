@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import Counter
+
+from services.profiler import SamplingProfiler
+
+
+def busy_loop(stop: threading.Event):
+    total = 0
+    while not stop.is_set():
+        total += sum(range(1000))
+    return total
+
+
+def test_top_functions_match_a_brute_force_count():
+    profiler = SamplingProfiler()
+    stacks = {
+        'main;serve;handle;decode': 40,
+        'main;serve;handle;infer': 25,
+        'main;serve;wait': 20,
+        'worker;run;infer': 9,
+        'worker;run;handle;handle': 5,
+        'idle': 1,
+    }
+    profiler._stacks.update(stacks)
+
+    # The first frame is the thread name
+    frames = {stack: stack.split(';')[1:] for stack in stacks}
+    functions = {frame for stack in frames.values() for frame in stack}
+    inclusive = {function: sum(count for stack, count in stacks.items() if function in frames[stack])
+                 for function in functions}
+    own = Counter({function: sum(count for stack, count in stacks.items() if frames[stack][-1:] == [function])
+                   for function in functions})
+    total = sum(stacks.values())
+    expected = sorted(inclusive, key=lambda frame: -inclusive[frame])
+
+    top = profiler.top_functions()
+    assert [entry['function'] for entry in top] == expected
+    assert [entry['inclusive'] for entry in top] == [inclusive[frame] / total for frame in expected]
+    assert [entry['self'] for entry in top] == [own[frame] / total for frame in expected]
+    # Recursion counts once per sample, not once per frame
+    assert top[1] == {'function': 'handle', 'inclusive': 70 / 100, 'self': 5 / 100}
+    assert [entry['function'] for entry in profiler.top_functions(limit=2)] == expected[:2]
+
+
+def test_samples_other_threads_until_stopped():
+    profiler = SamplingProfiler(interval_ms=1)
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name='busy-worker')
+    worker.start()
+    try:
+        profiler.start()
+        assert profiler.running
+        time.sleep(0.2)
+        profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    stats = profiler.get_stats()
+    assert not stats['running'] and stats['samples'] > 0 and stats['stopped_at'] >= stats['started_at']
+    lines = profiler.collapsed().splitlines()
+    counts = [int(line.rsplit(' ', 1)[1]) for line in lines]
+    assert counts == sorted(counts, reverse=True)
+    worker_stacks = [line for line in lines if line.startswith('busy-worker;')]
+    assert worker_stacks and all('busy_loop (test_profiler.py:' in line for line in worker_stacks)
+    # The sampler does not profile itself
+    assert not any(line.startswith('sampling-profiler;') for line in lines)
+
+
+def test_stops_on_its_own_after_max_duration():
+    profiler = SamplingProfiler(interval_ms=1)
+    profiler.start(max_duration_s=0.05)
+    deadline = time.monotonic() + 5
+    while profiler.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not profiler.running
+    assert profiler.get_stats()['stopped_at'] is not None
+    profiler.stop()
+    assert profiler.samples > 0
+
+    # Restarting clears the previous samples
+    profiler.start(interval_ms=1000)
+    profiler.stop()
+    assert profiler.samples == 0 and profiler.collapsed() == ''
@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+from models.food_recognition import NutritionAnalyzer
+from models.recommendation_rules import (
+    BAND_HIGH, BAND_LOW, BAND_NORMAL, BAND_VERY_HIGH, DEFAULT_RULES, RuleEngine
+)
+
+METRICS = DEFAULT_RULES['metrics']
+PROTEIN_LOW = METRICS['protein']['messages']['low']
+PROTEIN_HIGH = METRICS['protein']['messages']['high']
+FAT_LOW = METRICS['fat_percentage']['messages']['low']
+FAT_HIGH = METRICS['fat_percentage']['messages']['high']
+CALORIES_LOW = METRICS['calories']['messages']['low']
+CALORIES_HIGH = METRICS['calories']['messages']['high']
+BALANCED = DEFAULT_RULES['balanced_message']
+
+
+def day(calories=2000.0, protein=80.0, fat_percentage=25.0, carbs=250.0):
+    """
+    Daily totals that are normal on every metric except the ones given
+    """
+    return {'calories': calories, 'protein': protein, 'carbs': carbs, 'fat': fat_percentage * calories / 900.0}
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return RuleEngine.compile()
+
+
+def band(engine, metric, totals):
+    result = engine.evaluate({k: np.array([v]) for k, v in totals.items()})
+    return int(result['bands'][0, engine.metrics.index(metric)])
+
+
+# Integer thresholds are exact: a value equal to a threshold stays in the
+# band below it (low is "<", high and very_high are ">")
+@pytest.mark.parametrize('value, expected', [
+    (1199, BAND_LOW), (1200, BAND_NORMAL), (2500, BAND_NORMAL), (2501, BAND_HIGH),
+    (3000, BAND_HIGH), (3001, BAND_VERY_HIGH),
+])
+def test_calorie_bands(engine, value, expected):
+    assert band(engine, 'calories', day(calories=value)) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    (39.9, BAND_LOW), (40, BAND_NORMAL), (120, BAND_NORMAL), (120.1, BAND_HIGH),
+    (150, BAND_HIGH), (150.1, BAND_VERY_HIGH),
+])
+def test_protein_bands(engine, value, expected):
+    assert band(engine, 'protein', day(protein=value)) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    (14.9, BAND_LOW), (15.1, BAND_NORMAL), (34.9, BAND_NORMAL), (35.1, BAND_HIGH),
+    (39.9, BAND_HIGH), (40.1, BAND_VERY_HIGH),
+])
+def test_fat_percentage_bands(engine, value, expected):
+    assert band(engine, 'fat_percentage', day(fat_percentage=value)) == expected
+
+
+@pytest.mark.parametrize('totals, score, recommendations', [
+    (day(), 100, [BALANCED]),
+    (day(calories=1199), 80, [CALORIES_LOW]),
+    (day(calories=2501), 90, [CALORIES_HIGH]),
+    (day(calories=3001), 85, [CALORIES_HIGH]),
+    # The protein-low message triggers below 50 g, the penalty below 40 g
+    (day(protein=39.9), 85, [PROTEIN_LOW]),
+    (day(protein=45), 100, [PROTEIN_LOW]),
+    (day(protein=50), 100, [BALANCED]),
+    (day(protein=121), 100, [PROTEIN_HIGH]),
+    (day(protein=151), 90, [PROTEIN_HIGH]),
+    # The fat-low message triggers below 20% of calories, the penalty below 15%
+    (day(fat_percentage=14.9), 90, [FAT_LOW]),
+    (day(fat_percentage=18), 100, [FAT_LOW]),
+    (day(fat_percentage=20.1), 100, [BALANCED]),
+    (day(fat_percentage=36), 100, [FAT_HIGH]),
+    (day(fat_percentage=41), 85, [FAT_HIGH]),
+    (day(calories=1000, protein=30, fat_percentage=10), 55, [CALORIES_LOW, PROTEIN_LOW, FAT_LOW]),
+])
+def test_scores_and_messages(totals, score, recommendations):
+    result = NutritionAnalyzer().analyze_totals(totals)
+    assert result['health_score'] == score
+    assert result['recommendations'] == recommendations
+
+
+def test_zero_calories_has_no_fat_percentage(engine):
+    result = NutritionAnalyzer().analyze_totals({'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0})
+    assert result['health_score'] == 100 - 20 - 15 - 10
+    assert result['recommendations'] == [CALORIES_LOW, PROTEIN_LOW, FAT_LOW]
+
+
+def test_goal_overrides_move_thresholds():
+    analyzer = NutritionAnalyzer()
+    goals = [{'user_id': 1, 'goal_type': 'weight_loss', 'target_value': None, 'target_unit': None},
+             {'user_id': 2, 'goal_type': 'muscle_gain', 'target_value': 2200, 'target_unit': 'kcal'}]
+    assert analyzer.analyze_totals(day(calories=2100), 1, goals)['recommendations'] == [CALORIES_HIGH]
+    assert analyzer.analyze_totals(day(calories=2100), 3, goals)['recommendations'] == [BALANCED]
+    # 2200 kcal target: low below 0.8x, and muscle_gain raises protein low to
+    # 80 g for both the message and the penalty
+    result = analyzer.analyze_totals(day(calories=1700, protein=79), 2, goals)
+    assert result['recommendations'] == [CALORIES_LOW, PROTEIN_LOW]
+    assert result['health_score'] == 100 - 20 - 15
+
+
+def random_meals(rng, users=20, days=5, meals_per_day=4):
+    rows = {'user_id': [], 'meal_date': [], 'calories': [], 'protein': [], 'carbs': [], 'fat': []}
+    for user in range(1, users + 1):
+        for d in range(days):
+            for _ in range(int(rng.integers(1, meals_per_day + 1))):
+                rows['user_id'].append(user)
+                rows['meal_date'].append(f"2024-01-{d + 1:02d}")
+                rows['calories'].append(float(rng.uniform(100, 1000)))
+                rows['protein'].append(float(rng.uniform(0, 50)))
+                rows['carbs'].append(float(rng.uniform(0, 120)))
+                rows['fat'].append(float(rng.uniform(0, 40)))
+    return rows
+
+
+@pytest.mark.parametrize('goals', [None, [
+    {'user_id': 3, 'goal_type': 'weight_gain', 'target_value': None, 'target_unit': None},
+    {'user_id': 5, 'goal_type': 'endurance', 'target_value': 110, 'target_unit': 'g_protein'},
+]])
+def test_batch_matches_scalar_paths(goals):
+    analyzer = NutritionAnalyzer()
+    columns = random_meals(np.random.default_rng(0))
+    batch = analyzer.analyze_batch(columns, goals=goals)
+    assert len(batch['user_id']) == 100
+
+    for i, (user_id, meal_date) in enumerate(zip(batch['user_id'], batch['meal_date'])):
+        meals = [{name: columns[name][j] for name in ('calories', 'protein', 'carbs', 'fat')}
+                 for j in range(len(columns['user_id']))
+                 if columns['user_id'][j] == user_id and columns['meal_date'][j] == meal_date]
+        daily = analyzer.analyze_daily_nutrition(meals, int(user_id), goals)
+        totals = analyzer.analyze_totals({name: daily[f"total_{name}"] for name in ('calories', 'protein', 'carbs', 'fat')},
+                                         int(user_id), goals)
+        for name in ('calories', 'protein', 'carbs', 'fat'):
+            assert batch[f"total_{name}"][i] == pytest.approx(daily[f"total_{name}"])
+        assert batch['health_score'][i] == daily['health_score'] == totals['health_score']
+        expected = analyzer.rules.recommendations_for(int(batch['recommendation_flags'][i]))
+        assert expected == daily['recommendations'] == totals['recommendations']
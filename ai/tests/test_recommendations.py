@@ -0,0 +1,90 @@
+from models.nutrition_store import NutritionStore, NutritionStoreWatcher
+from services.recommendations import RecommendationCache, RecommendationEngine, recommendation_key
+
+FOODS = [
+    {'id': 1, 'name': 'Tofu', 'category': 'main', 'calories': 76, 'protein': 8, 'carbs': 2, 'fat': 5,
+     'serving_size': 200, 'tags': '["vegetarian"]'},
+    {'id': 2, 'name': 'Beef noodle soup', 'category': 'main', 'calories': 110, 'protein': 7, 'carbs': 12,
+     'fat': 3, 'serving_size': 500, 'tags': '["spicy"]'},
+    {'id': 3, 'name': 'Broken rice with pork', 'category': 'main', 'calories': 180, 'protein': 9, 'carbs': 22,
+     'fat': 6, 'serving_size': 350, 'tags': '[]'},
+]
+
+
+def make_engine(rows=FOODS):
+    store = NutritionStore.from_rows(rows, class_names=[])
+    return RecommendationEngine(lambda: store, food_k=5)
+
+
+def meal_ids(result):
+    return {meal['id'] for meal in result['meal_suggestions']}
+
+
+def test_supported_preference_filters_meals():
+    result = make_engine().recommend(recommendation_key('maintain_weight', 'sedentary', ['vegetarian']))
+    assert meal_ids(result) == {1}
+    assert result['unsupported_preferences'] == []
+
+
+def test_supported_exclusion_filters_meals():
+    result = make_engine().recommend(recommendation_key('maintain_weight', 'sedentary', ['no_spicy']))
+    assert meal_ids(result) == {1, 3}
+    assert result['unsupported_preferences'] == []
+
+
+def test_untagged_preference_fails_closed():
+    # No food carries the tag, so none can be shown to satisfy it
+    result = make_engine().recommend(recommendation_key('maintain_weight', 'sedentary', ['vegan']))
+    assert result['meal_suggestions'] == []
+    assert result['unsupported_preferences'] == ['vegan']
+
+
+def test_untagged_catalog_fails_closed():
+    rows = [dict(row, tags=None) for row in FOODS]
+    result = make_engine(rows).recommend(recommendation_key('maintain_weight', 'sedentary', ['vegetarian', 'no_dairy']))
+    assert result['meal_suggestions'] == []
+    assert result['unsupported_preferences'] == ['vegetarian', 'no_dairy']
+    # Exercises do not depend on dietary tags
+    assert result['exercise_recommendations']
+
+
+def test_equipment_exclusion_is_supported():
+    result = make_engine().recommend(recommendation_key('maintain_weight', 'sedentary', ['no_bicycle']))
+    assert result['unsupported_preferences'] == []
+    assert meal_ids(result) == {1, 2, 3}
+    assert all(exercise['id'] != 3 for exercise in result['exercise_recommendations'])
+
+
+def test_cache_follows_store_reload(tmp_path):
+    path = str(tmp_path / 'nutrition.snap')
+    NutritionStore.from_rows(FOODS, class_names=[]).save(path)
+    watcher = NutritionStoreWatcher(path, check_interval=0)
+    engine = RecommendationEngine(watcher.current, food_k=5)
+    renders = []
+
+    def render(key):
+        renders.append(key)
+        return repr(sorted(meal_ids(engine.recommend(key)))).encode()
+
+    cache = RecommendationCache(render, sources=engine.sources)
+    key = recommendation_key('maintain_weight', 'sedentary')
+    assert cache.get(key) == b'[1, 2, 3]'
+    assert cache.get(key) == b'[1, 2, 3]'
+    assert len(renders) == 1
+
+    NutritionStore.from_rows(FOODS[:2], class_names=[]).save(path)
+    watcher._mtime = None  # the rewrite may land within the same mtime tick
+    # Invalidation follows the store the engine renders from, never ahead of it
+    assert cache.get(key) == b'[1, 2]'
+    assert cache.get(key) == b'[1, 2]'
+    assert len(renders) == 2
+    assert cache.get_stats()['invalidations'] == 1
+
+
+def test_cache_keeps_entries_while_store_unchanged():
+    engine = make_engine()
+    cache = RecommendationCache(lambda key: b'{}', sources=engine.sources)
+    for _ in range(3):
+        cache.get(recommendation_key('lose_weight', 'sedentary'))
+    assert cache.get_stats()['hits'] == 2
+    assert cache.get_stats()['invalidations'] == 0
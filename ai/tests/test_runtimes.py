@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from models.model_export import export_onnx, export_tflite
+from models.runtimes import ONNXRuntime, TFLiteRuntime, detect_backend, load_runtime
+
+tf = pytest.importorskip('tensorflow')
+
+
+@pytest.fixture(scope='module')
+def keras_model():
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(16, 16, 3)),
+        tf.keras.layers.Conv2D(4, 3, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(5, activation='softmax'),
+    ])
+    return model
+
+
+@pytest.fixture(scope='module')
+def images():
+    return np.random.default_rng(0).random((6, 16, 16, 3), dtype=np.float32)
+
+
+def test_detect_backend(tmp_path):
+    assert detect_backend('model.TFLITE') == 'tflite'
+    assert detect_backend('exports/model.onnx') == 'onnx'
+    assert detect_backend('food_model.keras') == 'keras'
+    assert detect_backend(None) == 'keras'
+    (tmp_path / 'weights.snap').write_bytes(b'')
+    assert detect_backend(str(tmp_path)) == 'shared'
+    with pytest.raises(ValueError):
+        load_runtime('model.bin', 'torch')
+
+
+def test_tflite_matches_keras(keras_model, images, tmp_path):
+    path = export_tflite(keras_model, str(tmp_path / 'model.tflite'))
+    runtime = TFLiteRuntime(path)
+    expected = keras_model.predict_on_batch(images)
+    # Batch size changes resize the interpreter's input
+    np.testing.assert_allclose(runtime.predict(images), expected, atol=1e-5)
+    np.testing.assert_allclose(runtime.predict(images[:1]), expected[:1], atol=1e-5)
+
+
+def test_int8_tflite_keeps_float_io(keras_model, images, tmp_path):
+    with pytest.raises(ValueError):
+        export_tflite(keras_model, str(tmp_path / 'int8.tflite'), 'int8')
+    path = export_tflite(keras_model, str(tmp_path / 'int8.tflite'), 'int8', calibration_images=images)
+    outputs = TFLiteRuntime(path).predict(images)
+    assert outputs.dtype == np.float32
+    # Quantized probabilities stay close and keep the predicted classes
+    expected = keras_model.predict_on_batch(images)
+    np.testing.assert_allclose(outputs, expected, atol=0.05)
+
+
+def test_onnx_matches_keras(keras_model, images, tmp_path):
+    pytest.importorskip('tf2onnx')
+    path = export_onnx(keras_model, str(tmp_path / 'model.onnx'))
+    runtime = ONNXRuntime(path)
+    np.testing.assert_allclose(runtime.predict(images), keras_model.predict_on_batch(images), atol=1e-5)
+
+
+def test_model_serves_exported_file(tmp_path):
+    from models.food_recognition import FoodRecognitionModel
+
+    classes = len(FoodRecognitionModel(lazy=True).class_names)
+    keras_model = tf.keras.Sequential([
+        tf.keras.Input(shape=(16, 16, 3)),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(classes, activation='softmax'),
+    ])
+    path = export_tflite(keras_model, str(tmp_path / 'food.tflite'))
+
+    model = FoodRecognitionModel(path, input_size=16)
+    assert (model.backend, model.runtime.name) == ('tflite', 'tflite')
+    images = np.random.default_rng(1).random((2, 16, 16, 3), dtype=np.float32)
+    expected = keras_model.predict_on_batch(images)
+    for prediction, probabilities in zip(model.predict_batch(images), expected):
+        food_name, confidence, _, candidates = prediction
+        assert food_name == model.class_names[int(np.argmax(probabilities))]
+        assert confidence == pytest.approx(float(probabilities.max()), abs=1e-5)
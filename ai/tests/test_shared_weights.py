@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+
+from models.nutrition_store import NutritionStore
+from models.shared_weights import (ALIGNMENT, GRAPH_FILENAME, MIN_SHARED_BYTES, NUTRITION_PREFIX, SNAPSHOT_FILENAME,
+                                   Snapshot, create_shared_bundle, is_shared_bundle, write_snapshot)
+
+CLASSES = ['cơm trắng', 'phở bò', 'bún chả']
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'arrays.snap')
+    arrays = {
+        'weights': np.arange(12, dtype=np.float32).reshape(3, 4),
+        'ids': np.array([5, 7, 9], dtype=np.int64),
+        'empty': np.zeros((0, 4), dtype=np.float32),
+        'flags': np.array([True, False]),
+    }
+    offsets = write_snapshot(path, arrays, {'version': 3})
+    assert all(offset % ALIGNMENT == 0 for offset in offsets.values())
+
+    snapshot = Snapshot(path)
+    assert snapshot.metadata == {'version': 3}
+    for name, array in arrays.items():
+        loaded = snapshot.arrays[name]
+        assert loaded.dtype == array.dtype and loaded.shape == array.shape
+        np.testing.assert_array_equal(loaded, array)
+        # Views of the read-only map, not copies
+        assert not loaded.flags.writeable
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / 'model.onnx'
+    path.write_bytes(b'not a snapshot at all')
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+def dense_model(path: str, features: int = 32, classes: int = 64):
+    """
+    softmax(x @ w + b), with w large enough to be shared and b kept inline
+    """
+    onnx = pytest.importorskip('onnx')
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    w = rng.standard_normal((features, classes)).astype(np.float32)
+    b = rng.standard_normal(classes).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node('MatMul', ['x', 'w'], ['xw']),
+         helper.make_node('Add', ['xw', 'b'], ['logits']),
+         helper.make_node('Softmax', ['logits'], ['probabilities'], axis=-1)],
+        'dense',
+        [helper.make_tensor_value_info('x', TensorProto.FLOAT, [None, features])],
+        [helper.make_tensor_value_info('probabilities', TensorProto.FLOAT, [None, classes])],
+        initializer=[numpy_helper.from_array(w, 'w'), numpy_helper.from_array(b, 'b')],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+    return w, b
+
+
+def test_shared_bundle_matches_onnx_runtime(tmp_path):
+    pytest.importorskip('onnxruntime')
+    from models.runtimes import ONNXRuntime
+    from models.shared_weights import SharedONNXRuntime
+
+    onnx_path = str(tmp_path / 'float.onnx')
+    w, b = dense_model(onnx_path)
+    assert w.nbytes >= MIN_SHARED_BYTES > b.nbytes
+    store = NutritionStore.from_rows([{'id': 1, 'name_vietnamese': 'Phở bò', 'calories': 350}], CLASSES)
+    bundle = str(tmp_path / 'bundle')
+    create_shared_bundle(onnx_path, bundle, store)
+    assert is_shared_bundle(bundle)
+    assert not is_shared_bundle(str(tmp_path)) and not is_shared_bundle(None)
+
+    # Only the large weight moved into the snapshot; the graph keeps the bias
+    snapshot = Snapshot(os.path.join(bundle, SNAPSHOT_FILENAME))
+    assert snapshot.metadata['initializers'] == ['w']
+    np.testing.assert_array_equal(snapshot.arrays['w'], w)
+    assert os.path.getsize(os.path.join(bundle, GRAPH_FILENAME)) < w.nbytes
+
+    images = np.random.default_rng(1).standard_normal((4, 32)).astype(np.float32)
+    expected = ONNXRuntime(onnx_path).predict(images)
+    np.testing.assert_allclose(SharedONNXRuntime(bundle).predict(images), expected, rtol=1e-5, atol=1e-6)
+
+    bundled = NutritionStore.from_snapshot(snapshot, NUTRITION_PREFIX)
+    calories = bundled.field_index('calories')
+    assert bundled.values[bundled.rows_for_classes([1]), calories].tolist() == [350]
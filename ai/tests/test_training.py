@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from models.training import ShardCache, list_images, split_validation
+
+CLASSES = ['cơm trắng', 'phở bò', 'bún chả']
+
+
+def photo(path, value, size=(20, 12)):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new('RGB', size, (value, value, value)).save(path)
+
+
+@pytest.fixture
+def photos(tmp_path):
+    root = tmp_path / 'photos'
+    photo(str(root / 'pho_bo' / 'a.jpg'), 10)
+    photo(str(root / 'pho_bo' / 'b.png'), 20)
+    photo(str(root / 'Cơm Trắng' / 'nested' / 'c.jpg'), 30)
+    photo(str(root / 'cơm trắng' / 'd.jpg'), 40)
+    photo(str(root / 'banh_flan' / 'e.jpg'), 50)
+    (root / 'pho_bo' / 'notes.txt').write_text('not an image')
+    (root / 'pho_bo' / 'broken.jpg').write_bytes(b'not a jpeg either')
+    return str(root)
+
+
+def test_list_images_matches_folded_directory_names(photos):
+    paths, labels, unknown = list_images(photos, CLASSES)
+    names = [os.path.relpath(path, photos) for path in paths]
+    assert names == [os.path.join('Cơm Trắng', 'nested', 'c.jpg'), os.path.join('cơm trắng', 'd.jpg'),
+                     os.path.join('pho_bo', 'a.jpg'), os.path.join('pho_bo', 'b.png'),
+                     os.path.join('pho_bo', 'broken.jpg')]
+    assert labels == [0, 0, 1, 1, 1]
+    assert unknown == ['banh_flan']
+
+
+def test_validation_split_is_stable_as_images_are_added():
+    paths = [f"photos/{i}.jpg" for i in range(1000)]
+    (train, _), (validation, _) = split_validation(paths[:500], [0] * 500, 0.2)
+    (_, _), (more_validation, _) = split_validation(paths, [0] * 1000, 0.2)
+    assert set(validation) == set(more_validation) & set(paths[:500])
+    assert len(train) + len(validation) == 500
+    assert 60 < len(validation) < 140
+
+
+def test_shard_cache_builds_once_and_streams_batches(photos, tmp_path, monkeypatch):
+    pytest.importorskip('tensorflow')
+    paths, labels, _ = list_images(photos, CLASSES)
+    cache = ShardCache(str(tmp_path / 'cache'), image_size=(8, 6), shard_size=2)
+    manifest = cache.ensure(paths, labels)
+    # The unreadable file is skipped, the rest split into shards of 2
+    assert (manifest['count'], manifest['skipped']) == (4, 1)
+    assert len(cache.shard_paths) == 2 and all(os.path.exists(path) for path in cache.shard_paths)
+
+    images, one_hot = zip(*cache.dataset(len(CLASSES), batch_size=3, training=False).as_numpy_iterator())
+    assert [batch.shape for batch in images] == [(3, 6, 8, 3), (1, 6, 8, 3)]
+    assert sorted(np.argmax(np.concatenate(one_hot), axis=1).tolist()) == [0, 0, 1, 1]
+    # Solid grey photos stay grey after resizing, scaled to [0, 1]
+    values = sorted(round(float(batch.mean()) * 255) for batch in np.concatenate(images))
+    assert values == [10, 20, 30, 40]
+
+    training = next(cache.dataset(len(CLASSES), batch_size=4, training=True, seed=0).as_numpy_iterator())
+    assert training[0].shape == (4, 6, 8, 3)
+    assert 0.0 <= training[0].min() and training[0].max() <= 1.0
+
+    # Unchanged sources reuse the shards; a changed one rebuilds them
+    built = []
+    monkeypatch.setattr(ShardCache, 'build', lambda self, *args: built.append(args) or manifest)
+    assert cache.ensure(paths, labels) == manifest
+    assert built == []
+    photo(paths[0], 99, size=(30, 30))
+    cache.ensure(paths, labels)
+    assert len(built) == 1
+
+
+def test_train_model_reports_throughput(photos, tmp_path):
+    pytest.importorskip('tensorflow')
+    from models.food_recognition import FoodRecognitionModel
+
+    model = FoodRecognitionModel(backend='keras', input_size=64)
+    report = model.train(photos, epochs=2, batch_size=2, cache_dir=str(tmp_path / 'cache'),
+                         checkpoint_dir=str(tmp_path / 'ckpt'), validation_split=0.0, seed=0)
+    assert (report['train_images'], report['validation_images']) == (5, 0)
+    assert [entry['epoch'] for entry in report['epochs']] == [1, 2]
+    assert all(entry['images'] == 4 and entry['images_per_s'] > 0 and 'loss' in entry for entry in report['epochs'])
+    assert os.listdir(tmp_path / 'cache') == ['train-64x64']
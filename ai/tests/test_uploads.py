@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import os
+import socket
+
+import pytest
+
+from services import uploads
+from services.uploads import (
+    RequestSizeLimitMiddleware, UnsafeURLError, UploadTooLargeError, check_fetch_url, fetch_image, stream_upload
+)
+
+ADDRESSES = {
+    'images.example': '93.184.216.34',
+    'internal.example': '10.0.0.5',
+    'metadata.example': '169.254.169.254',
+    'localhost': '127.0.0.1',
+    'v6.example': '::1',
+    # Literal addresses resolve to themselves
+    '127.0.0.1': '127.0.0.1',
+    '::1': '::1',
+}
+
+
+class FakeResponse:
+    def __init__(self, body=b'', status=200, headers=None, chunk=4):
+        self.body = body
+        self.status_code = status
+        self.headers = {'content-type': 'image/jpeg', **(headers or {})}
+        self.chunk = chunk
+        self.read = 0
+
+    @property
+    def is_redirect(self):
+        return 'location' in self.headers
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise uploads.requests.HTTPError(f"{self.status_code} error")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), self.chunk):
+            self.read += self.chunk
+            yield self.body[start:start + self.chunk]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def web(monkeypatch):
+    """
+    Fake DNS and HTTP: `web[url]` is the response served for url
+    """
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host not in ADDRESSES:
+            raise socket.gaierror(host)
+        return [(None, None, None, '', (ADDRESSES[host], port))]
+
+    pages, requested = {}, []
+
+    def get(url, **kwargs):
+        assert kwargs['stream'] and not kwargs['allow_redirects']
+        requested.append(url)
+        return pages[url]
+
+    monkeypatch.setattr(uploads.socket, 'getaddrinfo', getaddrinfo)
+    monkeypatch.setattr(uploads.requests, 'get', get)
+    pages['requested'] = requested
+    return pages
+
+
+def test_fetches_public_image(web):
+    web['http://images.example/pho.jpg'] = FakeResponse(b'0123456789')
+    assert fetch_image('http://images.example/pho.jpg', max_bytes=10, timeout=1) == b'0123456789'
+
+
+@pytest.mark.parametrize('url', [
+    'file:///etc/passwd', 'ftp://images.example/pho.jpg', 'gopher://images.example/',
+    'http://localhost/admin', 'http://internal.example/pho.jpg', 'http://metadata.example/latest/meta-data',
+    'http://127.0.0.1/pho.jpg', 'http://[::1]/pho.jpg', 'http://v6.example/pho.jpg', 'http://unknown.example/',
+    'http:///pho.jpg',
+])
+def test_rejects_unsafe_urls(web, url):
+    with pytest.raises(UnsafeURLError):
+        fetch_image(url, max_bytes=10, timeout=1)
+    assert web['requested'] == []
+
+
+def test_allowlist(web):
+    check_fetch_url('https://images.example/a.jpg', allowed_hosts={'images.example'})
+    with pytest.raises(UnsafeURLError):
+        check_fetch_url('https://images.example/a.jpg', allowed_hosts={'cdn.example'})
+
+
+def test_redirects_are_checked_per_hop(web):
+    web['http://images.example/a.jpg'] = FakeResponse(headers={'location': '/b.jpg'})
+    web['http://images.example/b.jpg'] = FakeResponse(b'image')
+    assert fetch_image('http://images.example/a.jpg', max_bytes=10, timeout=1) == b'image'
+
+    web['http://images.example/c.jpg'] = FakeResponse(headers={'location': 'http://metadata.example/'})
+    with pytest.raises(UnsafeURLError):
+        fetch_image('http://images.example/c.jpg', max_bytes=10, timeout=1)
+    assert 'http://metadata.example/' not in web['requested']
+
+
+def test_stops_reading_past_the_limit(web):
+    # No Content-Length: the limit is enforced while streaming
+    response = web['http://images.example/big.jpg'] = FakeResponse(b'x' * 1000)
+    with pytest.raises(UploadTooLargeError):
+        fetch_image('http://images.example/big.jpg', max_bytes=10, timeout=1)
+    assert response.read <= 12
+
+    response = web['http://images.example/declared.jpg'] = FakeResponse(b'x' * 1000, headers={'content-length': '1000'})
+    with pytest.raises(UploadTooLargeError):
+        fetch_image('http://images.example/declared.jpg', max_bytes=10, timeout=1)
+    assert response.read == 0
+
+
+def test_rejects_non_images(web):
+    web['http://images.example/page'] = FakeResponse(b'<html>', headers={'content-type': 'text/html'})
+    with pytest.raises(ValueError):
+        fetch_image('http://images.example/page', max_bytes=10, timeout=1)
+
+
+def chunks_of(content: bytes, size: int, consumed: list):
+    async def generate():
+        for start in range(0, len(content), size):
+            consumed.append(start)
+            yield content[start:start + size]
+    return generate()
+
+
+def store(content: bytes, upload_dir, filename='meal.JPG', max_bytes=1000, chunk_size=64, consumed=None):
+    consumed = [] if consumed is None else consumed
+    return asyncio.run(stream_upload(chunks_of(content, chunk_size, consumed), str(upload_dir), filename, max_bytes))
+
+
+def test_stream_upload_hashes_while_writing(tmp_path):
+    content = os.urandom(500)
+    stored = store(content, tmp_path)
+    assert stored.digest == hashlib.sha256(content).hexdigest()
+    assert stored.path == str(tmp_path / f"{stored.digest}.jpg")
+    assert (stored.size, stored.duplicate) == (500, False)
+    with open(stored.path, 'rb') as f:
+        assert f.read() == content
+
+
+def test_identical_uploads_are_stored_once(tmp_path):
+    content = os.urandom(300)
+    first = store(content, tmp_path, 'a.jpg')
+    second = store(content, tmp_path, 'b.jpg')
+    assert second.path == first.path and second.duplicate
+    assert os.listdir(tmp_path) == [os.path.basename(first.path)]
+
+
+def test_unknown_extensions_are_dropped(tmp_path):
+    stored = store(b'payload', tmp_path, 'meal.exe')
+    assert os.path.basename(stored.path) == stored.digest
+
+
+def test_size_limit_stops_the_stream_early(tmp_path):
+    consumed = []
+    with pytest.raises(UploadTooLargeError):
+        store(os.urandom(10_000), tmp_path, max_bytes=1000, chunk_size=100, consumed=consumed)
+    # Reading stopped at the chunk that crossed the limit; nothing is left behind
+    assert len(consumed) == 11
+    assert os.listdir(tmp_path) == []
+
+
+def test_middleware_rejects_declared_oversized_bodies():
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from fastapi.testclient import TestClient
+
+    async def echo(request):
+        return PlainTextResponse(str(len(await request.body())))
+
+    app = Starlette(routes=[Route('/upload', echo, methods=['POST']), Route('/other', echo, methods=['POST'])])
+    app.add_middleware(RequestSizeLimitMiddleware, limits={'/upload': 10})
+    client = TestClient(app)
+    assert client.post('/upload', content=b'x' * 10).text == '10'
+    response = client.post('/upload', content=b'x' * 11)
+    assert response.status_code == 413
+    assert response.json() == {'detail': 'Request body exceeds 10 bytes'}
+    assert client.post('/other', content=b'x' * 11).status_code == 200
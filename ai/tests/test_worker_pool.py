@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+from functools import partial
+
+import pytest
+
+from services.worker_pool import InferencePool, PoolSaturatedError
+
+
+class FakeModel:
+    """
+    Records which thread built it; `block` holds a worker until released
+    """
+    built = []
+
+    def __init__(self, fail_warm_up: bool = False):
+        self.fail_warm_up = fail_warm_up
+        self.thread = threading.current_thread().name
+        FakeModel.built.append(self.thread)
+
+    def whoami(self):
+        return self.thread
+
+    def block(self, event: threading.Event):
+        event.wait(5)
+        return 'released'
+
+    def crash(self):
+        raise RuntimeError("model crashed")
+
+    def warm_up(self):
+        if self.fail_warm_up:
+            raise RuntimeError("no weights")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def pool():
+    FakeModel.built = []
+    pool = InferencePool(FakeModel, workers=2, max_pending=2)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_each_worker_builds_its_own_model(pool):
+    async def main():
+        threads = []
+        for _ in range(4):
+            threads += await asyncio.gather(pool.submit('whoami'), pool.submit('whoami'))
+        return threads
+
+    threads = asyncio.run(main())
+    # Every call ran on a worker thread, against the model that thread built
+    assert set(threads) <= set(FakeModel.built)
+    assert len(FakeModel.built) == len(set(FakeModel.built)) <= 2
+    assert all(name.startswith('inference') for name in threads)
+    assert pool.get_stats()['completed'] == 8
+
+
+def test_rejects_beyond_max_pending_without_blocking_the_loop(pool):
+    release = threading.Event()
+
+    async def main():
+        blocked = [asyncio.ensure_future(pool.submit('block', release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(PoolSaturatedError):
+            await pool.submit('whoami')
+        # The loop keeps running while both workers are busy
+        ticks = 0
+        while ticks < 5:
+            await asyncio.sleep(0.001)
+            ticks += 1
+        release.set()
+        return await asyncio.gather(*blocked)
+
+    assert asyncio.run(main()) == ['released', 'released']
+    stats = pool.get_stats()
+    assert (stats['rejected'], stats['pending'], stats['completed']) == (1, 0, 2)
+
+
+def test_failure_propagates_and_is_counted(pool):
+    with pytest.raises(RuntimeError, match="model crashed"):
+        asyncio.run(pool.submit('crash'))
+    assert pool.get_stats()['failed'] == 1
+
+
+def test_warm_up_marks_pool_ready(pool):
+    assert not pool.ready
+    asyncio.run(pool.warm_up())
+    assert pool.ready
+    assert pool.get_stats()['warm_up_seconds'] > 0
+
+
+def test_failed_warm_up_is_reported():
+    pool = InferencePool(partial(FakeModel, fail_warm_up=True), workers=1)
+    pool.start()
+    try:
+        asyncio.run(pool.warm_up())
+        assert pool.status == 'failed'
+    finally:
+        pool.shutdown()
+
+
+def test_submit_requires_started_pool():
+    pool = InferencePool(FakeModel)
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.submit('whoami'))
+    with pytest.raises(ValueError):
+        InferencePool(FakeModel, mode='fiber')
+
+
+def test_process_mode_runs_in_other_processes():
+    # The factory must be picklable: a stdlib callable keeps the test importable
+    pool = InferencePool(partial(list, [3, 1, 2, 1]), mode='process', workers=1)
+    pool.start()
+    try:
+        assert asyncio.run(pool.submit('count', 1)) == 2
+    finally:
+        pool.shutdown()
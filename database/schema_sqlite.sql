@@ -0,0 +1,92 @@
+-- SQLite stand-in for the tables the AI service reads and writes
+-- (see schema.sql for the MySQL schema). Used for local development
+-- (DATABASE_SQLITE_PATH) and by the AI service tests; columns, indexes
+-- and seed foods follow schema.sql.
+
+-- Users table (only what meal ingestion checks)
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT UNIQUE NOT NULL,
+    full_name TEXT NOT NULL,
+    is_active INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Vietnamese Foods table (nutrients per 100g)
+CREATE TABLE IF NOT EXISTS foods (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    name_vietnamese TEXT,
+    description TEXT,
+    category TEXT,
+    calories REAL NOT NULL,
+    protein REAL NOT NULL DEFAULT 0,
+    carbs REAL NOT NULL DEFAULT 0,
+    fat REAL NOT NULL DEFAULT 0,
+    fiber REAL DEFAULT 0,
+    sugar REAL DEFAULT 0,
+    sodium REAL DEFAULT 0,
+    serving_size REAL DEFAULT 100,
+    serving_unit TEXT DEFAULT 'g',
+    image_url TEXT,
+    is_vietnamese INTEGER DEFAULT 1,
+    is_verified INTEGER DEFAULT 0,
+    source TEXT,
+    tags TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_foods_name ON foods (name);
+CREATE INDEX IF NOT EXISTS idx_foods_name_vietnamese ON foods (name_vietnamese);
+CREATE INDEX IF NOT EXISTS idx_foods_category ON foods (category);
+
+-- Meals table
+CREATE TABLE IF NOT EXISTS meals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    food_id INTEGER NOT NULL REFERENCES foods(id) ON DELETE CASCADE,
+    meal_type TEXT NOT NULL CHECK (meal_type IN ('breakfast', 'lunch', 'dinner', 'snack')),
+    quantity REAL NOT NULL,
+    unit TEXT DEFAULT 'g',
+    calories REAL NOT NULL,
+    protein REAL NOT NULL,
+    carbs REAL NOT NULL,
+    fat REAL NOT NULL,
+    meal_date TEXT NOT NULL,
+    meal_time TEXT,
+    notes TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_meals_user_date ON meals (user_id, meal_date);
+CREATE INDEX IF NOT EXISTS idx_meals_meal_date ON meals (meal_date);
+
+-- User Goals table
+CREATE TABLE IF NOT EXISTS user_goals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    goal_type TEXT NOT NULL CHECK (goal_type IN ('weight_loss', 'weight_gain', 'muscle_gain', 'endurance', 'flexibility')),
+    target_value REAL,
+    target_unit TEXT,
+    target_date TEXT,
+    current_value REAL,
+    current_unit TEXT,
+    is_active INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_user_goals_user_active ON user_goals (user_id, is_active);
+
+-- Sample Vietnamese foods, same ids as schema.sql
+INSERT OR IGNORE INTO foods (id, name, name_vietnamese, category, calories, protein, carbs, fat, fiber, sugar, sodium, is_vietnamese, is_verified, source) VALUES
+(1, 'White Rice', 'Cơm trắng', 'grains', 130, 2.7, 28, 0.3, 0.4, 0.1, 1, 1, 1, 'Viện Dinh dưỡng Quốc gia'),
+(2, 'Pho Bo', 'Phở bò', 'noodles', 350, 15, 45, 8, 2, 3, 800, 1, 1, 'Viện Dinh dưỡng Quốc gia'),
+(3, 'Bun Bo Hue', 'Bún bò Huế', 'noodles', 400, 18, 50, 10, 2.5, 4, 900, 1, 1, 'Viện Dinh dưỡng Quốc gia'),
+(4, 'Banh Mi', 'Bánh mì', 'bread', 250, 8, 45, 3, 2, 5, 400, 1, 1, 'Viện Dinh dưỡng Quốc gia'),
+(5, 'Com Tam', 'Cơm tấm', 'rice_dish', 450, 20, 55, 12, 1.5, 2, 600, 1, 1, 'Viện Dinh dưỡng Quốc gia'),
+(6, 'Bun Cha', 'Bún chả', 'noodles', 380, 22, 40, 8, 2, 3, 700, 1, 1, 'Viện Dinh dưỡng Quốc gia'),
+(7, 'Goi Cuon', 'Gỏi cuốn', 'appetizer', 120, 6, 20, 1, 3, 2, 200, 1, 1, 'Viện Dinh dưỡng Quốc gia'),
+(8, 'Banh Xeo', 'Bánh xèo', 'pancake', 300, 8, 35, 12, 2, 3, 500, 1, 1, 'Viện Dinh dưỡng Quốc gia'),
+(9, 'Cha Ca', 'Chả cá', 'fish', 200, 25, 5, 8, 0.5, 1, 400, 1, 1, 'Viện Dinh dưỡng Quốc gia'),
+(10, 'Nem Nuong', 'Nem nướng', 'meat', 180, 12, 8, 10, 1, 1, 350, 1, 1, 'Viện Dinh dưỡng Quốc gia');